@@ -0,0 +1,86 @@
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class FixtureSite:
+    """A small in-memory website served over HTTP on localhost."""
+
+    def __init__(self):
+        self.pages = {}
+        self.requests = Counter()
+        self.not_modified = Counter()
+        self.before_request = None  # Optional hook; returning False drops the request uncounted
+        self.errors = {}  # path -> list of error statuses returned by the next requests
+        self.server = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def url(self, path):
+        return self.base_url + path
+
+    def add_page(self, path, body, content_type="text/html", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.pages[path] = (body, content_type, headers or {})
+
+    def add_html(self, path, title, links=(), text=""):
+        anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+        self.add_page(path, f"<html><head><title>{title}</title></head>"
+                            f"<body><h1>{title}</h1><p>{text}</p>{anchors}</body></html>")
+
+
+def _make_handler(site):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("#")[0]
+            if site.before_request and site.before_request(path) is False:
+                self.close_connection = True
+                return
+            site.requests[path] += 1
+            if site.errors.get(path):
+                self.send_response(site.errors[path].pop(0))
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if path not in site.pages:
+                self.send_error(404)
+                return
+            body, content_type, headers = site.pages[path]
+            etag = headers.get("ETag")
+            if etag and self.headers.get("If-None-Match") == etag:
+                site.not_modified[path] += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+@pytest.fixture
+def fixture_site():
+    """Serve a `FixtureSite` on an ephemeral localhost port for the duration of a test."""
+    site = FixtureSite()
+    site.server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(site))
+    thread = threading.Thread(target=site.server.serve_forever, daemon=True)
+    thread.start()
+    yield site
+    site.server.shutdown()
+    site.server.server_close()
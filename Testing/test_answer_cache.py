@@ -0,0 +1,96 @@
+import pytest
+from src.model import answer_cache
+from src.model.answer_cache import SemanticAnswerCache, get_answer_cache
+from src.model.cache import IndexVersion, MemoryCache, SQLiteCache, publish_index_changes, publish_index_version
+from src.model.embeddings import HashingEmbedder
+
+WINDOWS = "How do I connect to the cluster from Windows?"
+WINDOWS_ANSWER = "Install an SSH client such as MobaXterm and connect to login.discovery.neu.edu."
+
+
+@pytest.fixture(scope="module")
+def embedder():
+    return HashingEmbedder()
+
+
+def make_cache(tmp_path, embedder, store=None, **kwargs):
+    versions = IndexVersion(str(tmp_path / "index_version.json"))
+    return SemanticAnswerCache(MemoryCache() if store is None else store, embedder=embedder, versions=versions,
+                               **kwargs)
+
+
+def test_reworded_questions_get_the_cached_answer(tmp_path, embedder):
+    cache = make_cache(tmp_path, embedder)
+    assert cache.lookup(WINDOWS) is None
+    assert cache.store(WINDOWS, WINDOWS_ANSWER)
+
+    exact = cache.lookup("  how do I connect to the cluster from windows ")
+    assert exact == {"answer": WINDOWS_ANSWER, "question": WINDOWS, "similarity": 1.0}
+    similar = cache.lookup("How can I connect to the cluster from windows")
+    assert similar["answer"] == WINDOWS_ANSWER and cache.threshold <= similar["similarity"] < 1
+    # Same form, another topic
+    cache.store("How do I request a GPU?", "Use --gres=gpu:1.")
+    assert cache.lookup("How do I request more memory?") is None
+
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"], stats["stored"]) == (1, 1, 2, 2)
+    assert stats["hit_rate"] == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("How do I check my storage quota on scratch?", "How do I check my storage quota on home?"),
+    ("How do I request more memory for my job?", "How do I request more memory for my interactive job?"),
+    ("What is the max walltime of the short partition?", "What is the max walltime of the gpu partition?"),
+    ("How do I run a GPU job?", "How do I run a CPU job?"),
+    (WINDOWS, "How do I connect to the cluster from Mac?"),
+])
+def test_questions_differing_in_a_key_term_are_misses(tmp_path, embedder, cached, asked):
+    cache = make_cache(tmp_path, embedder)
+    cache.store(cached, "The answer to another question.")
+    assert cache.lookup(asked) is None
+
+
+def test_answers_expire_with_a_new_index_version(tmp_path, embedder):
+    cache = make_cache(tmp_path, embedder)
+    cache.store(WINDOWS, WINDOWS_ANSWER)
+    publish_index_version(str(tmp_path / "index_version.json"))
+    assert cache.lookup(WINDOWS) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_answers_survive_a_run_that_changes_nothing(tmp_path, embedder):
+    path = str(tmp_path / "index_version.json")
+    publish_index_changes({"bm25": True, "embeddings": True, "azure": True}, path)
+    cache = make_cache(tmp_path, embedder)
+    cache.store(WINDOWS, WINDOWS_ANSWER)
+
+    # The next daily run re-indexes the same chunks
+    publish_index_changes({"bm25": False, "embeddings": False, "azure": False}, path)
+    assert cache.lookup(WINDOWS)["answer"] == WINDOWS_ANSWER
+
+    publish_index_changes({"bm25": False, "embeddings": True, "azure": False}, path)
+    assert cache.lookup(WINDOWS) is None
+
+
+def test_size_limits_and_lru_eviction(tmp_path, embedder):
+    cache = make_cache(tmp_path, embedder, store=MemoryCache(max_entries=2), max_chars=100)
+    assert not cache.store("What is HPC?", "x" * 101)
+    cache.store("What is HPC?", "High performance computing.")
+    cache.store("How do I submit a job?", "Use sbatch.")
+    cache.lookup("What is HPC?")  # The job question is now the least recently used
+    cache.store(WINDOWS, WINDOWS_ANSWER)
+    assert cache.lookup("How do I submit a job?") is None
+    assert cache.lookup("What is HPC?")["answer"] == "High performance computing."
+    assert cache.stats()["evicted"] == 1 and cache.stats()["skipped"] == 1
+
+
+def test_sqlite_answer_cache_is_shared(tmp_path, embedder):
+    path = str(tmp_path / "answers.sqlite")
+    make_cache(tmp_path, embedder, store=SQLiteCache(path)).store(WINDOWS, WINDOWS_ANSWER)
+    other = make_cache(tmp_path, embedder, store=SQLiteCache(path))
+    assert other.lookup("how can I connect to the cluster from windows")["answer"] == WINDOWS_ANSWER
+
+
+def test_answer_cache_can_be_turned_off(monkeypatch):
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE", "off")
+    assert get_answer_cache() is None
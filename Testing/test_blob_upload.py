@@ -0,0 +1,107 @@
+import hashlib
+import threading
+import time
+from types import SimpleNamespace
+from src.data_pipeline.blob_upload import BlobUploader, file_md5, stored_md5s
+
+
+class InMemoryContainer:
+    """A stand-in for `ContainerClient` that keeps blobs and their MD5 in memory."""
+
+    def __init__(self, latency=0.0, fail=()):
+        self.blobs = {}
+        self.md5s = {}
+        self.uploads = 0
+        self.active = 0
+        self.max_active = 0
+        self.latency = latency
+        self.fail = set(fail)
+        self.lock = threading.Lock()
+
+    def list_blobs(self):
+        return [SimpleNamespace(name=name, content_settings=SimpleNamespace(content_md5=md5))
+                for name, md5 in self.md5s.items()]
+
+    def upload_blob(self, name, data, length=None, overwrite=False, content_settings=None):
+        assert hasattr(data, "read"), "the uploader should stream file handles"
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.latency)
+            if name in self.fail:
+                raise IOError("simulated service error")
+            content = data.read()
+            assert length == len(content)
+            with self.lock:
+                self.blobs[name] = content
+                self.md5s[name] = content_settings.content_md5 if content_settings else None
+                self.uploads += 1
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def delete_blob(self, name):
+        with self.lock:
+            del self.blobs[name]
+            del self.md5s[name]
+
+
+def write_files(folder, count, prefix="doc"):
+    paths = []
+    for i in range(count):
+        path = folder / f"{prefix}-{i}.jsonl"
+        path.write_bytes(f'{{"id": "{prefix}-{i}", "content": "chunk {i}"}}\n'.encode('utf-8'))
+        paths.append(str(path))
+    return [(path, path.rsplit("/", 1)[-1]) for path in paths]
+
+
+def test_file_md5_matches_hashlib(tmp_path):
+    path = tmp_path / "file.bin"
+    path.write_bytes(b"x" * 3_000_000)
+    assert file_md5(str(path), block_size=1 << 16) == hashlib.md5(b"x" * 3_000_000).digest()
+
+
+def test_uploads_in_parallel_and_skips_unchanged_blobs(tmp_path):
+    container = InMemoryContainer(latency=0.02)
+    files = write_files(tmp_path, 16)
+
+    first = BlobUploader(container, workers=8).upload(files)
+    assert first["uploaded"] == 16 and first["skipped"] == 0 and first["failed"] == 0
+    assert container.max_active > 1
+    assert container.blobs["doc-3.jsonl"] == open(files[3][0], 'rb').read()
+    assert first["files_per_second"] > 0
+
+    # Only the changed file is uploaded again
+    with open(files[5][0], 'ab') as file:
+        file.write(b'{"id": "extra", "content": "new chunk"}\n')
+    second = BlobUploader(container, workers=8).upload(files)
+    assert second["uploaded"] == 1 and second["skipped"] == 15
+    assert container.uploads == 17
+    assert stored_md5s(container)["doc-5.jsonl"] == file_md5(files[5][0])
+
+
+def test_blobs_without_md5_are_uploaded_and_failures_reported(tmp_path):
+    container = InMemoryContainer(fail={"doc-1.jsonl"})
+    files = write_files(tmp_path, 3)
+    container.md5s["doc-0.jsonl"] = None  # Uploaded in blocks without a content MD5
+
+    report = BlobUploader(container, workers=2).upload(files)
+    assert report["uploaded"] == 2 and report["failed"] == 1
+    assert report["failed_names"] == ["doc-1.jsonl"]
+    assert "doc-1.jsonl" not in container.blobs
+
+
+def test_orphaned_blobs_are_deleted(tmp_path):
+    container = InMemoryContainer()
+    files = write_files(tmp_path, 4)
+    BlobUploader(container, workers=2).upload(files, delete_orphans=True)
+
+    report = BlobUploader(container, workers=2).upload(files[:2], delete_orphans=True)
+    assert report["deleted"] == 2 and report["skipped"] == 2
+    assert sorted(container.blobs) == ["doc-0.jsonl", "doc-1.jsonl"]
+
+    # An empty upload never empties the container, and deletion is opt-in
+    assert BlobUploader(container).upload([], delete_orphans=True)["deleted"] == 0
+    assert BlobUploader(container).upload(files[:1])["deleted"] == 0
+    assert len(container.blobs) == 2
@@ -0,0 +1,92 @@
+from src.data_pipeline.boilerplate import remove_boilerplate, count_line_pages, PAGE_SEPARATOR
+
+NAV = ["Toggle Light / Dark / Auto color theme", "Hide navigation sidebar", "Copyright © 2024, RC"]
+
+
+def write_section(folder, section, pages):
+    path = folder / section / f"{section}_scraped_content.txt"
+    path.parent.mkdir(parents=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for url, lines in pages:
+            f.write(f"URL: {url}\n\n")
+            f.write("\n".join(NAV + lines) + "\n\n")
+            f.write(PAGE_SEPARATOR + "\n\n")
+    return path
+
+
+def test_remove_boilerplate(tmp_path):
+    first = write_section(tmp_path, "section-1", [
+        (f"https://docs/{i}.html", [f"Unique content of page {i}", "Shared by two pages" if i < 2 else "x"])
+        for i in range(4)])
+    second = write_section(tmp_path, "section-2", [("https://docs/glossary.html", ["A cluster is a group of nodes"]),
+                                                   ("https://docs/faq.html", ["How do I log in?"])])
+    size_before = first.stat().st_size + second.stat().st_size
+
+    stats = remove_boilerplate(str(tmp_path), threshold=0.5, min_pages=3)
+
+    assert stats["pages"] == 6
+    assert stats["boilerplate_lines"] == len(NAV)
+    assert stats["bytes_removed"] == size_before - first.stat().st_size - second.stat().st_size > 0
+    text = first.read_text(encoding='utf-8')
+    assert not any(line in text for line in NAV)
+    assert "Unique content of page 3" in text
+    assert "Shared by two pages" in text  # Below the threshold
+    assert text.count("URL: ") == 4 and text.count(PAGE_SEPARATOR) == 4
+
+
+def test_small_corpus_is_left_alone(tmp_path):
+    path = write_section(tmp_path, "section-1", [("https://docs/a.html", ["a"]), ("https://docs/b.html", ["b"])])
+    before = path.read_text(encoding='utf-8')
+    assert remove_boilerplate(str(tmp_path))["bytes_removed"] == 0
+    assert path.read_text(encoding='utf-8') == before
+
+
+def test_count_line_pages_counts_each_page_once(tmp_path):
+    path = write_section(tmp_path, "section-1", [("https://docs/a.html", ["dup", "dup"])])
+    counts, pages = count_line_pages([str(path)])
+    assert pages == 1
+    assert max(counts.values()) == 1
+
+
+def test_boilerplate_learned_earlier_is_removed_from_changed_sections(tmp_path):
+    paths = [write_section(tmp_path, f"section-{n}", [(f"https://docs/{n}/{i}.html", [f"Page {n}.{i}"])
+                                                      for i in range(5)])
+             for n in range(10)]
+    first = remove_boilerplate(str(tmp_path))
+    assert first["boilerplate_lines"] == first["new_boilerplate_lines"] == len(NAV)
+
+    # The next crawl only rewrites one section, menus included; the others stay stripped
+    paths[3].unlink()
+    paths[3].parent.rmdir()
+    changed = write_section(tmp_path, "section-3", [("https://docs/3/new.html", ["A new page"])])
+    second = remove_boilerplate(str(tmp_path))
+
+    assert second["boilerplate_lines"] == len(NAV) and second["new_boilerplate_lines"] == 0
+    assert second["bytes_removed"] > 0
+    text = changed.read_text(encoding='utf-8')
+    assert not any(line in text for line in NAV)
+    assert "A new page" in text
+    assert "Page 4.0" in paths[4].read_text(encoding='utf-8')
+
+
+def test_learned_boilerplate_is_forgotten_when_the_site_stops_repeating_it(tmp_path):
+    for n in range(10):
+        write_section(tmp_path, f"section-{n}", [(f"https://docs/{n}/{i}.html", [f"Page {n}.{i}"]) for i in range(5)])
+    assert remove_boilerplate(str(tmp_path), max_age=2)["new_boilerplate_lines"] == len(NAV)
+
+    # The site drops its menu: recrawled pages carry the old lines at most once
+    def recrawl(run):
+        path = tmp_path / "section-0" / "section-0_scraped_content.txt"
+        path.write_text(f"URL: https://docs/0/{run}.html\n\n{NAV[0]}\nRun {run}\n\n{PAGE_SEPARATOR}\n\n",
+                        encoding='utf-8')
+        return path
+
+    path = recrawl(1)
+    stats = remove_boilerplate(str(tmp_path), max_age=2)
+    assert stats["boilerplate_lines"] == len(NAV) and stats["expired_boilerplate_lines"] == 0
+    assert NAV[0] not in path.read_text(encoding='utf-8')
+
+    path = recrawl(2)
+    stats = remove_boilerplate(str(tmp_path), max_age=2)
+    assert stats["boilerplate_lines"] == 0 and stats["expired_boilerplate_lines"] == len(NAV)
+    assert NAV[0] in path.read_text(encoding='utf-8')
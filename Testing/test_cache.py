@@ -0,0 +1,138 @@
+import json
+import threading
+import pytest
+from src.model import retrievers
+from src.model.cache import (IndexVersion, MemoryCache, SQLiteCache, open_cache, publish_index_changes,
+                             publish_index_version)
+from src.model.retrievers import CachedRetriever, Retriever, get_cached_retriever, normalize_query
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingRetriever(Retriever):
+    def __init__(self):
+        self.queries = []
+
+    def search(self, query, top=8):
+        self.queries.append(query)
+        return [{"id": f"doc-{len(self.queries)}", "content": query, "score": 1.0}][:top]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    def make(max_entries=3, ttl=60, clock=None):
+        clock = clock or Clock()
+        if request.param == "sqlite":
+            return SQLiteCache(str(tmp_path / "cache.sqlite"), max_entries, ttl, clock=clock)
+        return MemoryCache(max_entries, ttl, clock=clock)
+    return make
+
+
+def test_cache_evicts_the_least_recently_used_entry(make_cache):
+    clock = Clock()
+    cache = make_cache(clock=clock)
+    for key in "abc":
+        cache.put(key, {"key": key})
+        clock.now += 1
+    assert cache.get("a") == {"key": "a"}  # "b" is now the least recently used
+    clock.now += 1
+    cache.put("d", {"key": "d"})
+    assert cache.get("b") is None
+    assert [cache.get(key)["key"] for key in "acd"] == ["a", "c", "d"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evicted"], stats["entries"]) == (4, 1, 1, 3)
+    assert stats["hit_rate"] == pytest.approx(0.8)
+
+
+def test_entries_expire_and_are_tied_to_an_index_version(make_cache):
+    clock = Clock()
+    cache = make_cache(clock=clock)
+    cache.put("question", [1, 2], version="v1")
+    assert cache.get("question", version="v1") == [1, 2]
+    assert cache.get("question", version="v2") is None
+    cache.put("question", [3], version="v1")
+    clock.now += 61
+    assert cache.get("question", version="v1") is None
+    stats = cache.stats()
+    assert (stats["expired"], stats["invalidated"]) == (1, 1)  # TTL and version are told apart
+
+    cache.put("a", 1, version="v1")
+    cache.put("b", 2, version="v2")
+    assert cache.invalidate("v2") == 1
+    assert cache.get("a", version="v1") is None and cache.get("b", version="v2") == 2
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "shared.sqlite")
+    writer, reader = SQLiteCache(path), SQLiteCache(path)
+    writer.put("question", {"content": "Use sbatch."})
+    assert reader.get("question") == {"content": "Use sbatch."}
+
+    threads = [threading.Thread(target=lambda i=i: [writer.put(f"{i}-{n}", n) for n in range(20)]) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(reader) == 81
+    with pytest.raises(ValueError):
+        open_cache("sqlite")
+    with pytest.raises(ValueError):
+        open_cache("redis")
+
+
+def test_index_version_follows_the_published_file(tmp_path):
+    path = str(tmp_path / "index_version.json")
+    versions = IndexVersion(path)
+    assert versions.current() == ""
+    first = publish_index_version(path, stage="bm25")
+    assert versions.current() == first
+    second = publish_index_version(path, stage="azure")
+    assert second != first and versions.current() == second
+
+
+def test_index_version_is_only_published_when_the_content_changed(tmp_path):
+    path = str(tmp_path / "index_version.json")
+    versions = IndexVersion(path)
+    assert publish_index_changes({"bm25": False, "embeddings": False, "azure": None}, path) == ""
+    first = publish_index_changes({"bm25": True, "embeddings": True, "azure": False}, path)
+    assert first and versions.current() == first
+    with open(path, encoding='utf-8') as file:
+        assert json.load(file)["stages"] == ["bm25", "embeddings"]
+
+    # A run that re-indexes the same content keeps the version
+    assert publish_index_changes({"bm25": False, "embeddings": False, "azure": False}, path) == first
+    assert versions.current() == first
+    assert publish_index_changes({"azure": True}, path) != first
+
+
+def test_cached_retriever_answers_repeated_questions_until_a_new_index(tmp_path, monkeypatch):
+    fake = CountingRetriever()
+    monkeypatch.setitem(retrievers.BACKENDS, "fake", CountingRetriever)
+    monkeypatch.setitem(retrievers._retrievers, "fake", fake)
+    path = str(tmp_path / "index_version.json")
+    cache = MemoryCache()
+    retriever = CachedRetriever("fake", cache, IndexVersion(path))
+
+    first = retriever.search("How do I submit jobs?", top=3)
+    assert retriever.search("  how do i submit JOBS ", top=3) == first
+    assert len(fake.queries) == 1
+    retriever.search("How do I submit jobs?", top=5)  # Another number of results is another entry
+    assert len(fake.queries) == 2
+
+    publish_index_version(path)
+    assert retriever.search("How do I submit jobs?", top=3) != first
+    assert len(fake.queries) == 3
+    assert cache.stats()["invalidated"] == 2
+    assert normalize_query("What is HPC?") == normalize_query("what is  hpc")
+
+
+def test_cache_can_be_turned_off(monkeypatch):
+    monkeypatch.setattr(retrievers, "RETRIEVAL_CACHE", "off")
+    assert isinstance(get_cached_retriever("bm25"), retrievers.BM25Retriever)
+    assert retrievers.retrieval_cache_stats() == {}
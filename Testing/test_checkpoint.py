@@ -0,0 +1,91 @@
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import threading
+import pytest
+from src.data_pipeline import checkpoint as checkpoint_module
+from src.data_pipeline.checkpoint import CrawlCheckpoint, checkpoint_path, prune_checkpoints
+from src.data_pipeline.crawler import crawl_sections
+from src.data_pipeline.page_store import PageStore
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+CRAWL_SCRIPT = textwrap.dedent("""
+    import sys
+    from src.data_pipeline.checkpoint import CrawlCheckpoint
+    from src.data_pipeline.crawler import crawl_sections
+    from src.data_pipeline.page_store import PageStore
+    crawl_sections({'section-1': [sys.argv[1]]}, workers=1, page_store=PageStore(),
+                   checkpoint=CrawlCheckpoint(sys.argv[2]))
+""")
+
+
+@pytest.fixture
+def chain_site(fixture_site):
+    """A section whose pages link to each other in a chain, plus leaf pages."""
+    for i in range(6):
+        fixture_site.add_html(f"/docs/jobs/{'p/' * i}", f"Page {i}", ["p/", f"leaf-{i}.html", "/docs/glossary.html"])
+        fixture_site.add_html(f"/docs/jobs/{'p/' * i}leaf-{i}.html", f"Leaf {i}")
+    fixture_site.add_html("/docs/glossary.html", "Glossary")
+    return fixture_site
+
+
+def test_killed_crawl_resumes_without_refetching(chain_site, tmp_path):
+    checkpoint_file = str(tmp_path / "crawl.sqlite")
+    root = chain_site.url("/docs/jobs/")
+    served = []
+    killed = threading.Event()
+    child = subprocess.Popen([sys.executable, "-c", CRAWL_SCRIPT, root, checkpoint_file], cwd=PROJECT_ROOT)
+
+    def kill_partway(path):
+        # With a single worker the next request is only sent once the previous page is checkpointed
+        if killed.is_set():
+            return False
+        if len(served) == 5:
+            child.send_signal(signal.SIGKILL)
+            child.wait()
+            killed.set()
+            return False
+        served.append(path)
+
+    chain_site.before_request = kill_partway
+    child.wait(timeout=60)
+    assert killed.is_set(), "the crawl finished before it could be interrupted"
+    chain_site.before_request = None
+
+    page_store = PageStore()
+    links = crawl_sections({'section-1': [root]}, workers=2, page_store=page_store,
+                           checkpoint=CrawlCheckpoint(checkpoint_file, resume=True))
+
+    # Every page (and the missing page linked from the last one) was requested exactly once
+    # across the killed and the resumed crawl
+    assert len(chain_site.requests) == 14
+    assert all(count == 1 for count in chain_site.requests.values()), chain_site.requests
+    assert chain_site.url("/docs/jobs/p/p/p/p/p/leaf-5.html") in links['section-1']
+    assert chain_site.url("/docs/jobs/leaf-0.html") in links['section-1']
+    assert len(page_store) == 14
+
+
+def test_fresh_checkpoint_discards_previous_state(chain_site, tmp_path):
+    checkpoint_file = str(tmp_path / "crawl.sqlite")
+    sections = {'section-1': [chain_site.url("/docs/jobs/")]}
+    crawl_sections(sections, page_store=PageStore(), checkpoint=CrawlCheckpoint(checkpoint_file))
+
+    checkpoint = CrawlCheckpoint(checkpoint_file)
+    assert checkpoint.pending() == []
+    assert checkpoint.load_pages(PageStore()) == 0
+    checkpoint.clear()
+    assert not os.path.exists(checkpoint_file)
+
+
+def test_checkpoints_of_other_runs_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint_module, "checkpoint_dir", str(tmp_path))
+    for day in ("20241101", "20241102", "20241103"):
+        CrawlCheckpoint(checkpoint_path(day)).close()
+    (tmp_path / "unrelated.sqlite").write_bytes(b"")
+
+    assert prune_checkpoints(keep=checkpoint_path("20241103")) == 2
+    assert sorted(os.listdir(tmp_path)) == ["crawl-20241103.sqlite", "unrelated.sqlite"]
+    assert prune_checkpoints() == 1
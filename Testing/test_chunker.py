@@ -0,0 +1,112 @@
+import glob
+import json
+import os
+from src.data_pipeline.chunker import MAX_CHUNK_BYTES, chunk_file, count_tokens, iter_pages, pack_lines
+from src.data_pipeline.extract import extract_text_lxml
+from src.data_pipeline.manifest import MANIFEST_NAME
+from src.data_pipeline.preprocess import preprocess_data
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "html")
+SEPARATOR = "=" * 80
+
+
+def write_section(path, pages):
+    """Write a raw section file in the format produced by `scrape_and_save`."""
+    with open(path, 'w', encoding='utf-8') as file:
+        for url, text in pages:
+            if text is None:
+                file.write(f"Failed to retrieve content from: {url}\n\n{SEPARATOR}\n\n")
+            else:
+                file.write(f"URL: {url}\n\n{text}\n\n{SEPARATOR}\n\n")
+
+
+def fixture_text(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as file:
+        return extract_text_lxml(file.read())
+
+
+def test_chunks_follow_pages_and_headings(tmp_path):
+    path = str(tmp_path / "section-2_scraped_content.txt")
+    write_section(path, [
+        ("https://docs/runningjobs/batch.html", fixture_text("batch.html")),
+        ("https://docs/runningjobs/missing.html", None),
+        ("https://docs/glossary.html", fixture_text("glossary.html")),
+    ])
+    assert [url for url, _ in iter_pages(path)] == ["https://docs/runningjobs/batch.html", "https://docs/glossary.html"]
+
+    chunks = list(chunk_file(path, max_tokens=64, overlap=8))
+    assert {chunk["section"] for chunk in chunks} == {"section-2"}
+    arrays = [chunk for chunk in chunks if chunk["heading"].endswith("Job Arrays")]
+    assert arrays and arrays[0]["heading"] == "Interactive and Batch Mode > Batch Jobs > Job Arrays"
+    assert arrays[0]["source_url"] == "https://docs/runningjobs/batch.html"
+    assert arrays[0]["content"].startswith("### Job Arrays\n")
+    assert "--array" in arrays[0]["content"]  # Case and punctuation are kept
+    for chunk in chunks:
+        assert count_tokens(chunk["content"]) <= 64
+        if chunk["source_url"].endswith("glossary.html"):
+            assert "srun" not in chunk["content"]  # Chunks never cross a page boundary
+
+
+def test_pack_lines_budget_and_overlap():
+    lines = [" ".join(f"w{i}_{j}" for j in range(10)) for i in range(20)]
+    chunks = pack_lines(lines, max_tokens=50, overlap=5)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.split()[:5] == previous.split()[-5:]
+    # Without overlap every line appears exactly once
+    assert "\n".join(pack_lines(lines, max_tokens=50, overlap=0)).split("\n") == lines
+
+    long_line = " ".join(f"x{i}" for i in range(500))
+    pieces = pack_lines([long_line], max_tokens=40, overlap=0)
+    assert " ".join(pieces).split() == long_line.split()
+    assert all(count_tokens(piece) <= 40 for piece in pieces)
+
+
+def test_oversized_lines_words_and_headings_are_split(tmp_path):
+    # A token run without spaces, and a single very long token
+    run = "-".join(f"opt{i}" for i in range(300))
+    blob = "A" * 30000
+    pieces = pack_lines([f"start {run} end", blob], max_tokens=40, overlap=0)
+    assert all(count_tokens(piece) <= 40 and len(piece.encode('utf-8')) <= MAX_CHUNK_BYTES for piece in pieces)
+    assert "".join("".join(pieces).split()) == f"start{run}end{blob}"  # Nothing is lost
+
+    path = str(tmp_path / "section-1_scraped_content.txt")
+    heading = "# " + " ".join(f"Heading{i}" for i in range(100))
+    write_section(path, [("https://docs/long.html", f"{heading}\n{run}\n{blob}\n" + "é" * 20000)])
+    chunks = list(chunk_file(path, max_tokens=64, overlap=8))
+    assert chunks
+    for chunk in chunks:
+        assert count_tokens(chunk["content"]) <= 64
+        assert len(chunk["content"].encode('utf-8')) <= MAX_CHUNK_BYTES
+        assert chunk["content"].startswith("# Heading0 ")
+    assert sum(chunk["content"].count("é") for chunk in chunks) >= 20000
+
+
+def test_preprocess_chunks_mode(tmp_path):
+    raw = tmp_path / "raw" / "section-1"
+    raw.mkdir(parents=True)
+    write_section(str(raw / "section-1_scraped_content.txt"),
+                  [("https://docs/connecting.html", fixture_text("connecting.html"))])
+
+    preprocess_data(str(tmp_path / "raw"), str(tmp_path / "processed"), workers=1, mode="chunks")
+
+    documents = []
+    for path in glob.glob(str(tmp_path / "processed" / "*.json")):
+        if os.path.basename(path) == MANIFEST_NAME:
+            continue
+        with open(path, 'r', encoding='utf-8') as file:
+            documents.append(json.load(file))
+    assert documents
+    for document in documents:
+        assert set(document) == {"id", "content", "source_url", "section", "heading"}
+        assert document["source_url"] == "https://docs/connecting.html"
+        assert document["section"] == "section-1"
+
+
+def test_index_documents_are_projected_on_index_fields():
+    from src.data_pipeline.index_data import project_document
+    chunk = {"id": "a_0", "content": "text", "source_url": "https://docs/", "section": "section-1", "heading": ""}
+    assert project_document(chunk) == {"id": "a_0", "content": "text"}
+    assert project_document(chunk, ["id", "content", "source_url", "title"]) == {
+        "id": "a_0", "content": "text", "source_url": "https://docs/"}
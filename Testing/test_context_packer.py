@@ -0,0 +1,115 @@
+import os
+
+import pytest
+from src.model import context_packer
+from src.model.context_packer import Tokenizer, pack_context, trim_passage
+from src.model.system_prompt import create_system_prompt
+
+JOBS = "Submit batch jobs to the Slurm scheduler with sbatch. Check the queue with squeue."
+GPUS = "Request GPUs on the gpu partition with the gres option. Each GPU job gets one GPU by default."
+STORAGE = "Scratch storage is purged every month. Keep your data in your home directory."
+LONG = " ".join(f"Sentence {i} about module load and the software environment." for i in range(100))
+
+
+class FakeCollector:
+    def __init__(self):
+        self.metrics = {}
+
+    def add_metric(self, key, value, model=None):
+        self.metrics[key] = value
+
+
+@pytest.fixture
+def tokenizer(monkeypatch):
+    monkeypatch.setattr(context_packer, "tiktoken", None)
+    return Tokenizer()
+
+
+def test_approximate_tokenizer_counts_and_truncates(tokenizer):
+    assert tokenizer.count("Use sbatch, then squeue.") == 6
+    assert tokenizer.truncate("Use sbatch, then squeue.", 3) == "Use sbatch,"
+    assert tokenizer.truncate("short", 10) == "short"
+    assert tokenizer.truncate("short", 0) == ""
+
+
+def test_encoding_is_read_from_the_cache_dir_and_falls_back_with_a_warning(monkeypatch, tmp_path, capsys):
+    class FakeTiktoken:
+        def __init__(self, online):
+            self.online = online
+
+        def get_encoding(self, name):
+            if not self.online:
+                raise ConnectionError("offline")
+            return ("encoding", name, os.environ["TIKTOKEN_CACHE_DIR"])
+
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", "elsewhere")
+    monkeypatch.setattr(context_packer, "tiktoken", FakeTiktoken(online=True))
+    tokenizer = Tokenizer(cache_dir=str(tmp_path / "tiktoken"))
+    assert tokenizer.name == "tiktoken"
+    assert tokenizer.encoding == ("encoding", "cl100k_base", str(tmp_path / "tiktoken"))
+    assert os.environ["TIKTOKEN_CACHE_DIR"] == "elsewhere"  # Restored for other tiktoken users
+
+    monkeypatch.setattr(context_packer, "tiktoken", FakeTiktoken(online=False))
+    tokenizer = Tokenizer(cache_dir=str(tmp_path / "tiktoken"))
+    assert tokenizer.name == "approximate" and tokenizer.count("Use sbatch, then squeue.") == 6
+    assert "WARNING: tiktoken encoding cl100k_base" in capsys.readouterr().out
+
+    monkeypatch.delenv("TIKTOKEN_CACHE_DIR")
+    assert Tokenizer(cache_dir=str(tmp_path / "tiktoken")).name == "approximate"
+    assert "TIKTOKEN_CACHE_DIR" not in os.environ
+    capsys.readouterr()
+
+    monkeypatch.setattr(context_packer, "tiktoken", None)
+    assert Tokenizer().name == "approximate"
+    assert "WARNING: tiktoken is not installed" in capsys.readouterr().out
+
+
+def test_long_passages_are_cut_at_a_sentence_end(tokenizer):
+    text = trim_passage(LONG, 50, tokenizer)
+    assert tokenizer.count(text) <= 50 and text.endswith("environment.")
+    assert trim_passage(JOBS, 50, tokenizer) == JOBS
+
+
+def test_context_fits_the_budget_and_reports_the_tokens_saved(tokenizer):
+    passages = [JOBS, LONG, GPUS, STORAGE]
+    context, report = pack_context(passages, "How do I submit jobs?", budget=120, max_passage_tokens=60,
+                                   tokenizer=tokenizer)
+    assert tokenizer.count(context) <= 120
+    assert report["tokens_out"] == tokenizer.count(context)
+    assert report["tokens_saved"] == report["tokens_in"] - report["tokens_out"] > 0
+    assert report["trimmed"] >= 1
+    # The selected passages keep their retrieval order
+    assert context.startswith(JOBS)
+    positions = [context.find(text[:20]) for text in passages if text[:20] in context]
+    assert positions == sorted(positions)
+
+
+def test_redundant_passages_are_dropped(tokenizer):
+    copy = JOBS.replace("Check", "check")
+    context, report = pack_context([JOBS, copy, GPUS], "submit jobs", budget=1000, tokenizer=tokenizer)
+    assert report["redundant"] == 1 and report["selected"] == 2
+    assert context == f"{JOBS}\n\n{GPUS}"
+
+
+def test_mmr_prefers_a_different_passage_to_a_similar_one(monkeypatch, tokenizer):
+    monkeypatch.setattr(context_packer, "MIN_PASSAGE_TOKENS", 4)
+    similar = "Submit batch jobs to Slurm with sbatch; a job waits in the queue until it starts."
+    passages = [JOBS, similar, STORAGE]
+    budget = tokenizer.count(JOBS) + tokenizer.count(STORAGE) + 2
+    # A question sharing no word with the passages: relevance only follows the retrieval rank
+    context, _ = pack_context(passages, "cluster", budget=budget, tokenizer=tokenizer)
+    assert context == f"{JOBS}\n\n{STORAGE}"
+    # Without the diversity term the second job passage is taken, cut to the budget
+    context, _ = pack_context(passages, "cluster", budget=budget, mmr_lambda=1.0, tokenizer=tokenizer)
+    assert context.startswith(JOBS) and similar[:30] in context and STORAGE not in context
+
+
+def test_system_prompt_packs_the_context_and_records_metrics(monkeypatch, tokenizer):
+    monkeypatch.setattr(context_packer, "_tokenizer", tokenizer)
+    collector = FakeCollector()
+    context = "\n\n".join([JOBS, JOBS, GPUS])
+    prompt = create_system_prompt(context, "How do I submit jobs?", metrics=collector)
+    assert prompt.count(JOBS) == 1 and GPUS in prompt
+    assert collector.metrics["context_tokens_saved"] == tokenizer.count(JOBS) + tokenizer.count("\n\n")
+    assert create_system_prompt(context, "jobs", token_budget=None).count(JOBS) == 2
+    assert pack_context([], "jobs", tokenizer=tokenizer)[0] == ""
@@ -0,0 +1,86 @@
+import asyncio
+import re
+import pytest
+from src.data_pipeline.crawler import Crawler, crawl_sections
+from src.data_pipeline.get_all_url import fetch_and_print_links
+
+
+@pytest.fixture
+def docs_site(fixture_site):
+    """A two-section documentation site with a shared glossary page."""
+    fixture_site.add_html("/docs/jobs/", "Jobs",
+                          ["batch/", "interactive/", "#usage", "../glossary.html", "https://example.org/"])
+    fixture_site.add_html("/docs/jobs/batch/", "Batch", ["arrays/", "../", "#options"])
+    fixture_site.add_html("/docs/jobs/interactive/", "Interactive", ["../batch/#options"])
+    fixture_site.add_html("/docs/jobs/batch/arrays/", "Arrays", ["../../../glossary.html"])
+    fixture_site.add_html("/docs/gpus/", "GPUs", ["access/"])
+    fixture_site.add_html("/docs/gpus/access/", "Access", ["../../glossary.html"])
+    fixture_site.add_html("/docs/glossary.html", "Glossary")
+    return fixture_site
+
+
+def test_crawl_collects_section_links(docs_site):
+    sections = {
+        'section-1': [docs_site.url("/docs/jobs/")],
+        'section-2': [docs_site.url("/docs/gpus/")],
+    }
+    links = crawl_sections(sections, workers=4)
+
+    assert set(links['section-1']) >= {
+        docs_site.url("/docs/jobs/batch/"),
+        docs_site.url("/docs/jobs/batch/arrays/"),
+        docs_site.url("/docs/glossary.html"),
+        "https://example.org/",
+    }
+    assert docs_site.url("/docs/gpus/access/") in links['section-2']
+    # Links outside the page they were found on are reported but never followed
+    assert docs_site.requests["/docs/glossary.html"] == 0
+
+
+def test_crawl_fetches_each_page_once_per_section(docs_site):
+    sections = {'section-1': [docs_site.url("/docs/jobs/")]}
+    crawler = Crawler(workers=4)
+    asyncio.run(crawler.crawl(sections))
+
+    assert crawler.pages_fetched == 4
+    assert all(count == 1 for count in docs_site.requests.values())
+    assert crawler.pages_per_second > 0
+
+
+def test_crawl_respects_max_depth(docs_site):
+    sections = {'section-1': [docs_site.url("/docs/jobs/")]}
+    crawl_sections(sections, max_depth=1)
+    assert docs_site.requests["/docs/jobs/batch/"] == 1
+    assert docs_site.requests["/docs/jobs/batch/arrays/"] == 0
+
+
+def test_fetch_and_print_links_keeps_contract(docs_site):
+    sections = {'section-2': [docs_site.url("/docs/gpus/")]}
+    links = fetch_and_print_links(sections)
+    assert isinstance(links, dict)
+    assert isinstance(links['section-2'], list)
+    assert docs_site.url("/docs/gpus/access/") in links['section-2']
+
+
+def test_single_pass_crawl_and_extract(docs_site, tmp_path, monkeypatch):
+    from src.data_pipeline import arrange
+    from src.data_pipeline.page_store import PageStore
+
+    monkeypatch.setattr(arrange, "base_dir", str(tmp_path))
+    sections = {
+        'section-1': [docs_site.url("/docs/jobs/")],
+        'section-2': [docs_site.url("/docs/gpus/")],
+    }
+    page_store = PageStore()
+    links = fetch_and_print_links(sections, page_store=page_store)
+    arrange.arrange_scraped_data(links, page_store)
+
+    # Every page, including the glossary shared by both sections, is downloaded exactly once
+    assert docs_site.requests["/docs/glossary.html"] == 1
+    assert all(count == 1 for path, count in docs_site.requests.items())
+    for section in sections:
+        content = (tmp_path / section / f"{section}_scraped_content.txt").read_text()
+        assert "Glossary" in content
+    section_1 = (tmp_path / 'section-1' / 'section-1_scraped_content.txt').read_text()
+    batch_url = re.escape(docs_site.url('/docs/jobs/batch/'))
+    assert len(re.findall(rf"URL: {batch_url}(#\w+)?\n", section_1)) == 1
@@ -0,0 +1,95 @@
+import random
+from unittest.mock import MagicMock
+from src.data_pipeline.dedup import MinHasher, dedup_data, find_duplicates, lsh_params
+from src.data_pipeline.index_data import BatchIndexer, add_documents, blob_documents
+from src.data_pipeline.manifest import ProcessedManifest
+from src.data_pipeline.preprocess import preprocess_data
+from src.data_pipeline.shards import ShardWriter
+
+SEPARATOR = "=" * 80
+
+WORDS = ("job scheduler slurm partition node gpu cluster memory storage module load submit batch "
+         "array interactive session account quota scratch home directory").split()
+
+
+def text(seed, words=120):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def edit(content, changes, seed=0):
+    rng = random.Random(seed)
+    words = content.split()
+    for _ in range(changes):
+        words[rng.randrange(len(words))] = "changed"
+    return " ".join(words)
+
+
+def test_lsh_params_split_the_signature_below_the_threshold():
+    for threshold in (0.5, 0.8, 0.9):
+        bands, rows = lsh_params(threshold)
+        assert bands * rows == 128
+        assert (1 / bands) ** (1 / rows) <= threshold
+
+
+def test_signatures_estimate_jaccard_similarity():
+    hasher = MinHasher()
+    base = text(1)
+    assert (hasher.signature(base) == hasher.signature(base)).all()
+    assert (hasher.signature(base) == hasher.signature(text(2))).mean() < 0.2
+
+
+def test_near_duplicates_are_grouped_and_the_first_is_kept():
+    glossary = text(1)
+    documents = [
+        {"id": "glossary-section-1", "content": glossary},
+        {"id": "jobs", "content": text(2)},
+        {"id": "glossary-section-3", "content": edit(glossary, 1)},
+        {"id": "glossary-section-5", "content": edit(glossary, 2, seed=1)},
+        {"id": "glossary-section-1", "content": glossary},  # Same ID, read once
+        {"id": "gpus", "content": text(3)},
+    ]
+    total, duplicates = find_duplicates(documents, threshold=0.8)
+    assert total == 5
+    assert duplicates == {"glossary-section-3": "glossary-section-1", "glossary-section-5": "glossary-section-1"}
+    assert find_duplicates(documents, threshold=0.99)[1] == {}
+    assert find_duplicates([], threshold=0.8) == (0, {})
+
+
+def test_dedup_data_records_duplicates_in_the_manifest(tmp_path):
+    raw, processed = tmp_path / "raw", tmp_path / "processed"
+    glossary = text(1)
+    for section, extra, changes in (("section-1", text(2), 0), ("section-2", text(3), 1)):
+        folder = raw / section
+        folder.mkdir(parents=True)
+        with open(folder / f"{section}_scraped_content.txt", 'w', encoding='utf-8') as file:
+            for url, page in ((f"https://docs/{section}/glossary.html", edit(glossary, changes)),
+                              (f"https://docs/{section}/page.html", extra)):
+                file.write(f"URL: {url}\n\n# Page\n{page}\n\n{SEPARATOR}\n\n")
+    preprocess_data(str(raw), str(processed), workers=1, mode="chunks")
+
+    report = dedup_data(str(processed), threshold=0.8)
+    assert report["documents"] == 4 and report["duplicates"] == 1 and report["kept"] == 3
+    manifest = ProcessedManifest(str(processed))
+    assert len(manifest.duplicates) == 1
+    assert manifest.indexed_documents() == manifest.documents() - set(manifest.duplicates)
+
+    # Reprocessing keeps the duplicates of documents that are still produced
+    preprocess_data(str(raw), str(processed), workers=1, mode="chunks")
+    assert ProcessedManifest(str(processed)).duplicates == manifest.duplicates
+
+
+def test_indexer_skips_duplicates(tmp_path):
+    path = str(tmp_path / "section-1.jsonl")
+    writer = ShardWriter(path)
+    for i in range(3):
+        writer.write({"id": f"doc-{i}", "content": f"chunk {i}"})
+    writer.close()
+
+    search_client = MagicMock()
+    indexer = BatchIndexer(search_client)
+    with open(path, 'rb') as file:
+        assert add_documents(indexer, blob_documents("section-1.jsonl", file.read()), skip_ids={"doc-1"}) == 2
+    indexer.close()
+    sent = search_client.upload_documents.call_args.kwargs["documents"]
+    assert [document["id"] for document in sent] == ["doc-0", "doc-2"]
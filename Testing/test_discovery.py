@@ -0,0 +1,109 @@
+import zlib
+import pytest
+from src.data_pipeline.discovery import (ManifestDiscovery, parse_sphinx_inventory, parse_sitemap,
+                                         section_scope, discover_section_pages)
+from src.data_pipeline.get_all_url import fetch_and_print_links
+from src.data_pipeline.page_store import PageStore
+
+
+def make_inventory(entries):
+    header = (b"# Sphinx inventory version 2\n"
+              b"# Project: NURC RTD\n"
+              b"# Version: \n"
+              b"# The remainder of this file is compressed using zlib.\n")
+    return header + zlib.compress("\n".join(entries).encode("utf-8"))
+
+
+INVENTORY = make_inventory([
+    "gpus/index std:doc -1 gpus/index.html GPUs on the HPC",
+    "gpus/gpuaccess std:doc -1 gpus/gpuaccess.html GPU Access",
+    "gpu-access std:label -1 gpus/gpuaccess.html#$ GPU Access",
+    "glossary std:doc -1 glossary.html Glossary",
+    "runningjobs/index std:doc -1 runningjobs/index.html Running Jobs",
+])
+
+
+@pytest.fixture
+def sphinx_site(fixture_site):
+    fixture_site.add_page("/en/latest/objects.inv", INVENTORY, content_type="application/octet-stream")
+    fixture_site.add_page("/en/latest/sitemap.xml",
+                          '<?xml version="1.0" encoding="UTF-8"?>'
+                          '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                          f'<url><loc>{fixture_site.url("/en/latest/gpus/multigpu.html")}</loc></url>'
+                          f'<url><loc>{fixture_site.url("/en/latest/gpus/index.html")}</loc></url>'
+                          '</urlset>', content_type="application/xml")
+    for path in ("gpus/index.html", "gpus/gpuaccess.html", "gpus/multigpu.html", "glossary.html",
+                 "runningjobs/index.html"):
+        fixture_site.add_html(f"/en/latest/{path}", path)
+    return fixture_site
+
+
+def test_parse_sphinx_inventory():
+    assert parse_sphinx_inventory(INVENTORY) == [
+        "gpus/index.html", "gpus/gpuaccess.html", "glossary.html", "runningjobs/index.html"]
+    with pytest.raises(ValueError):
+        parse_sphinx_inventory(b"# Sphinx inventory version 1\n\n\n\n")
+
+
+def test_parse_sphinx_inventory_skips_generated_index_and_search_pages():
+    inventory = make_inventory([
+        "genindex std:label -1 genindex.html Index",
+        "modindex std:label -1 py-modindex.html Module Index",
+        "py-modindex std:label -1 py-modindex.html Python Module Index",
+        "search std:label -1 search/ Search Page",
+        "glossary std:doc -1 glossary.html Glossary",
+        "searching-files std:label -1 storage/searching.html#$ Searching files",
+    ])
+    assert parse_sphinx_inventory(inventory) == ["glossary.html", "storage/searching.html"]
+
+
+def test_parse_sitemap_index():
+    pages, sitemaps = parse_sitemap(
+        b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        b'<sitemap><loc>https://example.org/en/sitemap.xml</loc></sitemap></sitemapindex>')
+    assert pages == []
+    assert sitemaps == ["https://example.org/en/sitemap.xml"]
+
+
+def test_section_scope():
+    assert section_scope("https://x.org/en/latest/gpus/index.html#") == "https://x.org/en/latest/gpus/"
+    assert section_scope("https://x.org/en/latest/gpus/") == "https://x.org/en/latest/gpus/"
+    assert section_scope("https://x.org/en/latest/glossary.html") == "https://x.org/en/latest/glossary.html"
+
+
+def test_discovery_from_manifests(sphinx_site):
+    discovery = ManifestDiscovery()
+    sections = {
+        'section-3': [sphinx_site.url("/en/latest/gpus/index.html")],
+        'section-10': [sphinx_site.url("/en/latest/glossary.html")],
+    }
+    discovered, missing = discover_section_pages(sections, discovery)
+
+    assert missing == {}
+    assert sorted(discovered['section-3']) == sorted(sphinx_site.url(f"/en/latest/gpus/{page}")
+                                                     for page in ("index.html", "gpuaccess.html", "multigpu.html"))
+    assert discovered['section-10'] == [sphinx_site.url("/en/latest/glossary.html")]
+    # The manifests are fetched once for the whole run, and no page is crawled
+    assert sphinx_site.requests["/en/latest/objects.inv"] == 1
+    assert sphinx_site.requests["/en/latest/gpus/index.html"] == 0
+
+
+def test_manifest_mode_prefetches_pages(sphinx_site):
+    page_store = PageStore()
+    links = fetch_and_print_links({'section-3': [sphinx_site.url("/en/latest/gpus/index.html")]},
+                                  page_store=page_store, discovery="manifest")
+    assert len(links['section-3']) == 3
+    assert all(link in page_store for link in links['section-3'])
+
+
+def test_manifest_mode_falls_back_to_crawling(fixture_site):
+    fixture_site.add_html("/docs/gpus/", "GPUs", ["access/"])
+    fixture_site.add_html("/docs/gpus/access/", "Access")
+    links = fetch_and_print_links({'section-3': [fixture_site.url("/docs/gpus/")]}, discovery="manifest")
+    assert links['section-3'] == [fixture_site.url("/docs/gpus/access/")]
+    assert fixture_site.requests["/docs/gpus/"] == 1
+
+
+def test_unknown_discovery_mode():
+    with pytest.raises(ValueError):
+        fetch_and_print_links({}, discovery="guess")
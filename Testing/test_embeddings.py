@@ -0,0 +1,58 @@
+import numpy as np
+from src.model.embeddings import EmbeddingStore, HashingEmbedder
+
+DOCUMENTS = [
+    {"id": "jobs", "content": "Submit batch jobs to the Slurm scheduler with sbatch and check them with squeue."},
+    {"id": "jobs-copy", "content": "Submit batch jobs to the Slurm scheduler with sbatch; check them with squeue!"},
+    {"id": "gpus", "content": "Request GPUs on the gpu partition with the gres option."},
+    {"id": "storage", "content": "Scratch storage is purged every month, keep data in your home directory."},
+]
+
+
+def test_embeddings_are_deterministic_normalized_and_similarity_preserving():
+    embedder = HashingEmbedder()
+    vectors = embedder.embed([document["content"] for document in DOCUMENTS] + [""])
+    assert vectors.shape == (5, 256) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors[:4], axis=1), 1, atol=1e-5)
+    assert not vectors[4].any()  # No words
+    assert np.array_equal(vectors, HashingEmbedder().embed([document["content"] for document in DOCUMENTS] + [""]))
+
+    similarity = vectors[:4] @ vectors[:4].T
+    assert similarity[0, 1] > 0.9
+    assert similarity[0, 2] < 0.5 and similarity[0, 3] < 0.5
+
+
+def test_embedders_share_one_projection():
+    first, second = HashingEmbedder(dim=64, buckets=1024, seed=3), HashingEmbedder(dim=64, buckets=1024, seed=3)
+    assert first.projection is second.projection
+    assert not first.projection.flags.writeable
+    assert HashingEmbedder(dim=64, buckets=1024, seed=4).projection is not first.projection
+
+
+def test_store_updates_incrementally(tmp_path):
+    embedder = HashingEmbedder(dim=64, buckets=1024)
+    store = EmbeddingStore(str(tmp_path))
+    first = store.update(DOCUMENTS[:3], embedder)
+    assert (first["embedded"], first["reused"], first["removed"]) == (3, 0, 0)
+    assert first["chunks_per_second"] > 0
+
+    store = EmbeddingStore(str(tmp_path))
+    assert isinstance(store.vectors, np.memmap) and store.vectors.dtype == np.float16
+    assert store.ids == ["jobs", "jobs-copy", "gpus"]
+
+    # One chunk gone, one new: only the new one is embedded
+    second = store.update([DOCUMENTS[0], DOCUMENTS[2], DOCUMENTS[3], DOCUMENTS[3]], embedder)
+    assert (second["documents"], second["embedded"], second["reused"], second["removed"]) == (3, 1, 2, 1)
+    store = EmbeddingStore(str(tmp_path))
+    assert store.ids == ["jobs", "gpus", "storage"]
+    expected = embedder.embed([DOCUMENTS[0]["content"], DOCUMENTS[2]["content"], DOCUMENTS[3]["content"]])
+    assert np.allclose(store.vectors, expected, atol=1e-3)
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_store_is_rebuilt_for_another_embedder(tmp_path):
+    EmbeddingStore(str(tmp_path)).update(DOCUMENTS, HashingEmbedder(dim=64, buckets=1024))
+    report = EmbeddingStore(str(tmp_path)).update(DOCUMENTS, HashingEmbedder(dim=32, buckets=1024), dtype="float32")
+    assert report["embedded"] == 4 and report["reused"] == 0
+    store = EmbeddingStore(str(tmp_path))
+    assert store.vectors.shape == (4, 32) and store.vectors.dtype == np.float32
@@ -0,0 +1,43 @@
+import os
+import pytest
+from src.data_pipeline.extract import extract_text, extract_text_bs4, extract_text_lxml, get_extractor
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'html')
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as file:
+        return file.read()
+
+
+def test_lxml_keeps_only_main_article():
+    text = extract_text_lxml(read_fixture('connecting.html'))
+    assert "The following sections on this page will guide you" in text
+    for chrome in ("Toggle Light / Dark / Auto color theme", "Hide navigation sidebar",
+                   "Skip to content", "Visit NURC Homepage", "Made with", "On this page"):
+        assert chrome not in text
+    # The bs4 extractor still returns the whole page
+    assert "Toggle Light / Dark / Auto color theme" in extract_text_bs4(read_fixture('connecting.html'))
+
+
+def test_lxml_keeps_headings_as_structure():
+    lines = extract_text_lxml(read_fixture('batch.html')).splitlines()
+    assert lines[0] == "# Interactive and Batch Mode"
+    assert "## Batch Jobs" in lines
+    assert "### Job Arrays" in lines
+    assert "srun --partition=short --nodes=1 --pty /bin/bash" in lines
+    assert "Job arrays let you submit many similar jobs at once with --array." in lines
+    assert not any("¶" in line for line in lines)
+
+
+def test_lxml_without_main_element_drops_chrome():
+    html = b"<html><body><nav>Menu</nav><p>Hello <b>world</b></p><footer>Copyright</footer></body></html>"
+    assert extract_text_lxml(html) == "Hello world"
+    assert extract_text_lxml(b"") == ""
+
+
+def test_get_extractor():
+    assert extract_text(b"<p>a</p>", extractor="bs4") == "a"
+    assert get_extractor("lxml") is extract_text_lxml
+    with pytest.raises(ValueError):
+        get_extractor("regex")
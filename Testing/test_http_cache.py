@@ -0,0 +1,56 @@
+from src.data_pipeline import arrange
+from src.data_pipeline.http_cache import HttpCache
+from src.data_pipeline.page_store import PageStore
+from src.data_pipeline.scrape import get_page
+from src.data_pipeline.get_all_url import fetch_and_print_links
+
+
+def test_cache_round_trip(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    assert cache.lookup("https://example.org/a.html") is None
+    assert cache.conditional_headers("https://example.org/a.html") == {}
+
+    changed = cache.store("https://example.org/a.html", b"<p>a</p>",
+                          {"Content-Type": "text/html", "ETag": '"v1"', "Last-Modified": "Mon, 04 Nov 2024 10:00:00 GMT"})
+    assert changed
+    assert cache.lookup("https://example.org/a.html").body == b"<p>a</p>"
+    assert cache.conditional_headers("https://example.org/a.html") == {
+        "If-None-Match": '"v1"', "If-Modified-Since": "Mon, 04 Nov 2024 10:00:00 GMT"}
+
+    # Storing an identical body is not a change
+    assert not cache.store("https://example.org/a.html", b"<p>a</p>", {"ETag": '"v1"'})
+
+
+def test_not_modified_pages_are_served_from_cache(fixture_site, tmp_path):
+    fixture_site.add_html("/docs/faq.html", "FAQ", text="How do I log in?")
+    fixture_site.pages["/docs/faq.html"][2]["ETag"] = '"faq-1"'
+    url = fixture_site.url("/docs/faq.html")
+
+    first = get_page(url, PageStore(http_cache=HttpCache(str(tmp_path))))
+    assert first.changed
+
+    second = get_page(url, PageStore(http_cache=HttpCache(str(tmp_path))))
+    assert fixture_site.not_modified["/docs/faq.html"] == 1
+    assert not second.changed
+    assert second.body == first.body
+
+
+def test_unchanged_sections_are_not_rewritten(fixture_site, tmp_path, monkeypatch):
+    monkeypatch.setattr(arrange, "base_dir", str(tmp_path / "raw"))
+    fixture_site.add_html("/docs/gpus/", "GPUs", ["access.html"])
+    fixture_site.add_html("/docs/gpus/access.html", "Access")
+    for path in ("/docs/gpus/", "/docs/gpus/access.html"):
+        fixture_site.pages[path][2]["ETag"] = f'"{path}"'
+    sections = {'section-3': [fixture_site.url("/docs/gpus/")]}
+    section_file = tmp_path / "raw" / "section-3" / "section-3_scraped_content.txt"
+
+    def run():
+        page_store = PageStore(http_cache=HttpCache(str(tmp_path / "cache")))
+        arrange.arrange_scraped_data(fetch_and_print_links(sections, page_store=page_store), page_store)
+        return page_store
+
+    assert run().changed_urls()
+    section_file.write_text("sentinel")
+    assert run().changed_urls() == []
+    assert section_file.read_text() == "sentinel"
+    assert fixture_site.not_modified["/docs/gpus/access.html"] == 1
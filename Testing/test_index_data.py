@@ -0,0 +1,219 @@
+import json
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from src.data_pipeline.index_data import (AZURE_INDEX_FIELDS, BatchIndexer, index_data_in_search,
+                                          indexed_keys, iter_blob_documents, plan_delta, sync_index)
+from src.data_pipeline.manifest import ProcessedManifest
+from src.data_pipeline.shards import ShardWriter
+
+ENV = {
+    'AZURE_BLOB_STORAGE_URL': 'https://test.blob.core.windows.net',
+    'AZURE_BLOB_KEY': 'test-blob-key',
+    'AZURE_SEARCH_ENDPOINT': 'https://test.search.windows.net',
+    'AZURE_SEARCH_KEY': 'test-search-key',
+}
+
+
+class FakeSearchClient:
+    """Records the batches it receives; `failures` maps a key to the statuses of its next attempts."""
+
+    def __init__(self, failures=None, raise_first=0):
+        self.batches = []
+        self.failures = failures or {}
+        self.raise_first = raise_first
+
+    def upload_documents(self, documents):
+        if self.raise_first:
+            self.raise_first -= 1
+            raise IOError("service unavailable")
+        self.batches.append([document["id"] for document in documents])
+        results = []
+        for document in documents:
+            statuses = self.failures.get(document["id"], [])
+            status = statuses.pop(0) if statuses else 201
+            results.append(SimpleNamespace(key=document["id"], succeeded=status < 300, status_code=status,
+                                           error_message=None if status < 300 else f"status {status}"))
+        return results
+
+
+def documents(n, size=10):
+    return [{"id": f"doc-{i}", "content": "x" * size} for i in range(n)]
+
+
+def test_batches_are_bounded_by_count_and_size():
+    client = FakeSearchClient()
+    indexer = BatchIndexer(client, max_documents=3)
+    for document in documents(7):
+        indexer.add(document)
+    assert indexer.close()["indexed"] == 7
+    assert [len(batch) for batch in client.batches] == [3, 3, 1]
+
+    client = FakeSearchClient()
+    indexer = BatchIndexer(client, max_bytes=300)
+    for document in documents(5, size=100):
+        indexer.add(document)
+    indexer.close()
+    assert [len(batch) for batch in client.batches] == [2, 2, 1]
+
+
+def test_only_failed_keys_are_retried():
+    client = FakeSearchClient(failures={"doc-1": [503], "doc-3": [429, 503], "doc-4": [400]})
+    delays = []
+    indexer = BatchIndexer(client, sleep=delays.append)
+    for document in documents(5):
+        indexer.add(document)
+    stats = indexer.close()
+    assert client.batches == [["doc-0", "doc-1", "doc-2", "doc-3", "doc-4"], ["doc-1", "doc-3"], ["doc-3"]]
+    assert stats == {"indexed": 4, "failed": 1, "retried": 3, "batches": 3}
+    assert indexer.failed_keys == ["doc-4"]  # 400 is not retried
+    assert delays == [1.0, 2.0]
+
+
+def test_failed_requests_are_retried_then_given_up():
+    client = FakeSearchClient(raise_first=1)
+    indexer = BatchIndexer(client, sleep=lambda delay: None)
+    indexer.add(documents(1)[0])
+    assert indexer.close()["indexed"] == 1
+
+    client = FakeSearchClient(failures={"doc-0": [503] * 10})
+    indexer = BatchIndexer(client, max_retries=2, sleep=lambda delay: None)
+    indexer.add(documents(1)[0])
+    assert indexer.close()["failed"] == 1 and len(client.batches) == 3
+
+
+def test_blobs_are_downloaded_concurrently_and_bad_blobs_skipped(tmp_path):
+    shard = str(tmp_path / "section-1.jsonl")
+    writer = ShardWriter(shard)
+    for document in documents(3):
+        writer.write(document)
+    writer.close()
+    blobs = {
+        "section-1.jsonl": open(shard, 'rb').read(),
+        "section-1.jsonl.index.json": b"{}",
+        "single.json": json.dumps({"id": "single", "content": "one"}).encode('utf-8'),
+        "broken.json": b"{not json",
+        "empty.json": b"",
+    }
+    container = MagicMock()
+    container.list_blobs.return_value = [SimpleNamespace(name=name) for name in blobs]
+    container.get_blob_client.side_effect = lambda blob: MagicMock(
+        download_blob=MagicMock(return_value=MagicMock(readall=MagicMock(return_value=blobs[blob.name]))))
+
+    parsed = list(iter_blob_documents(container, workers=3))
+    assert [[document["id"] for document in group] for group in parsed] == \
+        [["doc-0", "doc-1", "doc-2"], ["single"], []]
+    assert container.get_blob_client.call_count == 4  # The offset index is never downloaded
+
+
+@patch.dict(os.environ, {key: value for key, value in ENV.items() if "SEARCH" in key})
+@patch("src.data_pipeline.index_data.BlobServiceClient")
+@patch("src.data_pipeline.index_data.SearchClient")
+def test_local_folder_mode_skips_blob_storage(mock_search_client, mock_blob_service_client, tmp_path):
+    writer = ShardWriter(str(tmp_path / "section-1.jsonl"))
+    for document in documents(4):
+        writer.write(document)
+    writer.close()
+    client = FakeSearchClient()
+    mock_search_client.return_value = client
+
+    stats = index_data_in_search(local_folder=str(tmp_path), skip_ids={"doc-2"})
+    assert stats["indexed"] == 3
+    assert client.batches == [["doc-0", "doc-1", "doc-3"]]
+    mock_blob_service_client.assert_not_called()
+
+
+class FakeIndex(FakeSearchClient):
+    """An in-memory index: `search` lists its keys, and the batch actions update it."""
+
+    def __init__(self, keys=()):
+        super().__init__()
+        self.documents = {key: {"id": key} for key in keys}
+        self.actions = []
+
+    def search(self, search_text, select, order_by=None, top=None, filter=None):
+        # Supports the key ranges of `indexed_keys`: "id gt '<key>'" ordered by id, `top` per page
+        keys = sorted(self.documents)
+        if filter:
+            last = filter.split("'", 1)[1][:-1].replace("''", "'")
+            keys = [key for key in keys if key > last]
+        self.searches = getattr(self, "searches", 0) + 1
+        return [{"id": key} for key in keys[:top]]
+
+    def merge_or_upload_documents(self, documents):
+        self.actions.append(("merge_or_upload", sorted(document["id"] for document in documents)))
+        for document in documents:
+            self.documents[document["id"]] = document
+        return self.upload_documents(documents)
+
+    def delete_documents(self, documents):
+        self.actions.append(("delete", sorted(document["id"] for document in documents)))
+        for document in documents:
+            self.documents.pop(document["id"], None)
+        return self.upload_documents(documents)
+
+
+def processed_folder(tmp_path, ids, duplicates=None):
+    writer = ShardWriter(str(tmp_path / "section-1.jsonl"))
+    for doc_id in ids:
+        writer.write({"id": doc_id, "content": f"content of {doc_id}"})
+    writer.close()
+    manifest = ProcessedManifest(str(tmp_path))
+    manifest.files = {"section-1/section-1.txt": {"sha256": "0", "mode": "chunks", "format": "jsonl",
+                                                  "shard": "section-1.jsonl", "documents": list(ids)}}
+    manifest.duplicates = duplicates or {}
+    manifest.save()
+    return manifest
+
+
+def test_indexed_keys_pages_by_key_range():
+    keys = [f"doc-{i:03d}" for i in range(25)] + ["it's"]
+    index = FakeIndex(keys=keys)
+    assert indexed_keys(index, page_size=10) == set(keys)
+    assert index.searches == 3
+
+    index = FakeIndex(keys=keys[:20])
+    assert indexed_keys(index, page_size=10) == set(keys[:20])
+    assert index.searches == 3  # The last, empty page ends the listing
+    assert indexed_keys(FakeIndex(), page_size=10) == set()
+
+
+def test_plan_delta_diffs_the_manifest_and_the_index(tmp_path):
+    manifest = processed_folder(tmp_path, ["a", "b", "c", "d"], duplicates={"d": "c"})
+    plan = plan_delta(manifest, {"b", "c", "d", "old"}, fields=["id", "content"])
+    assert plan == {"adds": ["a"], "updates": ["b", "c"], "deletes": ["d", "old"]}  # Fields never synced
+
+    manifest.index = {"fields": ["id", "content"]}
+    assert plan_delta(manifest, {"b", "c", "d", "old"}, fields=["id", "content"])["updates"] == []
+
+
+@patch.dict(os.environ, {key: value for key, value in ENV.items() if "SEARCH" in key})
+@patch("src.data_pipeline.index_data.SearchClient")
+def test_sync_index_applies_the_delta_after_a_dry_run(mock_search_client, tmp_path):
+    processed_folder(tmp_path, ["a", "b", "c"], duplicates={"c": "b"})
+    index = FakeIndex(keys=["b", "c", "old-uuid"])
+    mock_search_client.return_value = index
+
+    plan = sync_index(str(tmp_path), dry_run=True)
+    assert (plan["adds"], plan["deletes"]) == (["a"], ["c", "old-uuid"])
+    assert index.actions == []
+
+    sync_index(str(tmp_path))
+    assert sorted(index.documents) == ["a", "b"]
+    assert index.actions == [("merge_or_upload", ["a", "b"]), ("delete", ["c", "old-uuid"])]
+    assert ProcessedManifest(str(tmp_path)).index["fields"] == AZURE_INDEX_FIELDS
+
+    # Nothing left to do
+    index.actions = []
+    plan = sync_index(str(tmp_path))
+    assert (plan["adds"], plan["updates"], plan["deletes"]) == ([], [], [])
+    assert index.actions == []
+
+
+@patch.dict(os.environ, {key: value for key, value in ENV.items() if "SEARCH" in key})
+@patch("src.data_pipeline.index_data.SearchClient")
+def test_sync_index_never_empties_the_index_without_a_manifest(mock_search_client, tmp_path):
+    index = FakeIndex(keys=["a", "b"])
+    mock_search_client.return_value = index
+    assert sync_index(str(tmp_path))["deletes"] == []
+    assert sorted(index.documents) == ["a", "b"]
@@ -0,0 +1,70 @@
+import json
+import os
+from src.data_pipeline.manifest import MANIFEST_NAME, document_id
+from src.data_pipeline.preprocess import preprocess_data
+
+SEPARATOR = "=" * 80
+
+
+def write_section(raw, section, pages):
+    folder = raw / section
+    folder.mkdir(parents=True, exist_ok=True)
+    with open(folder / f"{section}_scraped_content.txt", 'w', encoding='utf-8') as file:
+        for url, text in pages:
+            file.write(f"URL: {url}\n\n{text}\n\n{SEPARATOR}\n\n")
+
+
+def documents(folder):
+    return sorted(name[:-len(".json")] for name in os.listdir(folder) if name != MANIFEST_NAME)
+
+
+def test_document_ids_are_stable_and_content_addressed():
+    assert document_id("https://docs/a.html", "text") == document_id("https://docs/a.html", "text")
+    assert document_id("https://docs/a.html", "text") != document_id("https://docs/b.html", "text")
+    assert document_id("https://docs/a.html", "text") != document_id("https://docs/a.html", "other text")
+
+
+def test_unchanged_raw_files_are_skipped(tmp_path):
+    raw, processed = tmp_path / "raw", tmp_path / "processed"
+    write_section(raw, "section-1", [("https://docs/jobs.html", "# Jobs\nSubmit jobs with sbatch.")])
+    write_section(raw, "section-2", [("https://docs/gpus.html", "# GPUs\nRequest GPUs with --gres.")])
+
+    first = preprocess_data(str(raw), str(processed), workers=1, mode="chunks")
+    assert first["files"] == 2 and first["skipped"] == 0
+    ids = documents(processed)
+    assert sorted(first["added"]) == ids
+
+    second = preprocess_data(str(raw), str(processed), workers=1, mode="chunks")
+    assert second["files"] == 0 and second["skipped"] == 2
+    assert second["added"] == [] and second["removed"] == []
+    assert documents(processed) == ids  # Same IDs, no new files
+
+    # Change one section: only its documents are replaced
+    write_section(raw, "section-2", [("https://docs/gpus.html", "# GPUs\nRequest GPUs with --gres=gpu:1.")])
+    third = preprocess_data(str(raw), str(processed), workers=1, mode="chunks")
+    assert third["files"] == 1 and third["skipped"] == 1
+    assert len(third["added"]) == 1 and len(third["removed"]) == 1
+    assert third["removed"][0] in ids and third["added"][0] not in ids
+    assert documents(processed) == sorted(set(ids) - set(third["removed"]) | set(third["added"]))
+
+    with open(processed / MANIFEST_NAME, 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    assert manifest["last_run"]["changed_files"] == ["section-2/section-2_scraped_content.txt"]
+    assert manifest["last_run"]["unchanged_files"] == ["section-1/section-1_scraped_content.txt"]
+
+
+def test_removed_raw_files_and_mode_changes(tmp_path):
+    raw, processed = tmp_path / "raw", tmp_path / "processed"
+    write_section(raw, "section-1", [("https://docs/jobs.html", "# Jobs\nSubmit jobs with sbatch.")])
+    write_section(raw, "section-2", [("https://docs/gpus.html", "# GPUs\nRequest GPUs with --gres.")])
+    preprocess_data(str(raw), str(processed), workers=1, mode="chunks")
+
+    # Switching mode reprocesses every file and replaces all documents
+    clean = preprocess_data(str(raw), str(processed), workers=1, mode="clean")
+    assert clean["files"] == 2
+    assert len(documents(processed)) == 2
+
+    os.remove(raw / "section-2" / "section-2_scraped_content.txt")
+    run = preprocess_data(str(raw), str(processed), workers=1, mode="clean")
+    assert run["files"] == 0 and len(run["removed"]) == 1
+    assert len(documents(processed)) == 1
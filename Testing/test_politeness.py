@@ -0,0 +1,120 @@
+import asyncio
+from urllib.parse import urlparse
+from src.data_pipeline.crawler import Crawler
+from src.data_pipeline.politeness import (AdaptiveConcurrency, HostLimiter, PolitenessLimiter, TokenBucket,
+                                          retry_delay)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_limits_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, burst=2, clock=clock)
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        clock.now += delay
+
+    async def take(n):
+        for _ in range(n):
+            await bucket.acquire()
+
+    original_sleep = asyncio.sleep
+    asyncio.sleep = fake_sleep
+    try:
+        asyncio.run(take(4))
+    finally:
+        asyncio.sleep = original_sleep
+
+    # The burst is served immediately, then one token every 1/rate seconds
+    assert sleeps == [0.5, 0.5]
+    assert clock.now == 1.0
+
+
+def test_adaptive_concurrency_backs_off_and_recovers():
+    concurrency = AdaptiveConcurrency(8)
+    concurrency.decrease()
+    concurrency.decrease()
+    assert concurrency.limit == 2
+    for _ in range(2):
+        concurrency.increase()
+    assert concurrency.limit == 3
+    for _ in range(100):
+        concurrency.increase()
+    assert concurrency.limit == 8  # Never above the configured maximum
+    for _ in range(10):
+        concurrency.decrease()
+    assert concurrency.limit == 1  # Never below the minimum
+
+
+def test_host_limiter_reacts_to_throttling_and_latency():
+    host = HostLimiter(8)
+    host.record(200, 0.1)
+    host.record(429, 0.1)
+    assert host.concurrency.limit == 4
+    host.record(200, 1.0)  # Ten times the typical latency
+    assert host.concurrency.limit == 2
+    host.record_timeout()
+    assert host.concurrency.limit == 1
+
+    stats = host.stats.summary()
+    assert stats["requests"] == 3
+    assert stats["throttle_events"] == 1
+    assert stats["slow_responses"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["latency_p50"] == 0.1
+    assert stats["latency_p95"] == 1.0
+
+
+def test_retry_delay_honours_retry_after():
+    assert retry_delay(0, "2") == 2.0
+    assert retry_delay(0) == 1.0
+    assert retry_delay(3) == 8.0
+    assert retry_delay(2, "Wed, 21 Oct 2015 07:28:00 GMT") == 4.0
+    assert retry_delay(20) == 60.0
+
+
+def test_crawler_retries_throttled_pages(fixture_site):
+    fixture_site.add_html("/docs/", "Docs", ["page/"])
+    fixture_site.add_html("/docs/page/", "Page")
+    fixture_site.errors["/docs/page/"] = [429, 503]
+
+    crawler = Crawler(workers=4)
+    links = asyncio.run(crawler.crawl({'section': [fixture_site.url("/docs/")]}))
+
+    assert links == {'section': [fixture_site.url("/docs/page/")]}
+    assert crawler.page_store.get(fixture_site.url("/docs/page/")).ok
+    assert fixture_site.requests["/docs/page/"] == 3
+
+    stats = crawler.limiter.summary()[urlparse(fixture_site.base_url).netloc]
+    assert stats["requests"] == 4
+    assert stats["throttle_events"] == 2
+
+
+def test_limiter_caps_requests_in_flight():
+    limiter = PolitenessLimiter(concurrency=2, rate=1000, burst=1000)
+    peak = 0
+    active = 0
+
+    async def request(url):
+        nonlocal peak, active
+        async with limiter.slot(url) as slot:
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            slot.status = 200
+
+    async def run():
+        await asyncio.gather(*(request(f"http://docs.example/{i}") for i in range(10)))
+
+    asyncio.run(run())
+    assert peak == 2
+    assert limiter.summary()["docs.example"]["requests"] == 10
@@ -0,0 +1,123 @@
+import glob
+import json
+import os
+import tracemalloc
+import pytest
+from src.data_pipeline import preprocess
+from src.data_pipeline.manifest import MANIFEST_NAME
+from src.data_pipeline.preprocess import (MAX_TERM_SIZE, clean_text, iter_preprocessed_parts, preprocess_data,
+                                          preprocess_text_file)
+
+RAW_TEXT = ("URL: https://rc-docs.northeastern.edu/en/latest/gpus/index.html\n\n"
+            "# GPUs on the <b>Cluster</b>\nRequest 2 GPUs with --gres=gpu:2 and   check them in the queue.\n"
+            "Les caractères accentués & the numbers 1234 are removed.\n\n" + "=" * 80 + "\n\n")
+
+
+def write_raw(folder, sections, repeat):
+    for i in range(sections):
+        section = os.path.join(folder, f"section-{i}")
+        os.makedirs(section)
+        with open(os.path.join(section, f"section-{i}_scraped_content.txt"), 'w', encoding='utf-8') as file:
+            file.write(RAW_TEXT * repeat)
+
+
+def contents(folder):
+    documents = []
+    for path in glob.glob(os.path.join(folder, "*.json")):
+        if os.path.basename(path) == MANIFEST_NAME:
+            continue
+        with open(path, 'r', encoding='utf-8') as file:
+            documents.append(json.load(file)["content"])
+    return sorted(documents)
+
+
+def test_clean_text_output():
+    assert clean_text(RAW_TEXT) == ("url httpsrcdocsnortheasterneduenlatestgpusindexhtml gpus cluster request "
+                                    "gpus gresgpu check queue les caractres accentus numbers removed")
+
+
+def test_process_pool_matches_single_process(tmp_path):
+    raw = str(tmp_path / "raw")
+    write_raw(raw, sections=3, repeat=400)
+
+    single = preprocess_data(raw, str(tmp_path / "single"), workers=1)
+    pooled = preprocess_data(raw, str(tmp_path / "pooled"), workers=2)
+
+    assert single["files"] == pooled["files"] == 3
+    assert single["bytes"] == pooled["bytes"] == sum(
+        os.path.getsize(path) for path in glob.glob(os.path.join(raw, "*", "*.txt")))
+    assert pooled["mb_per_second"] > 0
+    documents = contents(str(tmp_path / "pooled"))
+    assert len(documents) > 3  # Every file was split into several documents
+    assert documents == contents(str(tmp_path / "single"))
+
+
+def legacy_parts(raw_text):
+    """The documents written by the original in-memory `preprocess_text_file`."""
+    cleaned = clean_text(raw_text)
+    if len(cleaned.encode('utf-8')) <= MAX_TERM_SIZE:
+        return [cleaned]
+    parts, current_part, current_size = [], [], 0
+    for word in cleaned.split():
+        space_size = 1 if current_part else 0
+        word_size = len(word.encode('utf-8')) + space_size
+        if current_size + word_size > MAX_TERM_SIZE and current_part:
+            parts.append(" ".join(current_part))
+            current_part, current_size = [], 0
+        if word_size > MAX_TERM_SIZE:
+            if current_part:
+                parts.append(" ".join(current_part))
+                current_part, current_size = [], 0
+            while word:
+                parts.append(word[:MAX_TERM_SIZE // 2])
+                word = word[MAX_TERM_SIZE // 2:]
+        else:
+            current_part.append(word)
+            current_size += word_size
+    if current_part:
+        parts.append(" ".join(current_part))
+    return parts
+
+
+STREAMING_CASES = {
+    "empty": "",
+    "only stopwords": "The and of <b>it</b>",
+    "short": RAW_TEXT,
+    "split": RAW_TEXT * 300,
+    "tags across lines": "keep <div\nclass='x'\n>this</div> <> text <<b>> a>b\r\nend",
+    "unclosed tag": "before " + "<" + "never closed words " * 40,
+    "long words": ("short " + "x" * 20000 + " " + "y" * 19999 + " z " + "w" * 45123 + " the tail ") * 2,
+    "long word after words": "word " * 3000 + "q" * 30000,
+}
+
+
+@pytest.mark.parametrize("block_size", [7, 4096, 1 << 16])
+@pytest.mark.parametrize("case", sorted(STREAMING_CASES))
+def test_streaming_matches_in_memory(case, block_size, tmp_path, monkeypatch):
+    monkeypatch.setattr(preprocess, "READ_BLOCK_SIZE", block_size)
+    monkeypatch.setattr(preprocess, "MAX_PENDING_TAG", 100)  # Exercise the spill to disk
+    path = tmp_path / "raw.txt"
+    path.write_text(STREAMING_CASES[case], encoding='utf-8')
+    with open(path, 'r', encoding='utf-8') as file:
+        expected = legacy_parts(file.read())
+
+    assert list(iter_preprocessed_parts(str(path))) == expected
+
+
+def test_streaming_memory_is_bounded_by_chunk_size(tmp_path):
+    path = tmp_path / "large_scraped_content.txt"
+    with open(path, 'w', encoding='utf-8') as file:
+        for _ in range(40):
+            file.write(RAW_TEXT * 500)  # About 4 MB in total
+    size = os.path.getsize(path)
+
+    tracemalloc.start()
+    try:
+        preprocess_text_file(str(path), str(tmp_path / "processed"))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(os.listdir(tmp_path / "processed")) > 10  # Identical parts share one document
+    assert size > 3_000_000
+    assert peak < size / 4, f"peak {peak} bytes while preprocessing a {size} byte file"
@@ -0,0 +1,62 @@
+from src.data_pipeline.crawler import crawl_sections
+from src.data_pipeline.http_cache import HttpCache
+from src.data_pipeline.page_store import PageStore
+from src.data_pipeline.recrawl import DAY, MAX_INTERVAL, MIN_INTERVAL, RecrawlScheduler
+
+T0 = 1_700_000_000.0
+
+
+def test_interval_adapts_to_change_frequency(tmp_path):
+    scheduler = RecrawlScheduler(str(tmp_path / "recrawl.sqlite"))
+    assert scheduler.record("https://docs/faq.html", b"v0", T0)
+    scheduler.record("https://docs/glossary.html", b"g", T0)
+
+    now = T0
+    for day in range(1, 40):
+        now = T0 + day * DAY
+        if scheduler.is_due("https://docs/faq.html", now):
+            scheduler.record("https://docs/faq.html", f"v{day}".encode(), now)
+        if scheduler.is_due("https://docs/glossary.html", now):
+            assert not scheduler.record("https://docs/glossary.html", b"g", now)
+
+    # The FAQ changes at every check and stays on a daily schedule; the glossary backs off
+    assert scheduler.next_check("https://docs/faq.html") == now + MIN_INTERVAL
+    assert scheduler.next_check("https://docs/glossary.html") > now + 8 * DAY
+    assert scheduler.conn.execute("SELECT MAX(interval) FROM pages").fetchone()[0] <= MAX_INTERVAL
+
+
+def test_unknown_sections_are_due(tmp_path):
+    scheduler = RecrawlScheduler(str(tmp_path / "recrawl.sqlite"))
+    sections = {'section-1': ["https://docs/jobs/"], 'section-2': ["https://docs/gpus/"]}
+    assert scheduler.due_sections(sections, T0) == sections
+
+
+def test_pages_not_due_are_served_from_cache(fixture_site, tmp_path):
+    fixture_site.add_html("/docs/", "Docs", ["faq.html", "glossary.html"])
+    fixture_site.add_html("/docs/faq.html", "FAQ", text="first answer")
+    fixture_site.add_html("/docs/glossary.html", "Glossary", text="terms")
+    fixture_site.add_html("/other/", "Other")
+    sections = {'section-1': [fixture_site.url("/docs/")], 'section-2': [fixture_site.url("/other/")]}
+    scheduler = RecrawlScheduler(str(tmp_path / "recrawl.sqlite"))
+    cache = HttpCache(str(tmp_path / "http"))
+
+    def run(now):
+        due = scheduler.due_sections(sections, now)
+        page_store = PageStore(http_cache=cache)
+        preloaded = scheduler.preload(page_store, now)
+        links = crawl_sections(due, workers=2, page_store=page_store)
+        scheduler.record_crawl(due, links, page_store, preloaded, now)
+        return due, page_store
+
+    run(T0)
+    fixture_site.add_html("/docs/faq.html", "FAQ", text="second answer")
+    run(T0 + DAY)  # Everything is checked again; only the FAQ changed
+    fixture_site.requests.clear()
+
+    due, page_store = run(T0 + 2 * DAY)
+    assert list(due) == ['section-1']  # The stable "Other" section is skipped entirely
+    assert fixture_site.requests["/docs/faq.html"] == 1
+    assert fixture_site.requests["/docs/glossary.html"] == 0
+    assert fixture_site.requests["/docs/"] == 0
+    assert b"terms" in page_store.get(fixture_site.url("/docs/glossary.html")).body
+    assert not page_store.is_changed(fixture_site.url("/docs/glossary.html"))
@@ -0,0 +1,149 @@
+import re
+import threading
+import numpy as np
+import pytest
+from unittest.mock import patch
+from src.model import retrievers
+from src.model.bm25 import BM25Index
+from src.model.embeddings import EmbeddingStore, HashingEmbedder
+from src.model.retrievers import (AzureSearchRetriever, BM25Retriever, DenseRetriever, HybridRetriever,
+                                  Retriever, get_retriever, reciprocal_rank_fusion)
+from src.model.retrive_azure_index import search_azure_index
+
+DOCUMENTS = [
+    {"id": "jobs", "content": "Submit batch jobs to the Slurm scheduler with sbatch.",
+     "source_url": "https://docs/jobs.html", "heading": "Jobs"},
+    {"id": "gpus", "content": "Request GPUs on the gpu partition with --gres=gpu:1. GPU jobs need a GPU.",
+     "source_url": "https://docs/gpus.html", "heading": "GPUs"},
+    {"id": "storage", "content": "Scratch storage is purged; keep data in your home directory.",
+     "source_url": "https://docs/storage.html"},
+    {"id": "jobs", "content": "A repeated ID is indexed once."},
+]
+
+
+def brute_force_bm25(documents, query, k1=1.2, b=0.75):
+    tokenized = [re.findall(r'\w+', document["content"].lower()) for document in documents]
+    avgdl = sum(map(len, tokenized)) / len(tokenized)
+    scores = []
+    for tokens in tokenized:
+        score = 0.0
+        for term in set(re.findall(r'\w+', query.lower())):
+            df = sum(term in other for other in tokenized)
+            tf = tokens.count(term)
+            if tf:
+                idf = np.log(1 + (len(tokenized) - df + 0.5) / (df + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(tokens) / avgdl))
+        scores.append(score)
+    return scores
+
+
+def test_bm25_scores_match_the_formula(tmp_path):
+    index = BM25Index.build(DOCUMENTS)
+    assert len(index) == 3
+    expected = brute_force_bm25(DOCUMENTS[:3], "gpu jobs sbatch")
+    assert np.allclose(index.scores("gpu jobs sbatch"), expected, rtol=1e-5)
+
+
+def test_bm25_search_from_a_memory_mapped_index(tmp_path):
+    BM25Index.build(DOCUMENTS).save(str(tmp_path))
+    index = BM25Index.load(str(tmp_path))
+    assert isinstance(index.postings, np.memmap)
+
+    results = index.search("How do I request a GPU?", top=2)
+    assert [result["id"] for result in results] == ["gpus"]  # Only documents sharing a term
+    assert results[0]["source_url"] == "https://docs/gpus.html" and results[0]["score"] > 0
+    assert [result["id"] for result in index.search("jobs", top=5)] == ["jobs", "gpus"]
+    assert index.search("unknown words") == []
+    assert BM25Index.build([]).search("jobs") == []
+
+
+def test_search_azure_index_uses_the_configured_backend(tmp_path, monkeypatch):
+    BM25Index.build(DOCUMENTS).save(str(tmp_path))
+    monkeypatch.setattr(retrievers, "RETRIEVER_BACKEND", "bm25")
+    monkeypatch.setitem(retrievers._retrievers, "bm25", BM25Retriever(str(tmp_path)))
+    assert search_azure_index("scratch storage purge") == DOCUMENTS[2]["content"]
+    assert search_azure_index("nothing matches") == "No relevant information found."
+
+
+def test_azure_retriever_creates_its_client_on_first_search(monkeypatch):
+    monkeypatch.setenv("AZURE_SEARCH_ENDPOINT", "https://test.search.windows.net")
+    monkeypatch.setenv("AZURE_SEARCH_KEY", "test-search-key")
+    with patch("src.model.retrievers.SearchClient") as mock_search_client:
+        retriever = AzureSearchRetriever()
+        mock_search_client.assert_not_called()
+        mock_search_client.return_value.search.return_value = [
+            {"id": "jobs", "content": "Submit jobs.", "@search.score": 2.5}, {"id": "empty"}]
+        assert retriever.search("jobs", top=3) == [
+            {"id": "jobs", "content": "Submit jobs.", "@search.score": 2.5, "score": 2.5}]
+        mock_search_client.return_value.search.assert_called_once_with(search_text="jobs", top=3)
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        get_retriever("elasticsearch")
+
+
+class FixedRetriever(Retriever):
+    def __init__(self, ids, barrier=None, error=None):
+        self.ids = ids
+        self.barrier = barrier
+        self.error = error
+        self.tops = []
+
+    def search(self, query, top=8):
+        self.tops.append(top)
+        if self.barrier is not None:
+            self.barrier.wait(timeout=5)  # Only passes when the other retriever runs at the same time
+        if self.error is not None:
+            raise self.error
+        return [{"id": doc_id, "content": doc_id, "score": 1.0} for doc_id in self.ids[:top]]
+
+
+def test_bm25_index_looks_documents_up_by_id(tmp_path):
+    BM25Index.build(DOCUMENTS).save(str(tmp_path))
+    index = BM25Index.load(str(tmp_path))
+    assert index.get("storage")["source_url"] == "https://docs/storage.html"
+    assert index.get("jobs")["content"] == DOCUMENTS[0]["content"]
+    assert index.get("missing") is None
+
+
+def test_dense_retriever_joins_the_stored_chunks(tmp_path):
+    BM25Index.build(DOCUMENTS).save(str(tmp_path / "bm25"))
+    embedder = HashingEmbedder(dim=64, buckets=1024)
+    EmbeddingStore(str(tmp_path / "embeddings")).update(DOCUMENTS + [{"id": "new", "content": "gpu"}], embedder)
+
+    retriever = DenseRetriever(str(tmp_path / "embeddings"), str(tmp_path / "bm25"), embedder=embedder)
+    results = retriever.search("request a gpu on the gpu partition", top=3)
+    assert results[0]["id"] == "gpus" and results[0]["heading"] == "GPUs"
+    assert "new" not in [result["id"] for result in results]  # Not in the document store yet
+    assert results[0]["score"] >= results[-1]["score"]
+    assert retriever.search("?!") == []
+
+    with pytest.raises(ValueError):
+        DenseRetriever(str(tmp_path / "embeddings"), str(tmp_path / "bm25")).search("gpu")
+
+
+def test_reciprocal_rank_fusion():
+    lexical = [{"id": "a", "source": "lexical"}, {"id": "b"}, {"id": "c"}]
+    dense = [{"id": "c", "source": "dense"}, {"id": "a"}, {"id": "d"}]
+    fused = reciprocal_rank_fusion([lexical, dense], k=60, top=3)
+    assert [document["id"] for document in fused] == ["a", "c", "b"]
+    assert fused[0]["score"] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused[0]["source"] == "lexical"
+    assert reciprocal_rank_fusion([[], []]) == []
+
+
+def test_hybrid_retriever_runs_the_retrievers_concurrently():
+    barrier = threading.Barrier(2)
+    lexical = FixedRetriever(["a", "b", "c"], barrier=barrier)
+    dense = FixedRetriever(["c", "a", "d"], barrier=barrier)
+    hybrid = HybridRetriever([lexical, dense], candidates=20, k=10)
+    assert [document["id"] for document in hybrid.search("query", top=2)] == ["a", "c"]
+    assert lexical.tops == dense.tops == [20]
+
+
+def test_hybrid_retriever_skips_a_failing_retriever():
+    hybrid = HybridRetriever([FixedRetriever(["a", "b"]), FixedRetriever([], error=OSError("index missing"))])
+    assert [document["id"] for document in hybrid.search("query")] == ["a", "b"]
+    with pytest.raises(OSError):
+        HybridRetriever([FixedRetriever([], error=OSError("index missing"))]).search("query")
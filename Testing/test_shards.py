@@ -0,0 +1,99 @@
+import os
+import pytest
+from unittest.mock import MagicMock
+from src.data_pipeline import shards
+from src.data_pipeline.index_data import BatchIndexer, add_documents, blob_documents
+from src.data_pipeline.manifest import MANIFEST_NAME, iter_documents, processed_files
+from src.data_pipeline.preprocess import preprocess_data
+from src.data_pipeline.shards import INDEX_SUFFIX, ShardWriter, read_document, read_shard
+
+SEPARATOR = "=" * 80
+
+FORMATS = ["jsonl", pytest.param("jsonl.zst", marks=pytest.mark.skipif(
+    shards.zstandard is None, reason="zstandard is not installed"))]
+
+
+def write_section(raw, section, pages):
+    folder = raw / section
+    folder.mkdir(parents=True, exist_ok=True)
+    with open(folder / f"{section}_scraped_content.txt", 'w', encoding='utf-8') as file:
+        for url, text in pages:
+            file.write(f"URL: {url}\n\n{text}\n\n{SEPARATOR}\n\n")
+
+
+def make_documents(n):
+    return [{"id": f"doc-{i}", "content": f"chunk {i} about slurm partitions é"} for i in range(n)]
+
+
+@pytest.mark.parametrize("output_format", FORMATS)
+def test_shard_round_trip_and_random_access(tmp_path, output_format):
+    path = str(tmp_path / f"section-1.{output_format}")
+    documents = make_documents(shards.BLOCK_DOCUMENTS * 2 + 7)  # Several zstd frames
+    writer = ShardWriter(path)
+    for document in documents + documents[:3]:  # Duplicate IDs are stored once
+        writer.write(document)
+    writer.close()
+
+    assert list(read_shard(path)) == documents
+    assert read_document(path, "doc-0") == documents[0]
+    assert read_document(path, f"doc-{len(documents) - 1}") == documents[-1]
+    assert read_document(path, "missing") is None
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_aborted_shard_leaves_no_files(tmp_path):
+    path = str(tmp_path / "section-1.jsonl")
+    writer = ShardWriter(path)
+    writer.write(make_documents(1)[0])
+    writer.abort()
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("output_format", FORMATS)
+def test_preprocess_writes_one_shard_per_raw_file(tmp_path, output_format):
+    raw, processed = tmp_path / "raw", tmp_path / "processed"
+    write_section(raw, "section-1", [("https://docs/jobs.html", "# Jobs\nSubmit jobs with sbatch.")])
+    write_section(raw, "section-2", [("https://docs/gpus.html", "# GPUs\nRequest GPUs with --gres.")])
+
+    json_run = preprocess_data(str(raw), str(processed / "json"), workers=1, mode="chunks")
+    shard_run = preprocess_data(str(raw), str(processed / "shards"), workers=1, mode="chunks",
+                                output_format=output_format)
+    assert sorted(shard_run["added"]) == sorted(json_run["added"])
+    assert sorted(os.listdir(processed / "shards")) == sorted(
+        [MANIFEST_NAME] + [f"section-{i}_scraped_content.{output_format}{suffix}"
+                           for i in (1, 2) for suffix in ("", INDEX_SUFFIX)])
+    key = lambda document: document["id"]
+    assert sorted(iter_documents(str(processed / "shards")), key=key) == \
+        sorted(iter_documents(str(processed / "json")), key=key)
+    assert MANIFEST_NAME not in map(os.path.basename, processed_files(str(processed / "shards")))
+
+    # Unchanged files are skipped; switching format rewrites them and removes the shards
+    assert preprocess_data(str(raw), str(processed / "shards"), workers=1, mode="chunks",
+                           output_format=output_format)["skipped"] == 2
+    switched = preprocess_data(str(raw), str(processed / "shards"), workers=1, mode="chunks")
+    assert switched["files"] == 2 and switched["added"] == [] and switched["removed"] == []
+    assert sorted(os.listdir(processed / "shards")) == sorted(os.listdir(processed / "json"))
+
+
+def test_unknown_output_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        preprocess_data(str(tmp_path), str(tmp_path / "out"), output_format="parquet")
+
+
+def test_indexer_uploads_shards_in_batches(tmp_path):
+    path = str(tmp_path / "section-1.jsonl")
+    writer = ShardWriter(path)
+    documents = make_documents(5) + [{"id": "too-large", "content": "x" * 40000}]
+    for document in documents:
+        writer.write(document)
+    writer.close()
+
+    search_client = MagicMock()
+    indexer = BatchIndexer(search_client, max_documents=2)
+    with open(path, 'rb') as file:
+        sent = add_documents(indexer, blob_documents("section-1.jsonl", file.read()))
+    indexer.close()
+    assert sent == 5
+    batches = [call.kwargs["documents"] for call in search_client.upload_documents.call_args_list]
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [document["id"] for batch in batches for document in batch] == [f"doc-{i}" for i in range(5)]
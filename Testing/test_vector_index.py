@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from src.model.embeddings import EmbeddingStore
+from src.model.vector_index import VectorIndex, build_ivf, kmeans
+
+
+def normalize(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def clustered(count=2000, dim=32, topics=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((topics, dim)))
+    return normalize(centers[rng.integers(topics, size=count)] + 0.1 * rng.standard_normal((count, dim)))
+
+
+def make_store(path, vectors, dtype="float16"):
+    return EmbeddingStore.create(str(path), [f"doc-{i}" for i in range(len(vectors))], vectors, "test", dtype)
+
+
+def brute_force(vectors, query, top):
+    scores = vectors.astype(np.float32) @ query
+    return [f"doc-{i}" for i in np.argsort(-scores, kind='stable')[:top]]
+
+
+def test_exact_search_matches_brute_force(tmp_path):
+    vectors = clustered()
+    make_store(tmp_path, vectors, dtype="float32")
+    index = VectorIndex(str(tmp_path))
+    assert index.mode == "exact"
+    assert isinstance(index.store.vectors, np.memmap)
+    for query in vectors[:5]:
+        hits = index.search(query, top=5)
+        assert [doc_id for doc_id, _ in hits] == brute_force(vectors, query, 5)
+        assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_kmeans_centroids_are_normalized():
+    centroids = kmeans(clustered(), nlist=20)
+    assert centroids.shape == (20, 32)
+    assert np.allclose(np.linalg.norm(centroids, axis=1), 1, atol=1e-5)
+
+
+def test_ivf_search_recall_and_full_probe(tmp_path):
+    vectors = clustered()
+    make_store(tmp_path, vectors)
+    report = build_ivf(str(tmp_path), nlist=20)
+    assert report["nlist"] == 20
+    index = VectorIndex(str(tmp_path), mode="ivf", nprobe=3)
+    queries = normalize(vectors[:50] + 0.05 * np.random.default_rng(1).standard_normal(vectors[:50].shape))
+
+    recall = np.mean([len({doc_id for doc_id, _ in index.search(query, top=10)}
+                          & set(brute_force(vectors, query, 10))) / 10 for query in queries])
+    assert recall > 0.9
+    # Probing every list is an exact search
+    for query in queries[:5]:
+        assert [doc_id for doc_id, _ in index.search(query, top=10, nprobe=20)] == \
+            [doc_id for doc_id, _ in index.search(query, top=10, mode="exact")]
+
+
+def test_stale_ivf_index_is_not_used(tmp_path):
+    vectors = clustered()
+    make_store(tmp_path, vectors)
+    build_ivf(str(tmp_path), nlist=10)
+    make_store(tmp_path, vectors[:1500])  # The store changed after the IVF build
+    with pytest.raises(ValueError):
+        VectorIndex(str(tmp_path), mode="ivf")
+    assert VectorIndex(str(tmp_path)).mode == "exact"
+
+
+def test_empty_store_and_unknown_mode(tmp_path):
+    assert VectorIndex(str(tmp_path)).search(np.ones(4)) == []
+    with pytest.raises(ValueError):
+        VectorIndex(str(tmp_path), mode="hnsw")
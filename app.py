@@ -8,6 +8,8 @@ from azure.core.credentials import AzureKeyCredential
 from dotenv import load_dotenv
 from src.config.mlflow_config import MetricsCollector
 from src.model.retrive_azure_index import search_azure_index
+from src.model.retrievers import retrieval_cache_stats
+from src.model.answer_cache import get_answer_cache
 from src.model.system_prompt import create_system_prompt
 from src.model.get_model_response import get_openai_response
 from src.evaluation.user_question_bias import check_bias_in_user_question
@@ -31,17 +33,34 @@ def main():
             #trigger_airflow_dag(user_question)
             # Step 1: Check for bias in the user question
             user_question_clean, bias_message = check_bias_in_user_question(user_question)
+
+            # Step 1.5: Look the question up among the validated answers of earlier questions
+            answer_cache = get_answer_cache()
+            cached = None
+            if not bias_message and answer_cache is not None:
+                cached = answer_cache.lookup(user_question_clean)
+                collector.add_metric('answer_cache_hit', int(cached is not None))
+                collector.add_metric('answer_cache_hit_rate', answer_cache.stats()['hit_rate'])
             
             if bias_message:
                 # Display rephrase suggestion if bias is detected
                 st.warning(bias_message)
                 #send_email_alert("Bias detected in user question", f"The user question contains bias: {user_question_clean}. Bias message: {bias_message}")
+            elif cached is not None:
+                # Already answered and validated for the current index: no retrieval, no LLM call
+                st.write(cached['answer'])
+                st.success("Answer provided.")
             else:
-                # Step 2: Retrieve context from Azure Search
+                # Step 2: Retrieve context from Azure Search (repeated questions come from the cache)
                 context = search_azure_index(user_question_clean)
+                cache_stats = retrieval_cache_stats()
+                if cache_stats:
+                    collector.add_metric('retrieval_cache_hits', cache_stats['hits'])
+                    collector.add_metric('retrieval_cache_misses', cache_stats['misses'])
+                    collector.add_metric('retrieval_cache_hit_rate', cache_stats['hit_rate'])
                 
-                # Step 3: Create the system prompt
-                system_prompt = create_system_prompt(context, user_question_clean)
+                # Step 3: Create the system prompt, with the context packed into its token budget
+                system_prompt = create_system_prompt(context, user_question_clean, metrics=collector)
                 
                 # Step 4: Get response from OpenAI API
                 answer = get_openai_response(system_prompt)
@@ -57,6 +76,8 @@ def main():
                         send_slack_alert("Bias detected in model response", f"Bias message in the model response: {response_bias_message}")
                     else:
                         st.success("Answer provided.")
+                        if answer_cache is not None:
+                            answer_cache.store(user_question_clean, answer_clean)
                 else:
                     st.warning("The question lacks sufficient contextual relevance.")
                     send_slack_alert("Question lacks context", f"The question provided lacks sufficient contextual relevance: {answer_clean}")
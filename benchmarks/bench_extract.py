@@ -0,0 +1,61 @@
+"""
+bench_extract.py
+
+Micro-benchmark of the HTML text extractors on the saved HTML fixtures.
+For each extractor it reports the time per page and the size of the extracted text.
+
+Usage:
+    python benchmarks/bench_extract.py [--repeat N] [fixture.html ...]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.data_pipeline.extract import EXTRACTORS, get_extractor
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'Testing', 'fixtures', 'html', '*.html')
+
+
+def bench(extractor, pages, repeat):
+    """Return (seconds per page, total extracted characters) for one extractor."""
+    extract_text = get_extractor(extractor)
+    chars = sum(len(extract_text(page)) for page in pages)  # Warm-up run
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            extract_text(page)
+    return (time.perf_counter() - start) / (repeat * len(pages)), chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help='HTML files to extract (default: the test fixtures)')
+    parser.add_argument('--repeat', type=int, default=200, help='passes over the pages per extractor')
+    args = parser.parse_args()
+
+    paths = args.files or sorted(glob.glob(FIXTURES))
+    pages = []
+    for path in paths:
+        with open(path, 'rb') as file:
+            pages.append(file.read())
+    html_bytes = sum(len(page) for page in pages)
+    print(f"{len(pages)} pages, {html_bytes} bytes of HTML, {args.repeat} passes")
+
+    baseline = None
+    for name in EXTRACTORS:
+        try:
+            per_page, chars = bench(name, pages, args.repeat)
+        except ValueError as e:
+            print(f"{name:>6}: skipped ({e})")
+            continue
+        baseline = baseline or per_page
+        print(f"{name:>6}: {per_page * 1000:8.3f} ms/page  {chars:8d} chars  "
+              f"{baseline / per_page:5.1f}x vs {next(iter(EXTRACTORS))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+bench_preprocess.py
+
+Benchmark of the preprocessing stage on a generated corpus of raw section files.
+It compares the original single-process preprocessing, which rebuilt the stopword set and
+recompiled its regexes on every `clean_text` call, with `preprocess_data` on a process pool,
+checks that both produce the same documents, and reports the throughput of each in MB/s.
+
+Usage:
+    python benchmarks/bench_preprocess.py [--files N] [--mb-per-file MB] [--workers N]
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from nltk.corpus import stopwords
+from src.data_pipeline import preprocess
+from src.data_pipeline.manifest import MANIFEST_NAME
+
+WORDS = ("the job scheduler slurm partition node gpu cluster memory storage module load "
+         "submit batch array interactive session account quota scratch home directory "
+         "a an of to in for on with is are be this that it as by from at or").split()
+
+
+def clean_text_legacy(text):
+    """The original `clean_text`, which rebuilt its stopwords and regexes on every call."""
+    if text is None:
+        return ""
+    text = str(text).lower()
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'[^a-zA-Z\s]', '', text)
+    text = ' '.join(text.split())
+    stop_words = set(stopwords.words('english'))
+    text = ' '.join([word for word in text.split() if word not in stop_words])
+    return text
+
+
+def generate_corpus(folder, files, mb_per_file, seed=0):
+    """Write raw section files shaped like the scraper output."""
+    rng = random.Random(seed)
+    for i in range(files):
+        section = os.path.join(folder, f"section-{i + 1}")
+        os.makedirs(section, exist_ok=True)
+        with open(os.path.join(section, f"section-{i + 1}_scraped_content.txt"), 'w', encoding='utf-8') as file:
+            written = 0
+            page = 0
+            while written < mb_per_file * 1e6:
+                lines = [f"URL: https://rc-docs.northeastern.edu/en/latest/page-{page}.html", ""]
+                for _ in range(40):
+                    lines.append(" ".join(rng.choice(WORDS) for _ in range(12)) + f" {rng.randint(0, 999)}.")
+                lines += ["", "=" * 80, "", ""]
+                text = "\n".join(lines)
+                file.write(text)
+                written += len(text)
+                page += 1
+
+
+def run_legacy(input_folder, output_folder):
+    """The original in-memory `preprocess_text_file` loop, one file after the other."""
+    os.makedirs(output_folder, exist_ok=True)
+    for n, path in enumerate(preprocess.raw_text_files(input_folder)):
+        with open(path, 'r', encoding='utf-8') as file:
+            cleaned_text = clean_text_legacy(file.read())
+        if len(cleaned_text.encode('utf-8')) > preprocess.MAX_TERM_SIZE:
+            parts = preprocess.split_content(cleaned_text)
+        else:
+            parts = [cleaned_text]
+        for i, part in enumerate(parts):
+            with open(os.path.join(output_folder, f"{n}_{i}.json"), 'w', encoding='utf-8') as file:
+                json.dump({"id": f"{n}_{i}", "content": part}, file, ensure_ascii=False, indent=4)
+
+
+def documents(folder):
+    """Return the sorted, distinct contents of the documents written to a folder."""
+    contents = []
+    for path in glob.glob(os.path.join(folder, "*.json")):
+        if os.path.basename(path) == MANIFEST_NAME:
+            continue
+        with open(path, 'r', encoding='utf-8') as file:
+            contents.append(json.load(file)["content"])
+    return sorted(set(contents))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=11, help='number of raw section files')
+    parser.add_argument('--mb-per-file', type=float, default=5.0, help='size of each raw file in MB')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_preprocess_")
+    try:
+        raw = os.path.join(workdir, "raw")
+        generate_corpus(raw, args.files, args.mb_per_file)
+        total = sum(os.path.getsize(path) for path in preprocess.raw_text_files(raw)) / 1e6
+        print(f"Generated {args.files} files, {total:.1f} MB")
+
+        legacy_out = os.path.join(workdir, "legacy")
+        start = time.perf_counter()
+        run_legacy(raw, legacy_out)
+        legacy_seconds = time.perf_counter() - start
+
+        engine_out = os.path.join(workdir, "engine")
+        stats = preprocess.preprocess_data(raw, engine_out, workers=args.workers)
+
+        assert documents(legacy_out) == documents(engine_out), "outputs differ"
+        print(f"{'legacy (1 process)':>22}: {total / legacy_seconds:8.2f} MB/s")
+        print(f"{'engine':>22}: {stats['mb_per_second']:8.2f} MB/s  "
+              f"({legacy_seconds / stats['seconds']:.1f}x)")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
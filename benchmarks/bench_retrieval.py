@@ -0,0 +1,92 @@
+"""
+bench_retrieval.py
+
+Benchmark of the local BM25 retriever on a generated corpus of chunks.
+It builds the index, saves it, loads it back memory-mapped, and reports the build time and the
+median and 99th percentile latency of `search(query, top=8)`.
+
+With --hybrid it also embeds the chunks and reports the latency of the dense retriever and of the
+hybrid retriever that runs both concurrently, which should be close to the slower of the two.
+
+Usage:
+    python benchmarks/bench_retrieval.py [--documents N] [--queries N] [--hybrid]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.model.bm25 import BM25Index
+from src.model.embeddings import EmbeddingStore
+from src.model.retrievers import BM25Retriever, DenseRetriever, HybridRetriever
+
+VOCABULARY = 20000
+COMMON = 2000
+
+
+def generate_documents(count, words=200, seed=0):
+    """Chunks with a skewed vocabulary: most words come from a small common set."""
+    rng = random.Random(seed)
+    terms = [f"term{i}" for i in range(VOCABULARY)]
+    for i in range(count):
+        content = " ".join(rng.choice(terms[:COMMON]) if rng.random() < 0.7 else rng.choice(terms)
+                           for _ in range(words))
+        yield {"id": f"doc-{i}", "content": content}
+
+
+def measure(name, search, queries):
+    """Print the median and 99th percentile latency of a search function."""
+    search(queries[0])  # Fault in the pages
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print(f"{name}: p50 {latencies[len(latencies) // 2] * 1e3:.3f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e3:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=20000, help='number of chunks')
+    parser.add_argument('--queries', type=int, default=1000, help='number of queries')
+    parser.add_argument('--hybrid', action='store_true', help='also measure dense and hybrid retrieval')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_retrieval_")
+    try:
+        documents = list(generate_documents(args.documents))
+        start = time.perf_counter()
+        BM25Index.build(documents).save(workdir)
+        print(f"Built the index of {args.documents} chunks in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        index = BM25Index.load(workdir)
+        print(f"Loaded it in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+        rng = random.Random(1)
+        queries = [" ".join(f"term{rng.randrange(VOCABULARY)}" for _ in range(8)) for _ in range(args.queries)]
+        measure("search", lambda query: index.search(query, top=8), queries)
+
+        if args.hybrid:
+            start = time.perf_counter()
+            EmbeddingStore(os.path.join(workdir, "embeddings")).update(documents)
+            print(f"Embedded the chunks in {time.perf_counter() - start:.1f}s")
+            lexical = BM25Retriever(workdir)
+            dense = DenseRetriever(os.path.join(workdir, "embeddings"), workdir)
+            hybrid = HybridRetriever([lexical, dense])
+            for name, retriever in (("bm25 top 50", lexical), ("dense top 50", dense)):
+                measure(name, lambda query: retriever.search(query, top=50), queries)
+            measure("hybrid", lambda query: hybrid.search(query, top=8), queries)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+bench_vector_index.py
+
+Recall and latency benchmark of the local vector index on generated embeddings.
+It writes a clustered set of normalized float16 vectors to an embedding store, builds its IVF
+index, and compares exact search with IVF search for several `nprobe` values: recall@k against
+the exact results and the median latency of a query.
+
+Usage:
+    python benchmarks/bench_vector_index.py [--documents N] [--dim D] [--queries N] [--top K]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.model.embeddings import EmbeddingStore
+from src.model.vector_index import VectorIndex, build_ivf
+
+
+def normalize(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def generate_vectors(count, dim, topics=500, seed=0):
+    """Vectors around `topics` random directions, like chunks about a few hundred subjects."""
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((topics, dim)).astype(np.float32))
+    vectors = centers[rng.integers(topics, size=count)] + 0.08 * rng.standard_normal((count, dim)).astype(np.float32)
+    return normalize(vectors)
+
+
+def timed(index, queries, top, **kwargs):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append({doc_id for doc_id, _ in index.search(query, top=top, **kwargs)})
+        latencies.append(time.perf_counter() - start)
+    return results, float(np.median(latencies)) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=100000, help='number of vectors')
+    parser.add_argument('--dim', type=int, default=256, help='dimension of the vectors')
+    parser.add_argument('--queries', type=int, default=200, help='number of queries')
+    parser.add_argument('--top', type=int, default=10, help='k of recall@k')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_vector_index_")
+    try:
+        vectors = generate_vectors(args.documents, args.dim)
+        EmbeddingStore.create(workdir, [f"doc-{i}" for i in range(args.documents)], vectors, model="synthetic")
+        build_ivf(workdir)
+        rng = np.random.default_rng(1)
+        queries = normalize(vectors[rng.integers(args.documents, size=args.queries)]
+                            + 0.05 * rng.standard_normal((args.queries, args.dim)).astype(np.float32))
+
+        index = VectorIndex(workdir, mode="ivf")
+        truth, exact_ms = timed(index, queries, args.top, mode="exact")
+        print(f"{'exact':>12}: recall@{args.top} 1.000  p50 {exact_ms:7.3f} ms")
+        for nprobe in (1, 2, 4, 8, 16, 32):
+            found, ivf_ms = timed(index, queries, args.top, nprobe=nprobe)
+            recall = np.mean([len(a & b) / len(b) for a, b in zip(found, truth)])
+            print(f"{f'ivf n={nprobe}':>12}: recall@{args.top} {recall:.3f}  p50 {ivf_ms:7.3f} ms")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
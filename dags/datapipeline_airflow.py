@@ -8,14 +8,25 @@ from datetime import datetime, timedelta
 sys.path.append('/opt/airflow/src')
 
 from data_pipeline.preprocess import preprocess_data
-from data_pipeline.scraper import scrape_sections_up_to_current_week
+from data_pipeline.boilerplate import remove_boilerplate
+from data_pipeline.scraper import scrape_due_sections
 from data_pipeline.preprocess import getFileName
 from data_pipeline.preprocess import getFileNameWithoutExtension 
-from data_pipeline.azure_uploader import upload_to_blob
-from data_pipeline.index_data import index_data_in_search
+from data_pipeline.azure_uploader import upload_files
+from data_pipeline.index_data import sync_index
+from data_pipeline.manifest import ProcessedManifest, iter_documents, processed_files
+from model.bm25 import BM25Index
+from model.cache import publish_index_changes
+from model.embeddings import EmbeddingStore
+from model.vector_index import IVF_MIN_DOCUMENTS, build_ivf
+from data_pipeline.dedup import dedup_data
+from data_pipeline.shards import DEFAULT_SHARD_FORMAT
 
 RAW_DATA_PATH = 'data/raw'
 PROCESSED_DATA_PATH = 'data/processed/'
+BM25_INDEX_PATH = 'data/bm25'
+EMBEDDINGS_PATH = 'data/embeddings'
+INDEX_VERSION_PATH = 'data/index_version.json'  # Read by the app to invalidate its caches
 
 default_args = {
     'owner': 'santosh',
@@ -36,37 +47,110 @@ with DAG(
     ) as dag:
     
     def scrape_task_func():
-        scrape_sections_up_to_current_week()
+        # Resume from the checkpoint of an earlier attempt when Airflow retries the task
+        scrape_due_sections(resume=True)
 
     scrape_task = PythonOperator(
         task_id='scrape_task',
         python_callable=scrape_task_func,
     )
     
+    def boilerplate_task_func():
+        remove_boilerplate(RAW_DATA_PATH)
+
+    boilerplate_task = PythonOperator(
+        task_id='boilerplate_task',
+        python_callable=boilerplate_task_func,
+    )
+
     def preprocess_data_task():
-        preprocess_data(RAW_DATA_PATH, PROCESSED_DATA_PATH)
+        preprocess_data(RAW_DATA_PATH, PROCESSED_DATA_PATH, mode="chunks", output_format=DEFAULT_SHARD_FORMAT)
     
     preprocess_task = PythonOperator(
         task_id='preprocess_task',
         python_callable=preprocess_data_task,
     )
 
+    def dedup_task_func():
+        # Record the near-duplicate chunks (threshold from DEDUP_THRESHOLD) so they are not indexed
+        dedup_data(PROCESSED_DATA_PATH)
+
+    dedup_task = PythonOperator(
+        task_id='dedup_task',
+        python_callable=dedup_task_func,
+    )
+
+    def retrieval_documents():
+        # The processed chunks without the near-duplicates
+        duplicates = ProcessedManifest(PROCESSED_DATA_PATH).duplicates
+        return (document for document in iter_documents(PROCESSED_DATA_PATH) if document["id"] not in duplicates)
+
+    def bm25_task_func():
+        # Local BM25 index of the chunks for RETRIEVER_BACKEND=bm25. Chunk IDs are content
+        # addressed, so the same IDs mean the same index; returns whether it changed
+        index = BM25Index.build(retrieval_documents())
+        try:
+            previous_ids = BM25Index.load(BM25_INDEX_PATH).meta.get("ids")
+        except (OSError, ValueError, KeyError):
+            previous_ids = None  # No index yet
+        if index.meta["ids"] == previous_ids:
+            print("BM25 index unchanged")
+            return False
+        index.save(BM25_INDEX_PATH)
+        return True
+
+    bm25_task = PythonOperator(
+        task_id='bm25_task',
+        python_callable=bm25_task_func,
+    )
+
+    def embed_task_func():
+        # Only new chunks are embedded; the vectors of unchanged chunks are reused
+        report = EmbeddingStore(EMBEDDINGS_PATH).update(retrieval_documents())
+        if report["documents"] >= IVF_MIN_DOCUMENTS:
+            build_ivf(EMBEDDINGS_PATH)  # Large corpora are searched through the IVF lists
+        return bool(report["embedded"] or report["removed"])
+
+    embed_task = PythonOperator(
+        task_id='embed_task',
+        python_callable=embed_task_func,
+    )
+
     def upload_task_func():
-        # Iterate through all processed files in the directory
-        for root, _, files in os.walk(PROCESSED_DATA_PATH):
-            for file in files:
-                if file.endswith(".json"):  # Assuming you want to upload .txt files
-                    file_path = os.path.join(root, file)
-                    upload_to_blob(file_path, file)  # Upload each processed file
+        # Upload the document files and shards, not the manifest; unchanged blobs are skipped
+        upload_files(processed_files(PROCESSED_DATA_PATH))
 
     blob_storage_task = PythonOperator(
         task_id='blob_storage_task',
         python_callable=upload_task_func,
     )
 
+    def index_task_func():
+        # Report the adds, updates and deletes against the index, then apply them
+        # (INDEX_DRY_RUN=1 only reports); near-duplicates and obsolete chunks are deleted.
+        # Returns whether documents were sent to or deleted from the index
+        plan = sync_index(PROCESSED_DATA_PATH, dry_run=os.getenv("INDEX_DRY_RUN") == "1")
+        return bool(plan.get("sent", {}).get("indexed") or plan.get("deleted", {}).get("indexed"))
+
     index_task = PythonOperator(
         task_id='index_task',
-        python_callable=index_data_in_search,
+        python_callable=index_task_func,
     )
     
-    scrape_task >> preprocess_task >> blob_storage_task >> index_task
+    def publish_task_func(ti):
+        # One new index version per run, and only if a stage changed the indexed content; it
+        # invalidates the app's retrieval and answer caches. Runs after failures too, so the
+        # changes of the stages that succeeded are published
+        changes = {stage: ti.xcom_pull(task_ids=task_id) for stage, task_id in
+                   (("bm25", "bm25_task"), ("embeddings", "embed_task"), ("azure", "index_task"))}
+        publish_index_changes(changes, INDEX_VERSION_PATH)
+
+    publish_task = PythonOperator(
+        task_id='publish_task',
+        python_callable=publish_task_func,
+        trigger_rule='all_done',
+    )
+
+    scrape_task >> boilerplate_task >> preprocess_task >> dedup_task >> blob_storage_task >> index_task
+    dedup_task >> [bm25_task, embed_task]
+    [bm25_task, embed_task, index_task] >> publish_task
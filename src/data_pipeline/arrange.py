@@ -6,12 +6,14 @@ It saves the scraped content from each section into its own directory and text f
 """
 
 import os
+import json
 from .scrape import scrape_and_save
+from .page_store import PageStore
 
 # Define the base directory where all scraped data will be stored
 base_dir = '/opt/airflow/data/raw/'
 
-def arrange_scraped_data(fetched_links):
+def arrange_scraped_data(fetched_links, page_store=None):
     """
     Arrange the scraped data into directories and save the content into files.
 
@@ -20,7 +22,14 @@ def arrange_scraped_data(fetched_links):
 
     Args:
         fetched_links (dict): A dictionary of sections and their corresponding fetched links.
+        page_store (PageStore): Shared per-run page store holding the pages fetched by the crawl.
+            A single store is used for every section, so shared pages are downloaded only once.
+
+    Section files whose pages are all unchanged since the last run are left untouched, and the
+    URLs of the pages that did change are written to `changed_pages.json` for later stages.
     """
+    if page_store is None:
+        page_store = PageStore()
     print("Arranging scraped data...")  # Indicate the start of the arrangement process
     for section_name, links in fetched_links.items():
         # Define the directory path for each section
@@ -29,9 +38,19 @@ def arrange_scraped_data(fetched_links):
         
         # Ensure the directory exists; create it if it doesn't
         os.makedirs(dir_path, exist_ok=True)
-        
+
+        # Keep the existing file if none of the section's pages changed since the last run
+        if os.path.exists(file_path) and not any(page_store.is_changed(link) for link in links):
+            print(f"No changes in {section_name}, keeping {file_path}")
+            continue
+
         try:
             # Scrape and save the content for each section
-            scrape_and_save(links, file_path)
+            scrape_and_save(links, file_path, page_store=page_store)
         except Exception as e:
-            print(f"An error occurred while saving to {file_path}: {e}")
\ No newline at end of file
+            print(f"An error occurred while saving to {file_path}: {e}")
+
+    changed_urls = page_store.changed_urls()
+    with open(os.path.join(base_dir, 'changed_pages.json'), 'w', encoding='utf-8') as file:
+        json.dump(changed_urls, file, indent=4)
+    print(f"{len(changed_urls)} of {len(page_store)} pages changed since the last run")
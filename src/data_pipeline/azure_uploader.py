@@ -2,11 +2,14 @@
 azure_uploader.py
 
 This module uploads preprocessed data to Azure Blob Storage. 
-It provides a function to upload files to a specified container in Azure Blob Storage.
+It provides a function to upload files to a specified container in Azure Blob Storage, and
+`upload_files`, which uploads many files in parallel and skips the unchanged ones.
+All uploads share one `BlobServiceClient` and its connection pool.
 """
 import os
 from dotenv import load_dotenv
 import datetime
+import requests
 from config.mlflow_config import *
 collector = MetricsCollector()
 
@@ -14,6 +17,8 @@ load_dotenv()
 
 from azure.identity import ClientSecretCredential
 from azure.storage.blob import BlobServiceClient
+from azure.core.pipeline.transport import RequestsTransport
+from .blob_upload import BlobUploader, DEFAULT_UPLOAD_WORKERS
 
 
 client_id = os.getenv('AZURE_CLIENT_ID')
@@ -45,17 +50,52 @@ def upload_to_blob(file_path, file_name):
     blob_version = datetime.datetime.now().strftime("%d%m%yT%H%M%S")
     collector.add_metric('blob_version',blob_version)
     container_client = getContainerClient(container_name)
-    # Open the file and read its content
+    # Stream the file content
     try:
-        with open(file_path, 'r') as file:
-            container_client.upload_blob(name = file_name, data=file.read(), overwrite=True)
+        with open(file_path, 'rb') as file:  # Binary: shards may be zstd-compressed
+            container_client.upload_blob(name = file_name, data=file, overwrite=True)
             print(file_path + " has been uploaded to blob storage")
     except FileNotFoundError:
         print("The file was not found at the specified path.")
 
-def getBlobServiceClient():
-    return BlobServiceClient(account_url=storage_account_url, credential=credentials)
+def upload_files(file_paths, workers=DEFAULT_UPLOAD_WORKERS):
+    """
+    Upload files to Azure Blob Storage in parallel, named after their file names.
+
+    Files whose content matches the stored blob (same MD5) are skipped, and blobs that none of
+    the files produce any more (e.g. shards of a removed section) are deleted, so indexing from
+    the container never sees stale content.
+
+    Args:
+        file_paths (iterable): The paths of the files to upload.
+        workers (int): Number of upload threads.
+
+    Returns:
+        dict: The upload report of `BlobUploader.upload`.
+    """
+    blob_version = datetime.datetime.now().strftime("%d%m%yT%H%M%S")
+    collector.add_metric('blob_version',blob_version)
+    uploader = BlobUploader(getContainerClient(container_name, pool_size=workers), workers)
+    report = uploader.upload(((path, os.path.basename(path)) for path in file_paths), delete_orphans=True)
+    collector.add_metric('blob_files_per_second', report['files_per_second'])
+    collector.add_metric('blob_files_skipped', report['skipped'])
+    collector.add_metric('blob_files_deleted', report['deleted'])
+    return report
+
+_blob_service_client = None
+
+def getBlobServiceClient(pool_size=DEFAULT_UPLOAD_WORKERS):
+    """Return the shared BlobServiceClient, created on first use with a connection pool of `pool_size`."""
+    global _blob_service_client
+    if _blob_service_client is None:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _blob_service_client = BlobServiceClient(account_url=storage_account_url, credential=credentials,
+                                                 transport=RequestsTransport(session=session, session_owner=False))
+    return _blob_service_client
 
-def getContainerClient(container_name):
-    blob_service_client = getBlobServiceClient()
+def getContainerClient(container_name, pool_size=DEFAULT_UPLOAD_WORKERS):
+    blob_service_client = getBlobServiceClient(pool_size)
     return blob_service_client.get_container_client(container=container_name)
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+blob_upload.py
+
+This module uploads many files to one Azure Blob Storage container in parallel. A single
+container client, and so a single connection pool, is shared by a pool of upload threads.
+Files are streamed from their file handles instead of being read into memory, and a file whose
+MD5 matches the MD5 stored with its blob is not uploaded again.
+The container MD5s are read with one `list_blobs` listing, and every upload stores the MD5 of
+the file in the blob's content settings so the next run can compare it.
+"""
+
+import base64
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from azure.storage.blob import ContentSettings
+
+# Upload threads; the connection pool of the client should be at least as large
+DEFAULT_UPLOAD_WORKERS = int(os.getenv("BLOB_UPLOAD_WORKERS", "8"))
+
+READ_BLOCK_SIZE = 1 << 20
+
+
+def file_md5(path, block_size=READ_BLOCK_SIZE):
+    """Return the MD5 digest of a file, read in blocks."""
+    digest = hashlib.md5()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+def _as_bytes(md5):
+    # The SDK returns content_md5 as a bytearray; tolerate the base64 text of the REST API too
+    if md5 is None:
+        return None
+    if isinstance(md5, str):
+        return base64.b64decode(md5)
+    return bytes(md5)
+
+
+def stored_md5s(container_client):
+    """Return blob name -> MD5 digest (or None) for every blob in a container."""
+    md5s = {}
+    for blob in container_client.list_blobs():
+        settings = getattr(blob, "content_settings", None)
+        md5s[blob.name] = _as_bytes(getattr(settings, "content_md5", None))
+    return md5s
+
+
+class BlobUploader:
+    """
+    Uploads files to a blob container with a thread pool, skipping unchanged blobs.
+
+    Args:
+        container_client: The `ContainerClient` shared by all upload threads.
+        workers (int): Number of upload threads.
+    """
+
+    def __init__(self, container_client, workers=DEFAULT_UPLOAD_WORKERS):
+        self.container_client = container_client
+        self.workers = max(1, workers)
+
+    def _upload_one(self, path, name, remote_md5):
+        md5 = file_md5(path)
+        if remote_md5 is not None and remote_md5 == md5:
+            return "skipped", 0
+        size = os.path.getsize(path)
+        with open(path, 'rb') as file:
+            self.container_client.upload_blob(name=name, data=file, length=size, overwrite=True,
+                                              content_settings=ContentSettings(content_md5=bytearray(md5)))
+        return "uploaded", size
+
+    def _delete(self, names):
+        # Delete blobs that no local file produces any more; returns how many were deleted
+        def task(name):
+            try:
+                self.container_client.delete_blob(name)
+                return True
+            except Exception as e:
+                print(f"Error deleting orphaned blob {name}: {str(e)}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return sum(pool.map(task, names))
+
+    def upload(self, files, delete_orphans=False):
+        """
+        Upload files to the container.
+
+        Args:
+            files (iterable): (local path, blob name) pairs.
+            delete_orphans (bool): Also delete the blobs that are not among the files, so the
+                container mirrors them. Nothing is deleted when there are no files.
+
+        Returns:
+            dict: Counts of uploaded, skipped, failed and deleted files, the failed blob names,
+                the bytes uploaded, the elapsed seconds and the files per second.
+        """
+        files = list(files)
+        start = time.perf_counter()
+        remote = stored_md5s(self.container_client)
+        report = {"files": len(files), "uploaded": 0, "skipped": 0, "failed": 0, "failed_names": [],
+                  "bytes": 0, "deleted": 0}
+
+        def task(item):
+            path, name = item
+            try:
+                return name, self._upload_one(path, name, remote.get(name)), None
+            except Exception as e:
+                return name, None, e
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for name, result, error in pool.map(task, files):
+                if error is not None:
+                    print(f"Error uploading {name} to blob storage: {str(error)}")
+                    report["failed"] += 1
+                    report["failed_names"].append(name)
+                    continue
+                status, size = result
+                report[status] += 1
+                report["bytes"] += size
+
+        if delete_orphans:
+            if files:
+                report["deleted"] = self._delete(sorted(set(remote) - {name for _, name in files}))
+            else:
+                print("No files to upload; not deleting any blob")
+
+        report["seconds"] = time.perf_counter() - start
+        report["files_per_second"] = len(files) / report["seconds"] if report["seconds"] else 0.0
+        print(f"Uploaded {report['uploaded']} files ({report['bytes'] / 1e6:.1f} MB), skipped "
+              f"{report['skipped']} unchanged, {report['failed']} failed, deleted {report['deleted']} "
+              f"orphaned blobs; {report['files_per_second']:.1f} files/s with {self.workers} threads")
+        return report
@@ -0,0 +1,188 @@
+"""
+boilerplate.py
+
+This module removes boilerplate lines (menus, sidebars, footers) from the raw section files
+before preprocessing. It makes two streaming passes over the `*_scraped_content.txt` files: the
+first counts in how many pages each line appears, the second rewrites the files without the
+lines that appear in too many pages. Two passes are needed because whether a line is
+boilerplate depends on the whole corpus; only a fixed-size hash per distinct line is kept in
+memory, never the text itself.
+
+The hashes of the boilerplate lines are saved next to the raw data (BOILERPLATE_STATE_NAME) and
+applied again on later runs. Unchanged section files are left as they are between runs, already
+stripped, so after a recrawl only the changed sections bring their menus back: on their own
+they are too few pages to reach the threshold, but the saved hashes still remove them. A saved
+line that is not repeated on at least two pages of a run ages by one run, and is forgotten after
+DEFAULT_MAX_AGE such runs in a row, so menus the site no longer uses stop being stripped.
+"""
+
+import hashlib
+import os
+from collections import Counter
+
+# A line is boilerplate if it appears in at least this fraction of all pages...
+DEFAULT_THRESHOLD = 0.5
+# ...and in at least this many pages, so small corpora are left alone
+DEFAULT_MIN_PAGES = 5
+# Runs in a row a learned line may go without being repeated across pages before it is forgotten
+DEFAULT_MAX_AGE = 30
+
+PAGE_SEPARATOR = "=" * 80
+RAW_FILE_SUFFIX = "_scraped_content.txt"
+
+# Boilerplate line hashes learned by earlier runs, in the raw data folder: 8 bytes of hash and
+# a 2-byte age (runs since the line was last repeated across pages) per line
+BOILERPLATE_STATE_NAME = ".boilerplate_lines"
+HASH_SIZE = 8
+AGE_SIZE = 2
+
+
+def _line_hash(line):
+    return hashlib.blake2b(line.encode('utf-8'), digest_size=HASH_SIZE).digest()
+
+
+def _is_structural(line):
+    # Page markers written by `scrape_and_save` are never removed
+    return not line or line == PAGE_SEPARATOR or line.startswith("URL: ")
+
+
+def raw_files(input_folder):
+    """Return the paths of the raw section files below a folder, in a stable order."""
+    paths = []
+    for root, _, files in os.walk(input_folder):
+        for file in files:
+            if file.endswith(RAW_FILE_SUFFIX):
+                paths.append(os.path.join(root, file))
+    return sorted(paths)
+
+
+def count_line_pages(paths):
+    """
+    Count in how many pages each distinct line appears.
+
+    Args:
+        paths (list): Raw section files to read.
+
+    Returns:
+        tuple: (Counter of line hash -> number of pages, total number of pages)
+    """
+    counts = Counter()
+    pages = 0
+    for path in paths:
+        page_lines = set()
+        with open(path, 'r', encoding='utf-8') as file:
+            for raw_line in file:
+                line = raw_line.strip()
+                if line == PAGE_SEPARATOR:
+                    counts.update(page_lines)
+                    pages += 1
+                    page_lines = set()
+                elif not _is_structural(line):
+                    page_lines.add(_line_hash(line))
+        if page_lines:
+            counts.update(page_lines)
+            pages += 1
+    return counts, pages
+
+
+def strip_file(path, boilerplate):
+    """
+    Rewrite a raw file without its boilerplate lines.
+
+    The file is only replaced if something was removed, so unchanged files keep their
+    modification time.
+
+    Args:
+        path (str): The raw section file.
+        boilerplate (set): Hashes of the lines to remove.
+
+    Returns:
+        int: Number of bytes removed.
+    """
+    removed = 0
+    tmp_path = path + ".tmp"
+    with open(path, 'r', encoding='utf-8') as source, open(tmp_path, 'w', encoding='utf-8') as target:
+        for raw_line in source:
+            line = raw_line.strip()
+            if not _is_structural(line) and _line_hash(line) in boilerplate:
+                removed += len(raw_line.encode('utf-8'))
+            else:
+                target.write(raw_line)
+    if removed:
+        os.replace(tmp_path, path)
+    else:
+        os.remove(tmp_path)
+    return removed
+
+
+def load_boilerplate(input_folder):
+    """Return the boilerplate line hashes saved by earlier runs in a raw data folder, with their age."""
+    try:
+        with open(os.path.join(input_folder, BOILERPLATE_STATE_NAME), 'rb') as file:
+            data = file.read()
+    except OSError:
+        return {}
+    size = HASH_SIZE + AGE_SIZE
+    return {data[i:i + HASH_SIZE]: int.from_bytes(data[i + HASH_SIZE:i + size], 'little')
+            for i in range(0, len(data) - size + 1, size)}
+
+
+def save_boilerplate(input_folder, boilerplate):
+    """Save the boilerplate line hashes and their age in a raw data folder, atomically."""
+    path = os.path.join(input_folder, BOILERPLATE_STATE_NAME)
+    with open(path + ".tmp", 'wb') as file:
+        file.write(b"".join(line + min(age, 0xFFFF).to_bytes(AGE_SIZE, 'little')
+                            for line, age in sorted(boilerplate.items())))
+    os.replace(path + ".tmp", path)
+
+
+def remove_boilerplate(input_folder, threshold=DEFAULT_THRESHOLD, min_pages=DEFAULT_MIN_PAGES,
+                       max_age=DEFAULT_MAX_AGE):
+    """
+    Remove lines repeated across many pages from all raw section files.
+
+    The lines found now are added to those saved by earlier runs, and all of them are removed.
+    Saved lines not repeated across pages in `max_age` runs in a row are forgotten.
+
+    Args:
+        input_folder (str): Folder holding `data/raw/<section>/*_scraped_content.txt`.
+        threshold (float): Fraction of pages a line must appear in to be considered boilerplate.
+        min_pages (int): Minimum number of pages a line must appear in to be removed.
+        max_age (int): Runs a saved line may go without being repeated before it is forgotten.
+
+    Returns:
+        dict: Statistics with the number of pages, boilerplate lines (all, new in this run and
+            forgotten in this run) and bytes removed.
+    """
+    paths = raw_files(input_folder)
+    counts, pages = count_line_pages(paths)
+    cutoff = max(min_pages, threshold * pages)
+    known = load_boilerplate(input_folder)
+    found = {line for line, count in counts.items() if count >= cutoff}
+
+    # A saved line still repeated across pages (e.g. the menu of the recrawled sections) is
+    # current again; the others age
+    learned = {}
+    for line, age in known.items():
+        age = 0 if counts.get(line, 0) >= 2 else age + 1
+        if age < max_age:
+            learned[line] = age
+    learned.update((line, 0) for line in found)
+    if learned != known:
+        save_boilerplate(input_folder, learned)
+    boilerplate = set(learned)
+
+    bytes_before = sum(os.path.getsize(path) for path in paths)
+    bytes_removed = sum(strip_file(path, boilerplate) for path in paths) if boilerplate else 0
+
+    print(f"Removed {len(boilerplate)} boilerplate lines from {pages} pages in {len(paths)} files: "
+          f"{bytes_removed} of {bytes_before} bytes")
+    return {
+        "files": len(paths),
+        "pages": pages,
+        "boilerplate_lines": len(boilerplate),
+        "new_boilerplate_lines": len(found - known.keys()),
+        "expired_boilerplate_lines": len(known.keys() - learned.keys()),
+        "bytes_before": bytes_before,
+        "bytes_removed": bytes_removed,
+    }
@@ -0,0 +1,153 @@
+"""
+checkpoint.py
+
+This module persists the state of a crawl so an interrupted scrape can resume where it stopped.
+The crawl frontier, the links found for each section and every downloaded page are written to
+a local SQLite file as the crawl progresses; on resume the downloaded pages are loaded back into
+the page store and only the unfinished part of the frontier is crawled.
+
+A checkpoint only resumes the run it belongs to, so `prune_checkpoints` deletes those of other
+runs (e.g. of a day whose crawl failed) when a new run starts.
+"""
+
+import glob
+import os
+import sqlite3
+
+# Define the directory where crawl checkpoints are stored
+checkpoint_dir = '/opt/airflow/data/cache/checkpoints'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    body BLOB,
+    content_type TEXT,
+    error TEXT,
+    changed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS frontier (
+    section TEXT NOT NULL,
+    url TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    follow INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (section, url, follow)
+);
+CREATE TABLE IF NOT EXISTS links (
+    section TEXT NOT NULL,
+    link TEXT NOT NULL,
+    PRIMARY KEY (section, link)
+);
+"""
+
+
+def checkpoint_path(run_id):
+    """Return the checkpoint file used for a pipeline run."""
+    return os.path.join(checkpoint_dir, f"crawl-{run_id}.sqlite")
+
+
+def prune_checkpoints(keep=None):
+    """
+    Delete the checkpoint files of other runs.
+
+    Args:
+        keep (str): Checkpoint file of the current run, which is kept.
+
+    Returns:
+        int: Number of checkpoints deleted.
+    """
+    keep = os.path.abspath(keep) if keep else None
+    deleted = 0
+    for path in glob.glob(os.path.join(checkpoint_dir, "crawl-*.sqlite")):
+        if os.path.abspath(path) == keep:
+            continue
+        for stale in (path, path + "-journal"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        deleted += 1
+    if deleted:
+        print(f"Deleted {deleted} checkpoints of earlier runs")
+    return deleted
+
+
+class CrawlCheckpoint:
+    """
+    SQLite-backed record of a crawl in progress.
+
+    Args:
+        path (str): Path of the checkpoint file.
+        resume (bool): Keep the state of a previous, interrupted crawl. If False, any existing
+            state is discarded and the crawl starts from scratch.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if not resume and os.path.exists(path):
+            os.remove(path)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def load_pages(self, page_store):
+        """
+        Load the pages downloaded before the interruption into a page store.
+
+        Returns:
+            int: Number of pages loaded.
+        """
+        rows = self.conn.execute("SELECT url, body, content_type, error, changed FROM pages").fetchall()
+        for url, body, content_type, error, changed in rows:
+            if error is None:
+                page_store.put(url, body, content_type, changed=bool(changed))
+            else:
+                page_store.put_error(url, error)
+        return len(rows)
+
+    def save_page(self, page):
+        """Record a downloaded (or failed) page."""
+        self.conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                          (page.url, page.body, page.content_type, page.error, int(page.changed)))
+        self.conn.commit()
+
+    def add(self, items):
+        """Add (section, url, depth, follow) items to the frontier."""
+        self.conn.executemany("INSERT OR IGNORE INTO frontier (section, url, depth, follow) VALUES (?, ?, ?, ?)",
+                              [(section or '', url, depth, int(follow)) for section, url, depth, follow in items])
+
+    def complete(self, item, links=()):
+        """Mark a frontier item as done and record the links found on its page, atomically."""
+        section, url, _, follow = item
+        self.conn.executemany("INSERT OR IGNORE INTO links VALUES (?, ?)",
+                              [(section, link) for link in links])
+        self.conn.execute("UPDATE frontier SET done = 1 WHERE section = ? AND url = ? AND follow = ?",
+                          (section or '', url, int(follow)))
+        self.conn.commit()
+
+    def pending(self):
+        """Return the frontier items that were not completed, in insertion order."""
+        rows = self.conn.execute("SELECT section, url, depth, follow FROM frontier WHERE done = 0 ORDER BY rowid")
+        return [(section or None, url, depth, bool(follow)) for section, url, depth, follow in rows]
+
+    def followed(self):
+        """Return the URLs queued for following in each section."""
+        followed = {}
+        for section, url in self.conn.execute("SELECT section, url FROM frontier WHERE follow = 1"):
+            followed.setdefault(section, set()).add(url)
+        return followed
+
+    def links(self):
+        """Return the links recorded for each section."""
+        links = {}
+        for section, link in self.conn.execute("SELECT section, link FROM links"):
+            links.setdefault(section, set()).add(link)
+        return links
+
+    def close(self):
+        self.conn.close()
+
+    def clear(self):
+        """Delete the checkpoint once the crawl it records has completed."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
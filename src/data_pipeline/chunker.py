@@ -0,0 +1,229 @@
+"""
+chunker.py
+
+This module splits the raw section files into small passages for retrieval. Each page of a
+section file (the text between a "URL: ..." header and the separator line written by
+`scrape_and_save`) is split at its "#" heading lines, and the text under each heading is packed
+into chunks of at most `max_tokens` tokens. Consecutive chunks of the same heading can overlap
+by a few tokens so a sentence cut at a chunk boundary is still found whole. Every chunk keeps
+the source URL, the section and the heading path it came from, and its text keeps its case and
+punctuation so it can be passed to the model as it is.
+"""
+
+import os
+import re
+
+from .boilerplate import PAGE_SEPARATOR, RAW_FILE_SUFFIX
+
+# Default chunk size and overlap between consecutive chunks, in tokens
+DEFAULT_MAX_TOKENS = 256
+DEFAULT_OVERLAP = 32
+
+# Chunks are also bounded in bytes, well below the 20000-byte term limit of the search index
+# (`preprocess.MAX_TERM_SIZE`): a run of characters without spaces counts as a single token
+MAX_CHUNK_BYTES = 8000
+
+# Approximate tokenizer: words and single punctuation characters
+TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+# Heading lines written by the lxml extractor ("#" per level)
+HEADING_RE = re.compile(r'^(#{1,6}) (.+)$')
+
+
+def count_tokens(text):
+    """Return the approximate number of tokens in a text."""
+    return len(TOKEN_RE.findall(text))
+
+
+def section_name(path):
+    """Return the section a raw file belongs to, e.g. "section-2" for "section-2_scraped_content.txt"."""
+    name = os.path.basename(path)
+    return name[:-len(RAW_FILE_SUFFIX)] if name.endswith(RAW_FILE_SUFFIX) else os.path.splitext(name)[0]
+
+
+def iter_pages(path):
+    """
+    Read the pages of a raw section file one at a time.
+
+    Pages that could not be retrieved or had no content are skipped.
+
+    Args:
+        path (str): The raw section file.
+
+    Yields:
+        tuple: (URL of the page, list of its non-empty text lines)
+    """
+    url = None
+    lines = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for raw_line in file:
+            line = raw_line.strip()
+            if line == PAGE_SEPARATOR:
+                if url is not None and lines:
+                    yield url, lines
+                url = None
+                lines = []
+            elif url is None:
+                if line.startswith("URL: "):
+                    url = line[len("URL: "):]
+            elif line:
+                lines.append(line)
+    if url is not None and lines:
+        yield url, lines
+
+
+def split_headings(lines):
+    """
+    Group the lines of a page by the heading they appear under.
+
+    Args:
+        lines (list): The text lines of a page.
+
+    Yields:
+        tuple: (heading path such as "Batch Jobs > Job Arrays", heading line or "", body lines)
+    """
+    path = []
+    heading_line = ""
+    body = []
+    for line in lines:
+        match = HEADING_RE.match(line)
+        if match:
+            if body:
+                yield " > ".join(title for _, title in path), heading_line, body
+            level = len(match.group(1))
+            path = [(lvl, title) for lvl, title in path if lvl < level] + [(level, match.group(2))]
+            heading_line = line
+            body = []
+        else:
+            body.append(line)
+    if body:
+        yield " > ".join(title for _, title in path), heading_line, body
+
+
+def _byte_size(text):
+    return len(text.encode('utf-8'))
+
+
+def _split_word(word, budget, max_bytes):
+    # Hard-split a run without spaces at token boundaries, and inside tokens longer than max_bytes
+    atoms = []
+    for match in TOKEN_RE.finditer(word):
+        atom = match.group()
+        step = max(1, max_bytes // 4)  # At most 4 bytes per character
+        atoms.extend(atom[i:i + step] for i in range(0, len(atom), step))
+    piece, tokens, size = "", 0, 0
+    for atom in atoms:
+        atom_size = _byte_size(atom)
+        if piece and (tokens + 1 > budget or size + atom_size > max_bytes):
+            yield piece
+            piece, tokens, size = "", 0, 0
+        piece += atom
+        tokens += 1
+        size += atom_size
+    if piece:
+        yield piece
+
+
+def _split_long_line(line, budget, max_bytes=MAX_CHUNK_BYTES):
+    # Cut a line longer than the budget at word boundaries; words over the budget are cut too
+    piece, tokens, size = [], 0, 0
+    for word in line.split():
+        word_tokens, word_size = count_tokens(word), _byte_size(word)
+        parts = [word] if word_tokens <= budget and word_size <= max_bytes else _split_word(word, budget, max_bytes)
+        for part in parts:
+            part_tokens, part_size = count_tokens(part), _byte_size(part)
+            if piece and (tokens + part_tokens > budget or size + part_size + 1 > max_bytes):
+                yield " ".join(piece)
+                piece, tokens, size = [], 0, 0
+            piece.append(part)
+            tokens += part_tokens
+            size += part_size + (1 if len(piece) > 1 else 0)
+    if piece:
+        yield " ".join(piece)
+
+
+def _overlap_text(text, overlap, max_bytes=MAX_CHUNK_BYTES):
+    # The last words of a chunk, up to `overlap` tokens and `max_bytes` bytes
+    words = []
+    tokens = size = 0
+    for word in reversed(text.split()):
+        tokens += count_tokens(word)
+        size += _byte_size(word) + 1
+        if tokens > overlap or size > max_bytes:
+            break
+        words.append(word)
+    return " ".join(reversed(words))
+
+
+def pack_lines(lines, max_tokens=DEFAULT_MAX_TOKENS, overlap=DEFAULT_OVERLAP, max_bytes=MAX_CHUNK_BYTES):
+    """
+    Pack lines into chunks of at most `max_tokens` tokens and `max_bytes` bytes.
+
+    Lines are kept whole unless a single line exceeds the budget; such a line is cut at word
+    boundaries, and a word that exceeds the budget on its own is cut too. Each chunk after the
+    first starts with the last `overlap` tokens of the previous one.
+
+    Args:
+        lines (list): The lines to pack.
+        max_tokens (int): Token budget of a chunk.
+        overlap (int): Number of tokens repeated from the previous chunk.
+        max_bytes (int): Size budget of a chunk, in UTF-8 bytes.
+
+    Returns:
+        list: The chunk texts.
+    """
+    overlap = min(overlap, max_tokens // 2)
+    chunks = []
+    current, tokens, size = [], 0, 0
+    for line in lines:
+        line_tokens = count_tokens(line)
+        if line_tokens <= max_tokens - overlap and _byte_size(line) <= max_bytes // 2:
+            pieces = [line]
+        else:
+            pieces = list(_split_long_line(line, max_tokens - overlap, max_bytes // 2))
+        for piece in pieces:
+            piece_tokens, piece_size = count_tokens(piece), _byte_size(piece)
+            if current and (tokens + piece_tokens > max_tokens or size + piece_size + 1 > max_bytes):
+                chunks.append("\n".join(current))
+                carried = _overlap_text(chunks[-1], overlap, max_bytes // 2 - 1) if overlap else ""
+                current = [carried] if carried else []
+                tokens, size = count_tokens(carried), _byte_size(carried)
+            current.append(piece)
+            tokens += piece_tokens
+            size += piece_size + (1 if len(current) > 1 else 0)
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def chunk_file(path, max_tokens=DEFAULT_MAX_TOKENS, overlap=DEFAULT_OVERLAP, section=None):
+    """
+    Split a raw section file into retrieval chunks.
+
+    Chunks never cross a page or heading boundary. The heading line is repeated at the top of
+    each of its chunks and counts towards the token budget; a heading longer than half the
+    budget is cut. No chunk exceeds `max_tokens` tokens or MAX_CHUNK_BYTES bytes.
+
+    Args:
+        path (str): The raw section file.
+        max_tokens (int): Token budget of a chunk.
+        overlap (int): Number of tokens repeated between consecutive chunks of a heading.
+        section (str): Section name; derived from the file name if not given.
+
+    Yields:
+        dict: A chunk with its "content", "source_url", "section" and "heading".
+    """
+    section = section or section_name(path)
+    for url, lines in iter_pages(path):
+        for heading, heading_line, body in split_headings(lines):
+            if heading_line:
+                # A heading takes at most half of the chunk
+                heading_line = next(_split_long_line(heading_line, max_tokens // 2, MAX_CHUNK_BYTES // 2))
+            budget = max_tokens - count_tokens(heading_line)
+            for text in pack_lines(body, budget, overlap, MAX_CHUNK_BYTES - _byte_size(heading_line) - 1):
+                yield {
+                    "content": f"{heading_line}\n{text}" if heading_line else text,
+                    "source_url": url,
+                    "section": section,
+                    "heading": heading,
+                }
@@ -0,0 +1,257 @@
+"""
+crawler.py
+
+This module implements an asynchronous, breadth-first crawler for the documentation sections.
+A fixed number of workers pull URLs from a shared frontier and fetch them over one pooled
+keep-alive HTTP session, so the scrape task no longer waits on a single page at a time.
+Requests go through a per-host `PolitenessLimiter`, which caps the request rate and lowers the
+number of requests in flight when the host starts throttling or slowing down.
+"""
+
+import asyncio
+import time
+from urllib.parse import urljoin
+
+import aiohttp
+from bs4 import BeautifulSoup
+from .page_store import PageStore, page_key
+from .politeness import PolitenessLimiter, THROTTLE_STATUSES, MAX_RETRIES, DEFAULT_RATE, retry_delay
+
+# Number of concurrent fetch workers and the maximum link depth followed from a section root
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_DEPTH = 10
+
+# Timeouts (in seconds) applied to every request made by the crawler
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10)
+
+
+def extract_links(base_url, html):
+    """
+    Extract all absolute link targets from an HTML page.
+
+    Args:
+        base_url (str): The URL the page was fetched from, used to resolve relative links.
+        html (bytes or str): The page body.
+
+    Returns:
+        list: Absolute URLs in document order.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    return [urljoin(base_url, a_tag['href']) for a_tag in soup.find_all("a", href=True)]
+
+
+class Crawler:
+    """
+    Breadth-first crawler that discovers the links of each section concurrently.
+
+    Every section keeps the semantics of `get_all_links`: all links found on the pages of a
+    section are reported, but a link is only followed if it starts with the URL of the page
+    it was found on, up to `max_depth` levels below the section root.
+
+    Every page is downloaded at most once per run and kept in the page store. When
+    `fetch_links` is set, the reported links that are not followed are downloaded into the
+    store as well, so text extraction can run entirely from the store afterwards.
+
+    With a `CrawlCheckpoint`, the frontier, links and downloaded pages are recorded as the
+    crawl progresses, and a crawl started from an existing checkpoint only fetches what the
+    interrupted crawl had not completed.
+
+    At most `workers` requests are sent to a host at once, at no more than `rate` requests
+    per second; responses with a throttling status are retried after a backoff.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_depth=DEFAULT_MAX_DEPTH, timeout=DEFAULT_TIMEOUT,
+                 page_store=None, fetch_links=False, checkpoint=None, rate=DEFAULT_RATE):
+        self.workers = workers
+        self.max_depth = max_depth
+        self.timeout = timeout
+        self.page_store = page_store if page_store is not None else PageStore()
+        self.fetch_links = fetch_links
+        self.checkpoint = checkpoint
+        self.limiter = PolitenessLimiter(workers, rate=rate)
+        if checkpoint is not None:
+            restored = checkpoint.load_pages(self.page_store)
+            if restored:
+                print(f"Resuming crawl with {restored} pages from {checkpoint.path}")
+        self.pages_fetched = 0
+        self.elapsed = 0.0
+        self._inflight = {}
+
+    @property
+    def pages_per_second(self):
+        """Fetch throughput of the last crawl."""
+        return self.pages_fetched / self.elapsed if self.elapsed else 0.0
+
+    async def fetch(self, session, url):
+        """
+        Return a page from the page store, downloading it if it has not been fetched yet.
+
+        Concurrent requests for the same page share a single download.
+
+        Args:
+            session (aiohttp.ClientSession): The shared HTTP session.
+            url (str): The URL to fetch.
+
+        Returns:
+            Page: The stored page.
+        """
+        key = page_key(url)
+        page = self.page_store.get(key)
+        if page is not None:
+            return page
+        if key not in self._inflight:
+            self._inflight[key] = asyncio.ensure_future(self._download(session, key))
+        return await self._inflight[key]
+
+    async def _download(self, session, url):
+        try:
+            for attempt in range(MAX_RETRIES + 1):
+                async with self.limiter.slot(url) as slot:
+                    async with session.get(url, headers=self.page_store.conditional_headers(url)) as response:
+                        slot.status = response.status
+                        if response.status in THROTTLE_STATUSES and attempt < MAX_RETRIES:
+                            delay = retry_delay(attempt, response.headers.get('Retry-After'))
+                        else:
+                            response.raise_for_status()
+                            body = await response.read()
+                            self.pages_fetched += 1
+                            page = self.page_store.put_response(url, response.status, body, response.headers)
+                            break
+                print(f"{url} answered {slot.status}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Error fetching {url}: {e}")
+            page = self.page_store.put_error(url, e)
+        finally:
+            self._inflight.pop(url, None)
+        if self.checkpoint is not None:
+            self.checkpoint.save_page(page)
+        return page
+
+    def _enqueue(self, queue, item):
+        queue.put_nowait(item)
+        if self.checkpoint is not None:
+            self.checkpoint.add([item])
+
+    async def _worker(self, session, queue, links, seen):
+        while True:
+            item = await queue.get()
+            section, url, depth, follow = item
+            try:
+                page = await self.fetch(session, url)
+                page_links = []
+                if follow and page.ok and page.is_html:  # Nothing to follow in failed pages, images, PDFs, etc.
+                    page_links = extract_links(url, page.body)
+                for link in page_links:
+                    links[section].add(link)
+                    key = page_key(link)
+                    # Only follow links below the current page, once per section
+                    if link.startswith(url) and depth < self.max_depth and key not in seen[section]:
+                        seen[section].add(key)
+                        self._enqueue(queue, (section, link, depth + 1, True))
+                    elif self.fetch_links and key not in self.page_store and key not in self._inflight:
+                        self._enqueue(queue, (section, link, depth + 1, False))
+                if self.checkpoint is not None:
+                    self.checkpoint.complete(item, page_links)
+            except Exception as e:
+                print(f"Error crawling {url}: {e}")
+            finally:
+                queue.task_done()
+
+    async def _run(self, queue, links, seen):
+        start = time.perf_counter()
+        connector = aiohttp.TCPConnector(limit=self.workers, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(connector=connector, timeout=self.timeout) as session:
+            workers = [asyncio.create_task(self._worker(session, queue, links, seen))
+                       for _ in range(self.workers)]
+            await queue.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        self.elapsed = time.perf_counter() - start
+
+        print(f"Crawled {self.pages_fetched} pages in {self.elapsed:.2f}s "
+              f"({self.pages_per_second:.2f} pages/sec)")
+        self.limiter.report()
+
+    async def prefetch(self, urls):
+        """
+        Download a list of pages into the page store without following their links.
+
+        Args:
+            urls (iterable): The page URLs to download.
+        """
+        queue = asyncio.Queue()
+        for key in dict.fromkeys(page_key(url) for url in urls):
+            if key not in self.page_store:
+                self._enqueue(queue, (None, key, 0, False))
+        await self._run(queue, {}, {})
+
+    async def crawl(self, section_urls):
+        """
+        Crawl every section and collect its links.
+
+        Args:
+            section_urls (dict): A dictionary containing section names and their root URLs.
+
+        Returns:
+            dict: A dictionary of sections and their corresponding fetched links.
+        """
+        links = {section: set() for section in section_urls}
+        seen = {section: set() for section in section_urls}
+        queue = asyncio.Queue()
+
+        if self.checkpoint is not None:
+            # Restore the state of an interrupted crawl and continue its unfinished frontier
+            for section, section_links in self.checkpoint.links().items():
+                links.setdefault(section, set()).update(section_links)
+            for section, followed in self.checkpoint.followed().items():
+                seen.setdefault(section, set()).update(page_key(url) for url in followed)
+            for item in self.checkpoint.pending():
+                if item[0] is None or item[0] in seen:
+                    queue.put_nowait(item)
+
+        for section, urls in section_urls.items():
+            for url in urls:
+                key = page_key(url)
+                if key not in seen[section]:
+                    seen[section].add(key)
+                    self._enqueue(queue, (section, url, 0, True))
+
+        await self._run(queue, links, seen)
+        return {section: list(links[section]) for section in section_urls}
+
+
+def crawl_sections(section_urls, workers=DEFAULT_WORKERS, max_depth=DEFAULT_MAX_DEPTH, page_store=None,
+                   checkpoint=None):
+    """
+    Run the asynchronous crawler from synchronous code.
+
+    Args:
+        section_urls (dict): A dictionary containing section names and their root URLs.
+        workers (int): Number of concurrent fetch workers.
+        max_depth (int): The maximum link depth followed from a section root.
+        page_store (PageStore): If given, every reported link is downloaded into this store
+            so the pages can be extracted without fetching them again.
+        checkpoint (CrawlCheckpoint): Checkpoint recording the crawl, and the state to resume from.
+
+    Returns:
+        dict: A dictionary of sections and their corresponding fetched links.
+    """
+    crawler = Crawler(workers=workers, max_depth=max_depth, page_store=page_store,
+                      fetch_links=page_store is not None, checkpoint=checkpoint)
+    return asyncio.run(crawler.crawl(section_urls))
+
+
+def prefetch_pages(urls, page_store, workers=DEFAULT_WORKERS, checkpoint=None):
+    """
+    Download a list of pages into the page store concurrently.
+
+    Args:
+        urls (iterable): The page URLs to download.
+        page_store (PageStore): The per-run page store to fill.
+        workers (int): Number of concurrent fetch workers.
+        checkpoint (CrawlCheckpoint): Checkpoint recording the downloaded pages.
+    """
+    crawler = Crawler(workers=workers, page_store=page_store, checkpoint=checkpoint)
+    asyncio.run(crawler.prefetch(urls))
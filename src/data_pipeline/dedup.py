@@ -0,0 +1,176 @@
+"""
+dedup.py
+
+This module finds near-duplicate documents in the processed data before it is indexed. Pages
+such as the glossary and the FAQs are linked from every section, so the same passages end up,
+with small differences, in several section files and would fill the retrieval slots with
+copies of each other.
+
+Every document is reduced to a MinHash signature of its word shingles, and locality-sensitive
+hashing (LSH) on bands of the signature finds the candidate pairs without comparing every
+document with every other. Candidates whose estimated Jaccard similarity reaches the threshold
+are grouped, and only the first document of each group is kept. The duplicates are recorded in
+the processed manifest, so the documents stay on disk and are skipped by the index stage.
+"""
+
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+
+from .manifest import ProcessedManifest, iter_documents
+
+# Jaccard similarity above which two documents are duplicates
+DEFAULT_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+
+# Signature length, and the number of consecutive words per shingle
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+
+# Mersenne prime for the permutation hashes; a * x + b stays below 2**64
+PRIME = (1 << 31) - 1
+
+WORD_RE = re.compile(r'\w+')
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """
+    Return the hashes of the word shingles of a text.
+
+    Args:
+        text (str): The document content.
+        size (int): Words per shingle; shorter texts are a single shingle.
+
+    Returns:
+        numpy.ndarray: The distinct shingle hashes, as uint64.
+    """
+    words = WORD_RE.findall(text.lower())
+    count = max(len(words) - size + 1, 1)
+    hashes = {zlib.crc32(" ".join(words[i:i + size]).encode('utf-8')) for i in range(count)}
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+def lsh_params(threshold, num_perm=NUM_PERM):
+    """
+    Choose the LSH bands and rows for a similarity threshold.
+
+    Two documents become candidates when all the rows of one band of their signatures match,
+    which happens with probability 1 - (1 - s**rows)**bands for a similarity s. The most
+    selective split whose S-curve midpoint, (1 / bands) ** (1 / rows), is still at or below the
+    threshold is used, so pairs above the threshold are rarely missed.
+
+    Returns:
+        tuple: (bands, rows), with bands * rows == num_perm.
+    """
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        if (1 / bands) ** (1 / rows) <= threshold:
+            return bands, rows
+    return num_perm, 1
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures with NUM_PERM random permutations (a * x + b) mod PRIME.
+
+    Args:
+        num_perm (int): Signature length.
+        seed (int): Seed of the permutations; signatures are only comparable for the same seed.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, text):
+        """Return the MinHash signature of a text."""
+        x = shingles(text) % np.uint64(PRIME)
+        return ((self.a * x + self.b) % np.uint64(PRIME)).min(axis=1)
+
+
+def find_duplicates(documents, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM):
+    """
+    Find the near-duplicate documents of a collection.
+
+    Args:
+        documents (iterable): Documents with "id" and "content". Repeated IDs are read once.
+        threshold (float): Estimated Jaccard similarity above which documents are duplicates.
+        num_perm (int): Signature length.
+
+    Returns:
+        tuple: (number of distinct documents, dict duplicate ID -> ID of the document kept).
+            The document kept for a group is the first of the group in `documents`.
+    """
+    hasher = MinHasher(num_perm)
+    bands, rows = lsh_params(threshold, num_perm)
+    ids, signatures, seen = [], [], set()
+    for document in documents:
+        if document["id"] in seen:
+            continue
+        seen.add(document["id"])
+        ids.append(document["id"])
+        signatures.append(hasher.signature(document.get("content", "")))
+    if not ids:
+        return 0, {}
+    signatures = np.vstack(signatures)
+
+    # Union-find over the verified candidate pairs; the root is the earliest document
+    parent = list(range(len(ids)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        buckets = {}
+        for i, key in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets.setdefault(key.tobytes(), []).append(i)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                root, other_root = find(first), find(other)
+                if root == other_root:
+                    continue
+                if np.mean(signatures[first] == signatures[other]) >= threshold:
+                    parent[max(root, other_root)] = min(root, other_root)
+
+    duplicates = {ids[i]: ids[find(i)] for i in range(len(ids)) if find(i) != i}
+    return len(ids), duplicates
+
+
+def dedup_data(output_folder, threshold=DEFAULT_THRESHOLD):
+    """
+    Find the near-duplicate documents of a processed data folder and record them in its manifest.
+
+    Every run looks at all the documents again, including the duplicates found before, so a
+    document is indexed again as soon as it no longer has a near-duplicate.
+
+    Args:
+        output_folder (str): The processed data folder.
+        threshold (float): Estimated Jaccard similarity above which documents are duplicates.
+
+    Returns:
+        dict: The number of documents, duplicates removed and documents kept, and the threshold.
+    """
+    start = time.perf_counter()
+    total, duplicates = find_duplicates(iter_documents(output_folder), threshold)
+    manifest = ProcessedManifest(output_folder)
+    manifest.duplicates = duplicates
+    manifest.save()
+    report = {
+        "documents": total,
+        "duplicates": len(duplicates),
+        "kept": total - len(duplicates),
+        "threshold": threshold,
+        "seconds": time.perf_counter() - start,
+    }
+    print(f"Deduplication: {report['duplicates']} of {total} documents are near-duplicates "
+          f"(threshold {threshold}), {report['kept']} kept")
+    return report
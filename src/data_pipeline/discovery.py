@@ -0,0 +1,208 @@
+"""
+discovery.py
+
+This module discovers the pages of each section from the manifests a Sphinx site publishes,
+instead of following links page by page. The Sphinx inventory (`objects.inv`) lists every
+document of the site and `sitemap.xml`, when present, lists every published URL, so the full
+page set is known after a handful of requests.
+"""
+
+import re
+import zlib
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin, urlparse, urldefrag
+
+import requests
+
+# Timeout (in seconds) for manifest requests
+DEFAULT_TIMEOUT = 30
+
+# Matches one entry of a version 2 Sphinx inventory: name, domain:role, priority, uri, display name
+INVENTORY_LINE = re.compile(r'(.+?)\s+(\S+:\S+)\s+(-?\d+)\s+(\S*)\s+(.*)')
+
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+# Pages Sphinx generates for every site (general index, module index, search) and lists in its
+# inventory as std:label entries; they hold no documentation content
+SPHINX_SPECIAL_PAGES = frozenset({"genindex", "modindex", "py-modindex", "search"})
+
+
+def is_sphinx_special_page(uri):
+    """Return True for the built-in index and search pages of a Sphinx site (html or dirhtml URI)."""
+    page = urldefrag(uri)[0].rstrip('/').rsplit('/', 1)[-1]
+    return (page[:-len('.html')] if page.endswith('.html') else page) in SPHINX_SPECIAL_PAGES
+
+
+def parse_sphinx_inventory(data):
+    """
+    Parse a version 2 Sphinx inventory and return the documents it lists.
+
+    Args:
+        data (bytes): Contents of `objects.inv`.
+
+    Returns:
+        list: Document URIs relative to the site root, without anchors, in inventory order.
+            Sphinx's generated index and search pages are left out.
+
+    Raises:
+        ValueError: If the data is not a version 2 Sphinx inventory.
+    """
+    header = []
+    for _ in range(4):
+        line, _, data = data.partition(b'\n')
+        header.append(line.decode('utf-8', 'replace'))
+    if not header[0].startswith('# Sphinx inventory version 2'):
+        raise ValueError(f"Unsupported inventory format: {header[0]!r}")
+
+    uris = []
+    seen = set()
+    for line in zlib.decompress(data).decode('utf-8').splitlines():
+        match = INVENTORY_LINE.match(line.rstrip())
+        if not match:
+            continue
+        name, role, _, uri, _ = match.groups()
+        if uri.endswith('$'):
+            uri = uri[:-1] + name  # '$' abbreviates the object name
+        uri = urldefrag(uri)[0]
+        if role in ('std:label', 'std:doc') and (name in SPHINX_SPECIAL_PAGES or is_sphinx_special_page(uri)):
+            continue  # Generated index and search pages
+        if uri and uri not in seen:
+            seen.add(uri)
+            uris.append(uri)
+    return uris
+
+
+def parse_sitemap(data):
+    """
+    Parse a sitemap or sitemap index.
+
+    Args:
+        data (bytes): Contents of the XML document.
+
+    Returns:
+        tuple: (page URLs, nested sitemap URLs)
+    """
+    root = ET.fromstring(data)
+    locs = [loc.text.strip() for loc in root.iter(f'{SITEMAP_NS}loc') if loc.text]
+    if root.tag == f'{SITEMAP_NS}sitemapindex':
+        return [], locs
+    return locs, []
+
+
+def section_scope(url):
+    """
+    Return the URL prefix that bounds a section.
+
+    A section rooted at a directory index (`.../gpus/index.html` or `.../gpus/`) covers every
+    page below that directory; a section rooted at a single page covers that page only.
+    """
+    page = urldefrag(url)[0]
+    if page.endswith('/') or page.rsplit('/', 1)[-1] == 'index.html':
+        return page.rsplit('/', 1)[0] + '/'
+    return page
+
+
+class ManifestDiscovery:
+    """
+    Build the page set of each section from a site's `objects.inv` and `sitemap.xml`.
+
+    Manifests are looked up once per site root and reused for every section of the run.
+    """
+
+    def __init__(self, session=None, timeout=DEFAULT_TIMEOUT):
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.requests_made = 0
+        self._sites = {}
+
+    def _get(self, url):
+        self.requests_made += 1
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            if response.status_code == 200:
+                return response.content
+        except requests.RequestException as e:
+            print(f"Error fetching {url}: {e}")
+        return None
+
+    def _candidate_roots(self, url):
+        # Every ancestor directory of the URL, deepest first
+        parsed = urlparse(urldefrag(url)[0])
+        parts = parsed.path.split('/')[:-1]
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        return [origin + '/'.join(parts[:i]) + '/' for i in range(len(parts), 0, -1)]
+
+    def _site_pages(self, root):
+        if root in self._sites:
+            return self._sites[root]
+        pages = []
+        inventory = self._get(root + 'objects.inv')
+        if inventory is not None:
+            try:
+                pages = [urljoin(root, uri) for uri in parse_sphinx_inventory(inventory)]
+            except (ValueError, zlib.error) as e:
+                print(f"Could not parse inventory at {root}: {e}")
+        sitemaps = [root + 'sitemap.xml']
+        origin = urljoin(root, '/')
+        if pages and origin != root:
+            sitemaps.append(origin + 'sitemap.xml')  # Read the Docs serves one sitemap per domain
+        for sitemap_url in sitemaps:
+            pages.extend(self._sitemap_pages(sitemap_url, root))
+        self._sites[root] = list(dict.fromkeys(pages))
+        return self._sites[root]
+
+    def _sitemap_pages(self, sitemap_url, root, depth=0):
+        data = self._get(sitemap_url)
+        if data is None:
+            return []
+        try:
+            pages, sitemaps = parse_sitemap(data)
+        except ET.ParseError as e:
+            print(f"Could not parse sitemap {sitemap_url}: {e}")
+            return []
+        if depth < 2:
+            for nested in sitemaps:
+                pages.extend(self._sitemap_pages(nested, root, depth + 1))
+        return [page for page in pages if page.startswith(root) and not is_sphinx_special_page(page)]
+
+    def discover(self, url):
+        """
+        Return the pages of the section rooted at a URL.
+
+        Args:
+            url (str): The section root URL.
+
+        Returns:
+            list or None: The section's page URLs, or None if no manifest covers the URL.
+        """
+        for root in self._candidate_roots(url):
+            pages = self._site_pages(root)
+            if pages:
+                scope = section_scope(url)
+                return [page for page in pages if page.startswith(scope)]
+        return None
+
+
+def discover_section_pages(section_urls, discovery=None):
+    """
+    Discover the pages of every section from the site manifests.
+
+    Args:
+        section_urls (dict): A dictionary containing section names and their URLs.
+        discovery (ManifestDiscovery): Discovery instance to use; a new one by default.
+
+    Returns:
+        tuple: (dict of sections and their page URLs, dict of sections without a manifest)
+    """
+    discovery = discovery or ManifestDiscovery()
+    discovered, missing = {}, {}
+    for section, urls in section_urls.items():
+        for url in urls:
+            pages = discovery.discover(url)
+            if pages is None:
+                missing.setdefault(section, []).append(url)
+            else:
+                discovered.setdefault(section, []).extend(pages)
+    print(f"Discovered {sum(len(pages) for pages in discovered.values())} pages "
+          f"with {discovery.requests_made} manifest requests")
+    return discovered, missing
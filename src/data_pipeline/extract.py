@@ -0,0 +1,168 @@
+"""
+extract.py
+
+This module turns fetched HTML pages into the text that is saved for each section.
+Extractors are pluggable and selected by name:
+
+- "bs4": the original BeautifulSoup extractor, which returns every text node of the page.
+- "lxml": a faster extractor that keeps only the main article of a Sphinx page (dropping the
+  navigation sidebar, table of contents, header and footer) and writes headings as
+  Markdown-style "#" lines so the structure of the page survives extraction.
+"""
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:  # lxml is optional; fall back to the BeautifulSoup extractor
+    lxml = None
+
+# XPath expressions for the main content element of Sphinx themes, in order of preference
+MAIN_CONTENT_XPATHS = (
+    '//article[@role="main"]',  # Furo
+    '//div[@role="main"]',  # Read the Docs, Alabaster
+    '//main',
+    '//div[contains(concat(" ", normalize-space(@class), " "), " body ")]',
+)
+
+# Elements removed before extracting text
+DROP_XPATH = ('//script | //style | //noscript | //svg | //template'
+              ' | //a[contains(concat(" ", normalize-space(@class), " "), " headerlink ")]'
+              ' | //*[contains(concat(" ", normalize-space(@class), " "), " visually-hidden ")]')
+
+# Page chrome removed when no main content element is found
+CHROME_XPATH = '//nav | //header | //footer | //aside | //form'
+
+# Inline elements whose text continues the current line
+INLINE_TAGS = {'a', 'abbr', 'b', 'cite', 'code', 'em', 'i', 'img', 'kbd', 'mark', 'q', 's', 'samp',
+               'small', 'span', 'strong', 'sub', 'sup', 'tt', 'u', 'var'}
+
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+
+
+def extract_text_bs4(html):
+    """Extract the visible text of an HTML page, one text node per line."""
+    soup = BeautifulSoup(html, 'html.parser')
+    return soup.get_text(separator="\n", strip=True)
+
+
+class _LineWriter:
+    """Collects inline text into lines, starting a new line at every block boundary."""
+
+    def __init__(self):
+        self.lines = []
+        self._parts = []
+
+    def write(self, text):
+        if text:
+            self._parts.append(text)
+
+    def flush(self):
+        line = ' '.join(''.join(self._parts).split())
+        if line:
+            self.lines.append(line)
+        self._parts = []
+
+    def line(self, text):
+        self.flush()
+        if text:
+            self.lines.append(text)
+
+
+def _walk(element, out):
+    tag = element.tag if isinstance(element.tag, str) else None
+    if tag is None:
+        pass  # Comments and processing instructions
+    elif tag in HEADING_TAGS:
+        out.line('#' * HEADING_TAGS[tag] + ' ' + ' '.join(element.text_content().split()))
+    elif tag == 'pre':
+        out.flush()
+        for line in element.text_content().splitlines():
+            out.line(line.rstrip())
+    elif tag == 'br':
+        out.flush()
+    else:
+        inline = tag in INLINE_TAGS
+        if not inline:
+            out.flush()
+        out.write(element.text)
+        for child in element:
+            _walk(child, out)
+        if not inline:
+            out.flush()
+    out.write(element.tail)
+
+
+def extract_text_lxml(html):
+    """
+    Extract the main article of an HTML page with lxml.
+
+    Headings are written as "#" lines (one "#" per level), paragraphs, list items and table
+    cells as one line each, and preformatted blocks line by line.
+
+    Args:
+        html (bytes or str): The page body.
+
+    Returns:
+        str: The extracted text.
+    """
+    if not html or not html.strip():
+        return ""
+    try:
+        root = lxml.html.fromstring(html)
+    except lxml.etree.ParserError:
+        return ""  # Not parseable as HTML (e.g. a binary download)
+    for element in root.xpath(DROP_XPATH):
+        element.drop_tree()
+
+    main = None
+    for xpath in MAIN_CONTENT_XPATHS:
+        found = root.xpath(xpath)
+        if found:
+            main = found[0]
+            break
+    if main is None:
+        for element in root.xpath(CHROME_XPATH):
+            element.drop_tree()
+        main = root.find('body')
+        if main is None:
+            main = root
+
+    out = _LineWriter()
+    _walk(main, out)
+    out.flush()
+    return "\n".join(out.lines)
+
+
+EXTRACTORS = {
+    "bs4": extract_text_bs4,
+    "lxml": extract_text_lxml,
+}
+
+DEFAULT_EXTRACTOR = "lxml" if lxml is not None else "bs4"
+
+
+def get_extractor(name=DEFAULT_EXTRACTOR):
+    """
+    Return the extraction function registered under a name.
+
+    Args:
+        name (str): Name of the extractor ("bs4" or "lxml").
+
+    Returns:
+        callable: A function taking an HTML body and returning its text.
+
+    Raises:
+        ValueError: If the extractor is unknown or its dependency is not installed.
+    """
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown extractor {name!r}, expected one of {sorted(EXTRACTORS)}")
+    if name == "lxml" and lxml is None:
+        raise ValueError("The lxml extractor requires the lxml package")
+    return EXTRACTORS[name]
+
+
+def extract_text(html, extractor=DEFAULT_EXTRACTOR):
+    """Extract the text of an HTML page with the named extractor."""
+    return get_extractor(extractor)(html)
@@ -2,12 +2,25 @@
 get_all_url.py
 
 This module handles fetching all links from the URLs of the sections provided.
-It recursively visits links on each page, up to a specified depth, to gather all relevant URLs.
+By default the sections are crawled breadth-first by the asynchronous crawler in `crawler.py`;
+the original recursive, one-page-at-a-time crawl is kept for comparison. In manifest discovery
+mode the pages of each section are read from the site's Sphinx inventory and sitemap, and
+sections without manifests fall back to crawling.
 """
 
+import time
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
+from .crawler import crawl_sections, prefetch_pages, DEFAULT_WORKERS
+from .discovery import discover_section_pages
+from .politeness import REQUEST_TIMEOUT
+
+# URL discovery modes supported by `fetch_and_print_links`
+DISCOVERY_MODES = ("crawl", "manifest")
+
+# Number of pages requested by `get_all_links`, used to report its throughput
+pages_fetched = 0
 
 def get_all_links(url, visited=None, depth=0, max_depth=10):
     """
@@ -22,6 +35,7 @@ def get_all_links(url, visited=None, depth=0, max_depth=10):
     Returns:
         set: A set of URLs found on the page and its sub-pages up to the specified depth.
     """
+    global pages_fetched
     print("running get_all_links") 
     if visited is None:
         visited = set()
@@ -30,7 +44,8 @@ def get_all_links(url, visited=None, depth=0, max_depth=10):
         return set()  # Stop recursion if max depth is reached
 
     try:
-        response = requests.get(url)  # Fetch the content of the URL
+        response = requests.get(url, timeout=REQUEST_TIMEOUT)  # Fetch the content of the URL
+        pages_fetched += 1
         soup = BeautifulSoup(response.content, "html.parser")
         
         links = set()
@@ -51,7 +66,8 @@ def get_all_links(url, visited=None, depth=0, max_depth=10):
         print(f"Error fetching {url}: {e}")
         return set()
 
-def fetch_and_print_links(section_urls):
+def fetch_and_print_links(section_urls, concurrent=True, workers=DEFAULT_WORKERS, page_store=None,
+                          discovery="crawl", checkpoint=None):
     """
     Fetch and print links for each section.
 
@@ -60,18 +76,50 @@ def fetch_and_print_links(section_urls):
 
     Args:
         section_urls (dict): A dictionary containing section names and their URLs.
+        concurrent (bool): Crawl with the asynchronous crawler. If False, use the
+            recursive `get_all_links` crawl.
+        workers (int): Number of concurrent fetch workers for the asynchronous crawler.
+        page_store (PageStore): Shared per-run page store. When given, the asynchronous crawler
+            also downloads every fetched link into it for the extraction stage.
+        discovery (str): "crawl" to follow links page by page, or "manifest" to build the page
+            set from the site's `objects.inv`/`sitemap.xml` and crawl only sections without them.
+        checkpoint (CrawlCheckpoint): Records the crawl so an interrupted run can resume from it.
 
     Returns:
         dict: A dictionary of sections and their corresponding fetched links.
     """
-    fetched_links = {}
-
-    for section, urls in section_urls.items():
-        fetched_links[section] = []
-        for url in urls:
-            # Fetch all links for the section
-            all_links = get_all_links(url)
-            fetched_links[section].extend(all_links)
+    if discovery not in DISCOVERY_MODES:
+        raise ValueError(f"Unknown discovery mode {discovery!r}, expected one of {DISCOVERY_MODES}")
+
+    if discovery == "manifest":
+        discovered, missing = discover_section_pages(section_urls)
+        if page_store is not None:
+            prefetch_pages([url for links in discovered.values() for url in links], page_store, workers,
+                           checkpoint=checkpoint)
+        if missing:
+            print(f"No manifest found for {sorted(missing)}, falling back to crawling")
+            crawled = fetch_and_print_links(missing, concurrent, workers, page_store, checkpoint=checkpoint)
+        else:
+            crawled = {}
+        fetched_links = {section: discovered.get(section, []) + crawled.get(section, [])
+                         for section in section_urls}
+    elif concurrent:
+        fetched_links = crawl_sections(section_urls, workers=workers, page_store=page_store,
+                                       checkpoint=checkpoint)
+    else:
+        fetched_links = {}
+        start_pages, start = pages_fetched, time.perf_counter()
+
+        for section, urls in section_urls.items():
+            fetched_links[section] = []
+            for url in urls:
+                # Fetch all links for the section
+                all_links = get_all_links(url)
+                fetched_links[section].extend(all_links)
+
+        elapsed = time.perf_counter() - start
+        pages = pages_fetched - start_pages
+        print(f"Crawled {pages} pages in {elapsed:.2f}s ({pages / elapsed if elapsed else 0.0:.2f} pages/sec)")
 
     # Print the number of links found for each section
     for section, links in fetched_links.items():
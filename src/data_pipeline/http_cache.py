@@ -0,0 +1,111 @@
+"""
+http_cache.py
+
+This module implements a persistent on-disk HTTP cache for the scraper.
+For every URL it keeps the last response body together with its validators (ETag and
+Last-Modified), so later runs can send conditional requests and reuse the stored body
+when the server answers 304 Not Modified.
+"""
+
+import hashlib
+import json
+import os
+
+# Define the directory where cached responses are stored between runs
+cache_dir = '/opt/airflow/data/cache/http'
+
+
+class CacheEntry:
+    """A cached response body and the validators it was served with."""
+
+    def __init__(self, url, body, content_type="text/html", etag=None, last_modified=None):
+        self.url = url
+        self.body = body
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class HttpCache:
+    """
+    On-disk HTTP cache keyed by URL.
+
+    Each entry is stored as two files named after the SHA-1 of its URL: the raw body and a
+    small JSON document with the content type and validators.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or cache_dir
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _paths(self, url):
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, name)
+        return base + ".body", base + ".json"
+
+    def lookup(self, url):
+        """
+        Return the cached entry for a URL.
+
+        Args:
+            url (str): The URL to look up.
+
+        Returns:
+            CacheEntry or None: The cached entry, or None if the URL is not cached.
+        """
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+            with open(body_path, 'rb') as file:
+                body = file.read()
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(url, body, meta.get("content_type", "text/html"),
+                          meta.get("etag"), meta.get("last_modified"))
+
+    def conditional_headers(self, url):
+        """
+        Build the conditional request headers for a URL.
+
+        Args:
+            url (str): The URL about to be requested.
+
+        Returns:
+            dict: `If-None-Match` and/or `If-Modified-Since` headers, empty if nothing is cached.
+        """
+        entry = self.lookup(url)
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, url, body, headers):
+        """
+        Store a response body and its validators.
+
+        Args:
+            url (str): The requested URL.
+            body (bytes): The response body.
+            headers (Mapping): The response headers.
+
+        Returns:
+            bool: True if the body differs from the previously cached one (or nothing was cached).
+        """
+        previous = self.lookup(url)
+        body_path, meta_path = self._paths(url)
+        meta = {
+            "url": url,
+            "content_type": headers.get("Content-Type", "text/html"),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+        }
+        # Write to temporary files first so an interrupted run never leaves a torn entry
+        for path, data, mode in ((body_path, body, 'wb'), (meta_path, json.dumps(meta), 'w')):
+            with open(path + ".tmp", mode) as file:
+                file.write(data)
+            os.replace(path + ".tmp", path)
+        return previous is None or previous.body != body
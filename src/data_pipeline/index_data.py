@@ -1,99 +1,386 @@
+import io
 import os
 import json
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from azure.storage.blob import BlobServiceClient
 from azure.search.documents import SearchClient
 from azure.core.credentials import AzureKeyCredential
+from .manifest import ProcessedManifest, iter_documents
+from .politeness import retry_delay
+from .shards import INDEX_SUFFIX, iter_shard, shard_format
 
-# Azure configuration
-AZURE_BLOB_URL = os.getenv("AZURE_BLOB_STORAGE_URL")
-AZURE_BLOB_KEY = os.getenv("AZURE_BLOB_KEY")
-AZURE_SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT")
-AZURE_SEARCH_KEY = os.getenv("AZURE_SEARCH_KEY")
+# Azure configuration; the endpoints and keys are read from the environment when indexing starts
 AZURE_CONTAINER_NAME = "preprocessed-data"
 AZURE_INDEX_NAME = "askrcindex"
+# Document fields uploaded to the index; chunk metadata such as "source_url", "section" and
+# "heading" is only sent when the index schema has those fields
+AZURE_INDEX_FIELDS = [field.strip() for field in os.getenv("AZURE_INDEX_FIELDS", "id,content").split(",")
+                      if field.strip()]
+MAX_TERM_SIZE = 32766  # Azure Search term size limit
 
-def index_data_in_search(container_name=AZURE_CONTAINER_NAME, index_name=AZURE_INDEX_NAME):
+# Batches sent to the index: Azure Search accepts up to 1000 documents and 16 MB per request
+MAX_BATCH_DOCUMENTS = 1000
+MAX_BATCH_BYTES = 12 * 1024 * 1024
+
+# Keys listed per search request; Azure Search returns at most 1000 results per page
+KEYS_PAGE_SIZE = 1000
+
+# Blobs downloaded concurrently
+DOWNLOAD_WORKERS = int(os.getenv("INDEX_DOWNLOAD_WORKERS", "8"))
+
+# Per-document statuses worth retrying (conflict, transient failure, throttling, unavailable),
+# and the number of retries of the failed keys of a batch
+RETRY_STATUSES = {409, 422, 429, 503}
+MAX_RETRIES = 3
+
+def project_document(document, fields=None):
+    """Keep only the fields of a document that exist in the index."""
+    fields = fields or AZURE_INDEX_FIELDS
+    return {field: document[field] for field in fields if field in document}
+
+class BatchIndexer:
+    """
+    Packs documents into batches bounded by count and size, and uploads them to the index.
+
+    Only the documents whose `IndexingResult` failed with a retryable status are sent again,
+    with exponential backoff; a batch whose request fails as a whole is retried the same way.
+
+    Args:
+        search_client: The Azure Search client.
+        max_documents (int): Maximum number of documents per batch.
+        max_bytes (int): Maximum JSON size of a batch, in bytes.
+        max_retries (int): Retries of the failed documents of a batch.
+        sleep: Function used to wait between retries.
+        action (str): Index action of the batches: "upload", "merge_or_upload" or "delete".
+    """
+
+    def __init__(self, search_client, max_documents=MAX_BATCH_DOCUMENTS, max_bytes=MAX_BATCH_BYTES,
+                 max_retries=MAX_RETRIES, sleep=time.sleep, action="upload"):
+        self.search_client = search_client
+        self._send = getattr(search_client, f"{action}_documents")
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        self.sleep = sleep
+        self._batch = []
+        self._batch_bytes = 0
+        self.failed_keys = []
+        self.stats = {"indexed": 0, "failed": 0, "retried": 0, "batches": 0}
+
+    def add(self, document):
+        """Queue a (projected) document, uploading the current batch first if it is full."""
+        size = len(json.dumps(document, ensure_ascii=False).encode('utf-8'))
+        if self._batch and (len(self._batch) >= self.max_documents or self._batch_bytes + size > self.max_bytes):
+            self.flush()
+        self._batch.append(document)
+        self._batch_bytes += size
+
+    def flush(self):
+        """Upload the queued documents, retrying the failed keys."""
+        documents, self._batch, self._batch_bytes = self._batch, [], 0
+        for attempt in range(self.max_retries + 1):
+            if not documents:
+                return
+            last_attempt = attempt == self.max_retries
+            self.stats["batches"] += 1
+            try:
+                response = self._send(documents=documents)
+            except Exception as e:
+                if last_attempt:
+                    print(f"Failed to index a batch of {len(documents)} documents: {str(e)}")
+                    self._fail([document["id"] for document in documents])
+                    return
+                print(f"Indexing request failed ({str(e)}), retrying {len(documents)} documents")
+                self.stats["retried"] += len(documents)
+                self.sleep(retry_delay(attempt))
+                continue
+
+            by_key = {document["id"]: document for document in documents}
+            retry = []
+            for result in response:
+                if result.succeeded:
+                    self.stats["indexed"] += 1
+                elif result.status_code in RETRY_STATUSES and not last_attempt:
+                    retry.append(by_key[result.key])
+                else:
+                    print(f"Failed to index document ID {result.key}: {result.error_message}")
+                    self._fail([result.key])
+            if retry:
+                self.stats["retried"] += len(retry)
+                self.sleep(retry_delay(attempt))
+            documents = retry
+
+    def _fail(self, keys):
+        self.stats["failed"] += len(keys)
+        self.failed_keys.extend(keys)
+
+    def close(self):
+        """Upload the last batch and return the indexing statistics."""
+        if self._batch:
+            self.flush()
+        return self.stats
+
+def add_documents(indexer, documents, skip_ids=()):
+    """
+    Queue documents on an indexer, skipping duplicates and documents too large for the index.
+
+    Returns:
+        int: The number of documents queued.
+    """
+    queued = 0
+    for document in documents:
+        if document["id"] in skip_ids:
+            continue  # Near-duplicate of an indexed document
+        content_size = len(document.get("content", "").encode('utf-8'))
+        if content_size > MAX_TERM_SIZE:
+            print(f"Warning: Document ID {document['id']} has a content field exceeding "
+                  f"the max term size ({content_size} bytes). Consider splitting it.")
+            continue  # Skip this document if it's too large
+        indexer.add(project_document(document))
+        queued += 1
+    return queued
+
+def blob_documents(name, blob_content):
+    """
+    Parse the documents of a downloaded blob: a JSON document or a JSONL shard.
+
+    Returns:
+        list: The documents; empty (with a warning) for empty or invalid blobs.
+    """
+    output_format = shard_format(name)
+    if output_format is not None:
+        return list(iter_shard(io.BytesIO(blob_content), output_format))
+
+    json_data = blob_content.decode("utf-8").strip()
+    if not json_data:
+        print(f"Warning: Blob {name} is empty and will be skipped.")
+        return []
+
+    # Load JSON document from blob content
+    document = json.loads(json_data)
+
+    # Validate document structure
+    if not isinstance(document, dict) or 'id' not in document:
+        print(f"Warning: Blob {name} has invalid document structure. Skipping.")
+        return []
+    return [document]
+
+def _download(container_client, blob):
+    # Returns (name, documents, error) so one bad blob does not stop the others
+    name = str(blob.name)
+    try:
+        blob_content = container_client.get_blob_client(blob).download_blob().readall()
+        return name, blob_documents(name, blob_content), None
+    except json.JSONDecodeError as e:
+        return name, [], f"JSONDecodeError for blob {name}: {str(e)}"
+    except Exception as e:
+        return name, [], f"Error processing blob {name}: {str(e)}"
+
+def iter_blob_documents(container_client, workers=DOWNLOAD_WORKERS):
+    """
+    Download and parse the blobs of a container concurrently.
+
+    At most `2 * workers` blobs are held in memory at a time. Shard offset indexes are skipped.
+
+    Yields:
+        list: The documents of each blob, in listing order.
+    """
+    blobs = [blob for blob in container_client.list_blobs() if not str(blob.name).endswith(INDEX_SUFFIX)]
+    window = max(1, 2 * workers)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for i in range(0, len(blobs), window):
+            for name, documents, error in pool.map(lambda blob: _download(container_client, blob),
+                                                   blobs[i:i + window]):
+                if error:
+                    print(error)
+                    continue
+                yield documents
+
+def index_data_in_search(container_name=AZURE_CONTAINER_NAME, index_name=AZURE_INDEX_NAME, skip_ids=(),
+                         local_folder=None, workers=DOWNLOAD_WORKERS):
     """
     Index data from Azure Blob Storage into Azure Cognitive Search.
-    
+
+    Blobs are downloaded concurrently and their documents uploaded in batches of up to
+    MAX_BATCH_DOCUMENTS documents and MAX_BATCH_BYTES bytes.
+
     Args:
         container_name (str): Name of the Azure Blob container
         index_name (str): Name of the Azure Search index
-        
+        skip_ids (collection): IDs of documents not to index, e.g. the near-duplicates
+            found by `dedup.dedup_data`
+        local_folder (str): Index the documents of this processed data folder directly
+            instead of downloading the blobs
+        workers (int): Number of concurrent blob downloads
+
+    Returns:
+        dict: Indexing statistics: documents indexed, failed and retried, and batches sent
+
     Raises:
         ValueError: If required environment variables are not set
         Exception: For various Azure operations failures
     """
-    # Validate environment variables
-    if not all([AZURE_BLOB_URL, AZURE_BLOB_KEY, AZURE_SEARCH_ENDPOINT, AZURE_SEARCH_KEY]):
+    blob_url = os.getenv("AZURE_BLOB_STORAGE_URL")
+    blob_key = os.getenv("AZURE_BLOB_KEY")
+    search_endpoint = os.getenv("AZURE_SEARCH_ENDPOINT")
+    search_key = os.getenv("AZURE_SEARCH_KEY")
+
+    # Validate environment variables; the blob settings are not needed to index a local folder
+    required = [search_endpoint, search_key] + ([] if local_folder else [blob_url, blob_key])
+    if not all(required):
         raise ValueError("Required Azure environment variables are not set")
 
     try:
-        # Initialize Blob and Search Clients
-        blob_service_client = BlobServiceClient(
-            account_url=AZURE_BLOB_URL,
-            credential=AZURE_BLOB_KEY
-        )
-        container_client = blob_service_client.get_container_client(container_name)
-        
         search_client = SearchClient(
-            endpoint=AZURE_SEARCH_ENDPOINT,
+            endpoint=search_endpoint,
             index_name=index_name,
-            credential=AzureKeyCredential(AZURE_SEARCH_KEY),
+            credential=AzureKeyCredential(search_key),
             api_version="2021-04-30-Preview"
         )
+        indexer = BatchIndexer(search_client)
+        start = time.perf_counter()
 
-        # Loop through blobs in the specified container
-        for blob in container_client.list_blobs():
-            try:
-                blob_client = container_client.get_blob_client(blob)
-
-                # Download blob content and check if it's empty
-                blob_content = blob_client.download_blob().readall()
-                json_data = blob_content.decode("utf-8").strip()
-                
-                if not json_data:
-                    print(f"Warning: Blob {blob.name} is empty and will be skipped.")
-                    continue  # Skip this blob if it's empty
-
-                # Load JSON document from blob content
-                document = json.loads(json_data)
-                
-                # Validate document structure
-                if not isinstance(document, dict) or 'id' not in document:
-                    print(f"Warning: Blob {blob.name} has invalid document structure. Skipping.")
-                    continue
+        if local_folder:
+            add_documents(indexer, iter_documents(local_folder), skip_ids)
+        else:
+            blob_service_client = BlobServiceClient(
+                account_url=blob_url,
+                credential=blob_key
+            )
+            container_client = blob_service_client.get_container_client(container_name)
+            for documents in iter_blob_documents(container_client, workers):
+                add_documents(indexer, documents, skip_ids)
 
-                # Check for large content fields
-                content_size = len(document.get("content", "").encode('utf-8'))
-                if content_size > 32766:  # Azure Search term size limit
-                    print(f"Warning: Document ID {document['id']} has a content field exceeding "
-                          f"the max term size ({content_size} bytes). Consider splitting it.")
-                    continue  # Skip this document if it's too large
-                
-                # Index the document
-                response = search_client.upload_documents(documents=[document])
-
-                # Log indexing results
-                for result in response:
-                    if result.succeeded:
-                        print(f"Successfully indexed document ID {result.key}")
-                    else:
-                        print(f"Failed to index document ID {result.key}: {result.error_message}")
-
-            except json.JSONDecodeError as e:
-                print(f"JSONDecodeError for blob {blob.name}: {str(e)}")
-                continue
-            except Exception as e:
-                print(f"Error processing blob {blob.name}: {str(e)}")
-                continue
+        stats = indexer.close()
+        print(f"Indexed {stats['indexed']} documents in {stats['batches']} batches "
+              f"({stats['failed']} failed, {stats['retried']} retried) "
+              f"in {time.perf_counter() - start:.1f}s")
 
     except Exception as e:
         error_message = f"Fatal error in index_data_in_search: {str(e)}"
         print(error_message)
         raise Exception(error_message)
 
-    return True  # Return True if execution completes successfully
+    return stats
+
+def indexed_keys(search_client, page_size=KEYS_PAGE_SIZE):
+    """
+    Return the IDs of all documents in the index.
+
+    The keys are listed in key order, one range at a time (`id gt` the last key of the previous
+    page), rather than with `$skip`, which Azure Search caps at 100,000 documents.
+
+    Args:
+        search_client (SearchClient): The index client.
+        page_size (int): Keys requested per search.
+
+    Returns:
+        set: The document IDs.
+    """
+    keys = set()
+    last = None
+    while True:
+        query = {"search_text": "*", "select": ["id"], "order_by": ["id asc"], "top": page_size}
+        if last is not None:
+            query["filter"] = "id gt '{}'".format(last.replace("'", "''"))
+        page = [result["id"] for result in search_client.search(**query)]
+        keys.update(page)
+        if len(page) < page_size:
+            return keys
+        last = page[-1]
+
+def plan_delta(manifest, index_keys, fields=None):
+    """
+    Compare the documents of the processed manifest with the documents in the index.
+
+    Documents have content-addressed IDs, so a document already in the index under its ID is
+    up to date unless the index was last synchronized with other fields (`AZURE_INDEX_FIELDS`),
+    in which case it is updated in place.
+
+    Args:
+        manifest (ProcessedManifest): The processed manifest; near-duplicates are not indexed.
+        index_keys (set): IDs of the documents in the index.
+        fields (list): Fields sent to the index; defaults to AZURE_INDEX_FIELDS.
+
+    Returns:
+        dict: Sorted "adds", "updates" and "deletes" ID lists.
+    """
+    fields = list(fields or AZURE_INDEX_FIELDS)
+    wanted = manifest.indexed_documents()
+    present = wanted & index_keys
+    stale_fields = manifest.index.get("fields") != fields
+    return {
+        "adds": sorted(wanted - index_keys),
+        "updates": sorted(present) if stale_fields else [],
+        "deletes": sorted(index_keys - wanted),
+    }
+
+def _select_documents(documents, ids):
+    # Each wanted document once; the same chunk can be produced by several raw files
+    for document in documents:
+        if document["id"] in ids:
+            ids.discard(document["id"])
+            yield document
+
+def sync_index(local_folder, index_name=AZURE_INDEX_NAME, dry_run=False):
+    """
+    Bring the index in line with a processed data folder.
+
+    The adds, updates and deletes are computed and reported first. Unless this is a dry run,
+    added and updated documents are then sent with `merge_or_upload`, and documents that are no
+    longer produced (obsolete chunks, near-duplicates) are deleted from the index.
+
+    Args:
+        local_folder (str): The processed data folder and its manifest.
+        index_name (str): Name of the Azure Search index.
+        dry_run (bool): Only report the changes.
+
+    Returns:
+        dict: The plan, with the indexing statistics of the documents sent and deleted unless
+            this is a dry run.
+
+    Raises:
+        ValueError: If required environment variables are not set.
+    """
+    search_endpoint = os.getenv("AZURE_SEARCH_ENDPOINT")
+    search_key = os.getenv("AZURE_SEARCH_KEY")
+    if not all([search_endpoint, search_key]):
+        raise ValueError("Required Azure environment variables are not set")
+
+    search_client = SearchClient(
+        endpoint=search_endpoint,
+        index_name=index_name,
+        credential=AzureKeyCredential(search_key),
+        api_version="2021-04-30-Preview"
+    )
+    manifest = ProcessedManifest(local_folder)
+    plan = plan_delta(manifest, indexed_keys(search_client))
+    print(f"Index {index_name}: {len(plan['adds'])} to add, {len(plan['updates'])} to update, "
+          f"{len(plan['deletes'])} to delete")
+    if not manifest.files and plan["deletes"]:
+        # An empty or missing manifest would delete the whole index
+        print(f"Warning: no processed documents in {local_folder}; not deleting from the index.")
+        plan["deletes"] = []
+    if dry_run:
+        return plan
+
+    indexer = BatchIndexer(search_client, action="merge_or_upload")
+    add_documents(indexer, _select_documents(iter_documents(local_folder), set(plan["adds"]) | set(plan["updates"])))
+    plan["sent"] = indexer.close()
+
+    deleter = BatchIndexer(search_client, action="delete")
+    for doc_id in plan["deletes"]:
+        deleter.add({"id": doc_id})
+    plan["deleted"] = deleter.close()
+
+    if not plan["sent"]["failed"] and not plan["deleted"]["failed"]:
+        manifest.index = {"name": index_name, "fields": list(AZURE_INDEX_FIELDS),
+                          "time": datetime.now().isoformat(timespec='seconds')}
+        manifest.save()
+    print(f"Index {index_name}: sent {plan['sent']['indexed']} documents, deleted {plan['deleted']['indexed']}")
+    return plan
 
 if __name__ == "__main__":
-    index_data_in_search()
\ No newline at end of file
+    index_data_in_search()
@@ -1,20 +1,26 @@
 """
 main.py
 
-This script orchestrates the entire scraping process. It determines which sections to scrape 
-based on the current week and runs the scraping for all sections up to and including the current week.
+This script orchestrates the entire scraping process. It scrapes the sections that have pages
+due for a recrawl according to the change history of their pages.
+Pass `--resume` to continue a scrape that was interrupted earlier the same day.
 """
 
-from .scraper import scrape_sections_up_to_current_week
+import argparse
+from .scraper import scrape_due_sections
 
-def main():
+def main(argv=None):
     """
     Main function to initiate the scraping process.
 
-    This function triggers the scraping of sections up to the current week, calling the 
-    `scrape_sections_up_to_current_week()` function from the scraper module.
+    This function triggers the scraping of the sections due for a recrawl, calling the
+    `scrape_due_sections()` function from the scraper module.
     """
-    scraped_sections = scrape_sections_up_to_current_week()  # Scrape sections based on the current week
+    parser = argparse.ArgumentParser(description="Scrape the documentation sections.")
+    parser.add_argument('--resume', action='store_true',
+                        help="resume today's interrupted crawl from its checkpoint")
+    args = parser.parse_args(argv)
+    scraped_sections = scrape_due_sections(resume=args.resume)  # Scrape the sections due for a recrawl
     print(f"Scraped sections: {scraped_sections}")
 
 if __name__ == '__main__':
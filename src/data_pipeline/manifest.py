@@ -0,0 +1,194 @@
+"""
+manifest.py
+
+This module keeps the manifest of the preprocessing stage, `data/processed/manifest.json`,
+and lists the document files of a processed data folder.
+Documents get content-addressed IDs derived from their source URL and a hash of their
+content, so an unchanged chunk keeps the same ID (and file name) from one run to the next.
+The manifest records, for every raw input file, the hash of its content and the IDs of the
+documents produced from it. Preprocessing uses it to skip raw files that did not change, and
+it lists the documents added and removed by the last run for the upload and index stages.
+The deduplication stage (`dedup.py`) records there the near-duplicate documents not to index,
+and `index_data.sync_index` the fields the index was last synchronized with.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from .shards import INDEX_SUFFIX, read_shard, shard_format
+
+MANIFEST_NAME = "manifest.json"
+
+
+def document_id(source, content):
+    """
+    Return the stable ID of a document.
+
+    Args:
+        source (str): Where the document comes from (its source URL, or the raw file path).
+        content (str): The document content.
+
+    Returns:
+        str: "<source hash>_<content hash>", made of characters valid in Azure Search keys.
+    """
+    source_hash = hashlib.sha256(source.encode('utf-8')).hexdigest()[:12]
+    content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+    return f"{source_hash}_{content_hash}"
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Return the SHA-256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def document_path(output_folder, doc_id):
+    """Return the path of the JSON file holding a document."""
+    return os.path.join(output_folder, f"{doc_id}.json")
+
+
+def is_document_file(name):
+    """True for the files holding processed documents: JSON documents, shards and shard indexes."""
+    if name == MANIFEST_NAME or name.endswith(".tmp"):
+        return False
+    return name.endswith(".json") or shard_format(name) is not None
+
+
+def processed_files(output_folder):
+    """Return the paths of the document files of a processed data folder, in a stable order."""
+    paths = []
+    for root, _, files in os.walk(output_folder):
+        for file in files:
+            if is_document_file(file):
+                paths.append(os.path.join(root, file))
+    return sorted(paths)
+
+
+def iter_documents(output_folder):
+    """Read every document of a processed data folder, whatever its format."""
+    for path in processed_files(output_folder):
+        if shard_format(path) is not None:
+            yield from read_shard(path)
+        elif not path.endswith(INDEX_SUFFIX):
+            with open(path, 'r', encoding='utf-8') as file:
+                yield json.load(file)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ProcessedManifest:
+    """
+    The raw inputs and documents of a processed data folder.
+
+    Args:
+        output_folder (str): The processed data folder holding the documents and the manifest.
+    """
+
+    def __init__(self, output_folder):
+        self.output_folder = output_folder
+        self.path = os.path.join(output_folder, MANIFEST_NAME)
+        self.files = {}
+        self.last_run = {}
+        self.duplicates = {}
+        self.index = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            self.files = data.get("files", {})
+            self.last_run = data.get("last_run", {})
+            self.duplicates = data.get("duplicates", {})
+            self.index = data.get("index", {})
+        except (OSError, ValueError):
+            pass  # No manifest yet: every raw file is processed
+
+    def is_current(self, source, sha256, mode, output_format="json"):
+        """True if a raw file was already processed in this mode and format and its output exists."""
+        entry = self.files.get(source)
+        if (entry is None or entry["sha256"] != sha256 or entry["mode"] != mode
+                or entry.get("format", "json") != output_format):
+            return False
+        if entry.get("shard"):
+            return os.path.exists(os.path.join(self.output_folder, entry["shard"]))
+        return all(os.path.exists(document_path(self.output_folder, doc_id)) for doc_id in entry["documents"])
+
+    def _outputs(self):
+        # JSON document IDs and shard names referenced by the manifest
+        json_ids, shards = set(), set()
+        for entry in self.files.values():
+            if entry.get("shard"):
+                shards.add(entry["shard"])
+            else:
+                json_ids.update(entry["documents"])
+        return json_ids, shards
+
+    def documents(self):
+        """Return the IDs of all documents in the manifest."""
+        return {doc_id for entry in self.files.values() for doc_id in entry["documents"]}
+
+    def indexed_documents(self):
+        """Return the IDs of the documents to index: all documents but the near-duplicates."""
+        return self.documents() - set(self.duplicates)
+
+    def update(self, sources, results, mode, output_format="json"):
+        """
+        Record the result of a preprocessing run and delete the documents no longer produced.
+
+        Args:
+            sources (iterable): All raw files present in this run (relative paths).
+            results (dict): Relative path -> (sha256, document IDs, shard name or None) of the
+                files processed in this run.
+            mode (str): The preprocessing mode.
+            output_format (str): The processed-data format (see `shards.OUTPUT_FORMATS`).
+
+        Returns:
+            dict: The run summary: changed and unchanged files, added and removed document IDs.
+        """
+        sources = set(sources)
+        before = self.documents()
+        json_before, shards_before = self._outputs()
+        removed_files = sorted(source for source in self.files if source not in sources)
+        for source in removed_files:
+            del self.files[source]
+        for source, (sha256, doc_ids, shard) in results.items():
+            self.files[source] = {"sha256": sha256, "mode": mode, "format": output_format, "shard": shard,
+                                  "documents": list(dict.fromkeys(doc_ids))}
+        after = self.documents()
+
+        # Delete the document files and shards that no raw file produces any more
+        json_after, shards_after = self._outputs()
+        for doc_id in json_before - json_after:
+            _remove(document_path(self.output_folder, doc_id))
+        for shard in shards_before - shards_after:
+            _remove(os.path.join(self.output_folder, shard))
+            _remove(os.path.join(self.output_folder, shard + INDEX_SUFFIX))
+        removed = sorted(before - after)
+        # Forget the duplicates of documents that are gone; the next dedup run rebuilds the rest
+        self.duplicates = {doc_id: kept for doc_id, kept in self.duplicates.items()
+                           if doc_id in after and kept in after}
+        self.last_run = {
+            "time": datetime.now().isoformat(timespec='seconds'),
+            "changed_files": sorted(results),
+            "unchanged_files": sorted(sources - set(results)),
+            "removed_files": removed_files,
+            "added": sorted(after - before),
+            "removed": removed,
+        }
+        return self.last_run
+
+    def save(self):
+        """Write the manifest atomically."""
+        os.makedirs(self.output_folder, exist_ok=True)
+        with open(self.path + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump({"files": self.files, "last_run": self.last_run, "duplicates": self.duplicates,
+                       "index": self.index}, file, indent=4)
+        os.replace(self.path + ".tmp", self.path)
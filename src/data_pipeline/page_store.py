@@ -0,0 +1,114 @@
+"""
+page_store.py
+
+This module provides the per-run page store shared by the crawl and extraction stages.
+Every page body fetched during a run is kept here once, keyed by its URL without the
+fragment, so link discovery, text extraction and arrangement never download a page twice.
+
+A store can be backed by a persistent `HttpCache`. Requests are then made conditional, a
+304 Not Modified response is served from the cache, and every page records whether its
+content changed since the previous run.
+"""
+
+from urllib.parse import urldefrag
+
+
+def page_key(url):
+    """Return the store key for a URL (the URL without its fragment)."""
+    return urldefrag(url)[0]
+
+
+class Page:
+    """A fetched page: its body and content type, or the error that prevented fetching it."""
+
+    def __init__(self, url, body=None, content_type="text/html", error=None, changed=True):
+        self.url = url
+        self.body = body
+        self.content_type = content_type
+        self.error = error
+        self.changed = changed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def is_html(self):
+        return "html" in (self.content_type or "")
+
+
+class PageStore:
+    """In-memory store of the pages fetched during one pipeline run."""
+
+    def __init__(self, http_cache=None):
+        self.http_cache = http_cache
+        self._pages = {}
+
+    def __contains__(self, url):
+        return page_key(url) in self._pages
+
+    def __len__(self):
+        return len(self._pages)
+
+    def get(self, url):
+        """Return the stored `Page` for a URL, or None if it has not been fetched."""
+        return self._pages.get(page_key(url))
+
+    def put(self, url, body, content_type="text/html", changed=True):
+        """Store the body of a successfully fetched page."""
+        page = Page(page_key(url), body=body, content_type=content_type, changed=changed)
+        self._pages[page.url] = page
+        return page
+
+    def put_error(self, url, error):
+        """
+        Record that a page could not be fetched, so it is not requested again.
+
+        If the page is in the HTTP cache, the cached copy is served instead and the page
+        is treated as unchanged.
+        """
+        entry = self.http_cache.lookup(page_key(url)) if self.http_cache else None
+        if entry is not None:
+            print(f"Using cached copy of {url} after error: {error}")
+            return self.put(url, entry.body, entry.content_type, changed=False)
+        page = Page(page_key(url), error=str(error))
+        self._pages[page.url] = page
+        return page
+
+    def conditional_headers(self, url):
+        """Return the conditional request headers to send for a URL."""
+        return self.http_cache.conditional_headers(page_key(url)) if self.http_cache else {}
+
+    def put_response(self, url, status, body, headers):
+        """
+        Store a successful (2xx) or Not Modified (304) response.
+
+        Args:
+            url (str): The requested URL.
+            status (int): The HTTP status code.
+            body (bytes): The response body (empty for 304 responses).
+            headers (Mapping): The response headers.
+
+        Returns:
+            Page: The stored page.
+        """
+        key = page_key(url)
+        if status == 304 and self.http_cache:
+            entry = self.http_cache.lookup(key)
+            if entry is not None:
+                return self.put(key, entry.body, entry.content_type, changed=False)
+        changed = self.http_cache.store(key, body, headers) if self.http_cache else True
+        return self.put(key, body, headers.get("Content-Type", "text/html"), changed=changed)
+
+    def is_changed(self, url):
+        """True unless the page was fetched this run and found unchanged since the last run."""
+        page = self.get(url)
+        return page is None or page.changed
+
+    def changed_urls(self):
+        """Return the URLs of the pages whose content changed since the last run."""
+        return sorted(url for url, page in self._pages.items() if page.ok and page.changed)
+
+    @property
+    def total_bytes(self):
+        return sum(len(page.body) for page in self._pages.values() if page.body)
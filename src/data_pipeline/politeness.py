@@ -0,0 +1,241 @@
+"""
+politeness.py
+
+This module keeps the crawler polite towards the documentation host. Every host gets:
+
+- a token bucket that caps the request rate,
+- an adaptive concurrency limit that halves when the host answers 429/5xx or its latency
+  rises well above its usual level, and grows back by one request at a time while it is healthy,
+- counters for fetch latency and throttle events, reported at the end of a crawl.
+
+Throttled requests are retried after a backoff that honours the host's Retry-After header.
+The synchronous `requests` calls of the pipeline use `REQUEST_TIMEOUT` so a hung socket
+cannot stall the scrape task.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+# Default request rate (requests/second) and burst size per host
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 20
+
+# Responses that mean the host wants us to slow down
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Number of retries of a throttled request, and the base of the exponential backoff (seconds)
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0
+MAX_BACKOFF = 60.0
+
+# (connect, read) timeouts in seconds for the synchronous `requests` calls
+REQUEST_TIMEOUT = (10, 30)
+
+# Latency above this multiple of the host's typical latency counts as a slowdown
+LATENCY_FACTOR = 3.0
+# Weight of the newest sample in the moving average of the latency
+LATENCY_SMOOTHING = 0.2
+
+
+def retry_delay(attempt, retry_after=None):
+    """
+    Return how long to wait before retrying a throttled request.
+
+    Args:
+        attempt (int): Number of attempts already made, starting at 0.
+        retry_after (str): Value of the Retry-After header, if the host sent one.
+
+    Returns:
+        float: Delay in seconds.
+    """
+    if retry_after:
+        try:
+            return min(MAX_BACKOFF, max(0.0, float(retry_after)))
+        except ValueError:
+            pass  # An HTTP date; use the exponential backoff instead
+    return min(MAX_BACKOFF, BACKOFF_BASE * 2 ** attempt)
+
+
+class TokenBucket:
+    """Token bucket rate limiter: `rate` tokens per second, at most `burst` saved up."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.clock = clock
+        self.updated = clock()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        async with self.lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class AdaptiveConcurrency:
+    """
+    Concurrency limit adjusted with additive increase / multiplicative decrease.
+
+    The limit is halved on every throttle signal and raised by one after `limit` consecutive
+    healthy responses, staying between `minimum` and `maximum`.
+    """
+
+    def __init__(self, initial, minimum=1, maximum=None):
+        self.minimum = minimum
+        self.maximum = maximum or initial
+        self.limit = max(minimum, min(initial, self.maximum))
+        self.active = 0
+        self._healthy = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def release(self):
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    def decrease(self):
+        self.limit = max(self.minimum, self.limit // 2)
+        self._healthy = 0
+
+    def increase(self):
+        self._healthy += 1
+        if self._healthy >= self.limit and self.limit < self.maximum:
+            self.limit += 1
+            self._healthy = 0
+
+
+class FetchStats:
+    """Counters for the requests made to one host."""
+
+    def __init__(self):
+        self.requests = 0
+        self.throttle_events = 0
+        self.timeouts = 0
+        self.slow_responses = 0
+        self.latencies = []
+
+    def percentile(self, fraction):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self):
+        return {
+            "requests": self.requests,
+            "throttle_events": self.throttle_events,
+            "timeouts": self.timeouts,
+            "slow_responses": self.slow_responses,
+            "latency_p50": self.percentile(0.5),
+            "latency_p95": self.percentile(0.95),
+        }
+
+
+class HostLimiter:
+    """Rate limit, adaptive concurrency and statistics for a single host."""
+
+    def __init__(self, concurrency, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrency(concurrency)
+        self.stats = FetchStats()
+        self.typical_latency = None
+
+    def record(self, status, latency):
+        """Record a response and adapt the concurrency limit to it."""
+        self.stats.requests += 1
+        self.stats.latencies.append(latency)
+        if status in THROTTLE_STATUSES:
+            self.stats.throttle_events += 1
+            self.concurrency.decrease()
+            return
+        if self.typical_latency is not None and latency > LATENCY_FACTOR * self.typical_latency:
+            self.stats.slow_responses += 1
+            self.concurrency.decrease()
+        else:
+            self.concurrency.increase()
+        if self.typical_latency is None:
+            self.typical_latency = latency
+        else:
+            self.typical_latency += LATENCY_SMOOTHING * (latency - self.typical_latency)
+
+    def record_timeout(self):
+        """Record a request that timed out; a hung host is treated like a throttling one."""
+        self.stats.timeouts += 1
+        self.concurrency.decrease()
+
+
+class PolitenessLimiter:
+    """
+    Per-host politeness for the crawler.
+
+    Usage:
+        async with limiter.slot(url) as slot:
+            response = await session.get(url)
+            slot.status = response.status
+    """
+
+    def __init__(self, concurrency, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.hosts = {}
+
+    def host(self, url):
+        """Return the limiter of the host serving a URL."""
+        name = urlparse(url).netloc
+        if name not in self.hosts:
+            self.hosts[name] = HostLimiter(self.concurrency, self.rate, self.burst)
+        return self.hosts[name]
+
+    @asynccontextmanager
+    async def slot(self, url):
+        """Wait for permission to send a request to the URL's host, then time the request."""
+        host = self.host(url)
+        await host.concurrency.acquire()
+        try:
+            await host.bucket.acquire()
+            slot = _Slot()
+            start = time.monotonic()
+            try:
+                yield slot
+            except asyncio.TimeoutError:
+                host.record_timeout()
+                raise
+            finally:
+                if slot.status is not None:
+                    host.record(slot.status, time.monotonic() - start)
+        finally:
+            await host.concurrency.release()
+
+    def summary(self):
+        """Return the fetch statistics of every host."""
+        return {name: host.stats.summary() for name, host in self.hosts.items()}
+
+    def report(self):
+        """Print the fetch statistics of every host."""
+        for name, stats in self.summary().items():
+            print(f"{name}: {stats['requests']} requests, latency p50 {stats['latency_p50']:.3f}s "
+                  f"p95 {stats['latency_p95']:.3f}s, {stats['throttle_events']} throttled, "
+                  f"{stats['timeouts']} timed out, {stats['slow_responses']} slow, "
+                  f"concurrency limit {self.hosts[name].concurrency.limit}")
+
+
+class _Slot:
+    status = None
@@ -1,10 +1,14 @@
 import os
 import re
-import json
-import uuid
+import tempfile
+import time
 import nltk
+from concurrent.futures import ProcessPoolExecutor
 from nltk.corpus import stopwords
 from datetime import datetime
+from .chunker import chunk_file, DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP
+from .manifest import ProcessedManifest, document_id, file_sha256
+from .shards import JsonFileWriter, ShardWriter, OUTPUT_FORMATS, open_writer
 
 try:
     from .azure_uploader import upload_to_blob
@@ -29,6 +33,30 @@ except LookupError:
 # Define maximum term size (in bytes)
 MAX_TERM_SIZE = 20000
 
+# Preprocessing modes: "clean" writes the lowercased, stopword-free text split at MAX_TERM_SIZE;
+# "chunks" writes heading-aware retrieval chunks with their source URL, section and heading
+PREPROCESS_MODES = ("clean", "chunks")
+
+# Size (in characters) of the blocks read from a raw file by the streaming preprocessor
+READ_BLOCK_SIZE = 1 << 16
+# Text held back while looking for the end of a possible HTML tag is moved to a temporary
+# file beyond this many characters
+MAX_PENDING_TAG = 1 << 20
+
+# Regular expressions used by `clean_text`, compiled once per process
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+NON_ALPHA_RE = re.compile(r'[^a-zA-Z\s]')
+
+# English stopwords, loaded on first use and then kept for the lifetime of the process
+_stop_words = None
+
+def get_stop_words():
+    """Return the set of English stopwords, loading it once per process."""
+    global _stop_words
+    if _stop_words is None:
+        _stop_words = frozenset(stopwords.words('english'))
+    return _stop_words
+
 def clean_text(text):
     """
     Clean and preprocess the text. Includes:
@@ -44,48 +72,68 @@ def clean_text(text):
     text = str(text).lower()
     
     # Remove HTML tags
-    text = re.sub(r'<[^>]+>', '', text)
+    text = HTML_TAG_RE.sub('', text)
     
     # Remove special characters and numbers
-    text = re.sub(r'[^a-zA-Z\s]', '', text)
+    text = NON_ALPHA_RE.sub('', text)
     
-    # Remove extra whitespace
-    text = ' '.join(text.split())
-    
-    # Remove stopwords
-    stop_words = set(stopwords.words('english'))
+    # Remove extra whitespace and stopwords
+    stop_words = get_stop_words()
     text = ' '.join([word for word in text.split() if word not in stop_words])
     
     return text
 
-def split_content(content):
-    """Split content into chunks that meet the max term size requirement."""
-    parts = []
-    words = content.split()
+class _LongWordChunk(str):
+    """A piece of a word longer than MAX_TERM_SIZE, emitted before the whole word has been read."""
+
+    def __new__(cls, text, first):
+        chunk = super().__new__(cls, text)
+        chunk.first = first
+        return chunk
+
+def iter_split_words(words):
+    """
+    Group a stream of words into parts that meet the max term size requirement.
+
+    Args:
+        words (iterable): The words of the cleaned text, in order.
+
+    Yields:
+        str: The parts, built exactly as `split_content` builds them.
+    """
     current_part = []
     current_size = 0
 
     for word in words:
+        if isinstance(word, _LongWordChunk):
+            # A long word read piece by piece; its first piece closes the current part
+            if word.first and current_part:
+                yield " ".join(current_part)
+                current_part = []
+                current_size = 0
+            yield str(word)
+            continue
+
         # Add space character size if this isn't the first word in part
         space_size = 1 if current_part else 0
         word_size = len(word.encode('utf-8')) + space_size
 
         # If adding this word would exceed the limit, start a new part
         if current_size + word_size > MAX_TERM_SIZE and current_part:
-            parts.append(" ".join(current_part))
+            yield " ".join(current_part)
             current_part = []
             current_size = 0
 
         # Handle words that are longer than MAX_TERM_SIZE
         if word_size > MAX_TERM_SIZE:
             if current_part:
-                parts.append(" ".join(current_part))
+                yield " ".join(current_part)
                 current_part = []
                 current_size = 0
             # Split the long word
             while word:
                 chunk = word[:MAX_TERM_SIZE//2]  # Take half of MAX_TERM_SIZE to be safe
-                parts.append(chunk)
+                yield chunk
                 word = word[MAX_TERM_SIZE//2:]
         else:
             current_part.append(word)
@@ -93,44 +141,211 @@ def split_content(content):
 
     # Add the last part if there is one
     if current_part:
-        parts.append(" ".join(current_part))
+        yield " ".join(current_part)
+
+def split_content(content):
+    """Split content into chunks that meet the max term size requirement."""
+    return list(iter_split_words(content.split()))
+
+def _strip_tags(blocks):
+    """
+    Remove HTML tags from a stream of text blocks, like `HTML_TAG_RE.sub('', text)` on the whole text.
+
+    Text after a "<" is held back until the closing ">" is found. If the file ends first, the "<"
+    did not start a tag and the held-back text is emitted unchanged; beyond MAX_PENDING_TAG
+    characters it is held in a temporary file rather than in memory.
+    """
+    pending = None  # Text since an unclosed "<", or None outside a tag
+    pending_size = 0
+    spill = None
+    expect_content = False  # A tag needs at least one character between "<" and ">"
+
+    for text in blocks:
+        i = 0
+        n = len(text)
+        while i < n:
+            if pending is None:
+                j = text.find('<', i)
+                if j == -1:
+                    yield text[i:]
+                    break
+                yield text[i:j]
+                pending, pending_size, expect_content = ['<'], 1, True
+                i = j + 1
+                continue
+            if expect_content:
+                expect_content = False
+                if text[i] == '>':
+                    # "<>" is not a tag; keep the "<" and carry on from the ">"
+                    yield '<'
+                    pending = None
+                    continue
+            k = text.find('>', i)
+            if k != -1:
+                # The tag is complete: drop it
+                pending, pending_size = None, 0
+                if spill is not None:
+                    spill.close()
+                    spill = None
+                i = k + 1
+                continue
+            pending_size += n - i
+            if spill is not None:
+                spill.write(text[i:])
+            else:
+                pending.append(text[i:])
+                if pending_size > MAX_PENDING_TAG:
+                    spill = tempfile.TemporaryFile('w+', encoding='utf-8')
+                    spill.writelines(pending)
+                    pending = []
+            break
+
+    # The file ended inside an unclosed "<": it was not a tag
+    if pending is not None:
+        yield from pending
+        if spill is not None:
+            spill.seek(0)
+            for block in iter(lambda: spill.read(READ_BLOCK_SIZE), ''):
+                yield block
+            spill.close()
+
+def _iter_clean_words(pieces):
+    """
+    Turn a stream of tag-free text into the words `clean_text` keeps.
+
+    Words are emitted as soon as they are complete. A word longer than MAX_TERM_SIZE is
+    emitted in `_LongWordChunk` pieces while it is read, so it is never held in memory whole.
+    """
+    stop_words = get_stop_words()
+    carry = ''
+    long_word = False
+
+    for piece in pieces:
+        # Remove special characters and numbers
+        piece = NON_ALPHA_RE.sub('', piece)
+        if not piece:
+            continue
+        words = (carry + piece).split()
+        carry = '' if piece[-1].isspace() else words.pop()
+        for word in words:
+            if long_word:
+                # The first complete word is the end of the long word being read
+                long_word = False
+                while word:
+                    yield _LongWordChunk(word[:MAX_TERM_SIZE//2], False)
+                    word = word[MAX_TERM_SIZE//2:]
+            elif word not in stop_words:
+                yield word
+        while len(carry) > MAX_TERM_SIZE:
+            yield _LongWordChunk(carry[:MAX_TERM_SIZE//2], not long_word)
+            long_word = True
+            carry = carry[MAX_TERM_SIZE//2:]
+
+    if long_word:
+        while carry:
+            yield _LongWordChunk(carry[:MAX_TERM_SIZE//2], False)
+            carry = carry[MAX_TERM_SIZE//2:]
+    elif carry and carry not in stop_words:
+        yield carry
+
+def iter_preprocessed_parts(input_file_path):
+    """
+    Read, clean and split a raw text file incrementally.
 
-    return parts
+    The file is read in blocks of READ_BLOCK_SIZE characters, so memory use is bounded by the
+    block and part sizes rather than by the size of the file. The parts are identical to
+    `split_content(clean_text(raw_text))`, or `[clean_text(raw_text)]` when the cleaned text
+    fits in a single part.
 
-def preprocess_text_file(input_file_path, output_folder):
+    Args:
+        input_file_path (str): The raw text file.
+
+    Yields:
+        str: The cleaned parts of the file, in order.
+    """
+    with open(input_file_path, 'r', encoding='utf-8') as file:
+        blocks = iter(lambda: file.read(READ_BLOCK_SIZE).lower(), '')
+        empty = True
+        for part in iter_split_words(_iter_clean_words(_strip_tags(blocks))):
+            empty = False
+            yield part
+        if empty:
+            yield ""
+
+def preprocess_text_file(input_file_path, output_folder, source=None, writer=None):
     """
     Preprocess the raw text file, split if necessary, and save cleaned text as JSON files.
+
+    The file is streamed: each part is written as soon as it is complete. Every part gets a
+    stable ID derived from the source and the part content.
+
+    Args:
+        input_file_path (str): The raw text file.
+        output_folder (str): Folder the JSON documents are written to.
+        source (str): Name of the raw file used in the document IDs; defaults to its file name.
+        writer: Document writer from `shards.open_writer`; defaults to one JSON file per document.
+            The writer is closed when the file is done.
+
+    Returns:
+        list: The IDs of the documents written, or None if the file could not be processed.
     """
+    source = source or os.path.basename(input_file_path)
+    writer = writer or JsonFileWriter(output_folder)
     try:
-        # Read the raw text data
-        with open(input_file_path, 'r', encoding='utf-8') as file:
-            raw_text = file.read()
-        
-        # Clean the text
-        cleaned_text = clean_text(raw_text)
-        
-        # Split content if it exceeds MAX_TERM_SIZE
-        if len(cleaned_text.encode('utf-8')) > MAX_TERM_SIZE:
-            print(f"Warning: Content in {input_file_path} exceeds max term size. Splitting content.")
-            parts = split_content(cleaned_text)
-        else:
-            parts = [cleaned_text]  # No splitting needed
- 
         # Save each part as a separate JSON document
-        base_id = str(uuid.uuid4())
-        for i, part in enumerate(parts):
+        doc_ids = []
+        for i, part in enumerate(iter_preprocessed_parts(input_file_path)):
+            if i == 1:
+                print(f"Warning: Content in {input_file_path} exceeds max term size. Splitting content.")
             document = {
-                "id": f"{base_id}_{i}",  # Unique ID for each split part
+                "id": document_id(source, part),  # Stable ID for each split part
                 "content": part
             }
-            output_file_path = os.path.join(output_folder, f"{base_id}_{i}.json")
-            os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
-            with open(output_file_path, 'w', encoding='utf-8') as file:
-                json.dump(document, file, ensure_ascii=False, indent=4)
-            print(f"Processed text saved to {output_file_path}")
+            output_file_path = writer.write(document)
+            doc_ids.append(document["id"])
+            if output_file_path:
+                print(f"Processed text saved to {output_file_path}")
+        writer.close()
+        return doc_ids
  
     except Exception as e:
         print(f"Error during preprocessing file {input_file_path}: {str(e)}")
+        writer.abort()
+        return None
+ 
+def chunk_text_file(input_file_path, output_folder, max_tokens=DEFAULT_MAX_TOKENS, overlap=DEFAULT_OVERLAP,
+                    writer=None):
+    """
+    Split the raw text file into retrieval chunks and save each chunk as a JSON file.
+
+    Every chunk gets a stable ID derived from its source URL and its content.
+
+    Args:
+        input_file_path (str): The raw section file.
+        output_folder (str): Folder the JSON documents are written to.
+        max_tokens (int): Token budget of a chunk.
+        overlap (int): Number of tokens repeated between consecutive chunks of a heading.
+        writer: Document writer from `shards.open_writer`; defaults to one JSON file per document.
+            The writer is closed when the file is done.
+
+    Returns:
+        list: The IDs of the documents written, or None if the file could not be processed.
+    """
+    writer = writer or JsonFileWriter(output_folder)
+    try:
+        doc_ids = []
+        for chunk in chunk_file(input_file_path, max_tokens, overlap):
+            document = {"id": document_id(chunk["source_url"], chunk["content"]), **chunk}
+            writer.write(document)
+            doc_ids.append(document["id"])
+        writer.close()
+        print(f"Saved {len(doc_ids)} chunks of {input_file_path} to {output_folder}")
+        return doc_ids
+
+    except Exception as e:
+        print(f"Error during chunking file {input_file_path}: {str(e)}")
+        writer.abort()
+        return None
  
 def getFileName(file_path):
     file_name = getFileNameWithoutExtension(file_path)
@@ -141,20 +356,97 @@ def getFileNameWithoutExtension(file_path):
     filename = os.path.basename(file_path)
     return os.path.splitext(filename)[0]
  
-def preprocess_data(input_folder, output_folder):
-    """
-    Process all text files from the input folder and store the cleaned, split files in the output folder.
-    """
+def raw_text_files(input_folder):
+    """Return the paths of the raw text files below a folder, in a stable order."""
+    paths = []
     for root, _, files in os.walk(input_folder):
         for file in files:
             if file.endswith(".txt"):  # Assuming raw files are .txt
-                raw_file_path = os.path.join(root, file)
-                
-                # Generate corresponding path in the processed folder
-                processed_file_path = raw_file_path.replace(input_folder, output_folder)
-                processed_file_path = processed_file_path.replace('scraped_content', 'processed_content')
-                processed_file_path = processed_file_path.replace('.txt', '.json')  # Change file extension to .json
-                
-                preprocess_text_file(raw_file_path, output_folder)
- 
- 
\ No newline at end of file
+                paths.append(os.path.join(root, file))
+    return sorted(paths)
+
+def _init_worker():
+    # Load the stopwords once per worker process instead of once per file
+    get_stop_words()
+
+def _preprocess_worker(raw_file_path, output_folder, mode="clean", source=None, output_format="json"):
+    writer = open_writer(output_folder, source or raw_file_path, output_format)
+    if mode == "chunks":
+        doc_ids = chunk_text_file(raw_file_path, output_folder, writer=writer)
+    else:
+        doc_ids = preprocess_text_file(raw_file_path, output_folder, source, writer=writer)
+    shard = os.path.basename(writer.path) if isinstance(writer, ShardWriter) else None
+    return os.path.getsize(raw_file_path), doc_ids, shard
+
+def preprocess_data(input_folder, output_folder, workers=None, mode="clean", output_format="json"):
+    """
+    Process all text files from the input folder and store the cleaned, split files in the output folder.
+
+    Files are spread across a pool of worker processes, each of which loads the stopwords once.
+    Raw files whose content and mode are unchanged since the last run, according to the
+    manifest in the output folder, are skipped; documents no longer produced by any raw file
+    are deleted, and the documents added and removed are recorded in the manifest.
+
+    Args:
+        input_folder (str): Folder holding the raw `.txt` files.
+        output_folder (str): Folder the JSON documents are written to.
+        workers (int): Number of worker processes. Defaults to the number of CPUs; 1 processes
+            the files in the current process.
+        mode (str): "clean" for the cleaned text split at MAX_TERM_SIZE, or "chunks" for
+            heading-aware retrieval chunks (see `chunker.py`).
+        output_format (str): "json" for one JSON file per document, or "jsonl" / "jsonl.zst"
+            for one (compressed) JSONL shard per raw file (see `shards.py`).
+
+    Returns:
+        dict: Statistics with the number of files, files skipped and bytes processed, the
+            throughput, and the document IDs added and removed.
+
+    Raises:
+        ValueError: If the mode or output format is unknown.
+    """
+    if mode not in PREPROCESS_MODES:
+        raise ValueError(f"Unknown preprocessing mode {mode!r}, expected one of {PREPROCESS_MODES}")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}, expected one of {OUTPUT_FORMATS}")
+    start = time.perf_counter()
+    manifest = ProcessedManifest(output_folder)
+    sources = {}
+    digests = {}
+    for path in raw_text_files(input_folder):
+        source = os.path.relpath(path, input_folder).replace(os.sep, '/')
+        sources[source] = path
+        digests[source] = file_sha256(path)
+    todo = [source for source in sources if not manifest.is_current(source, digests[source], mode, output_format)]
+    paths = [sources[source] for source in todo]
+
+    workers = min(workers or os.cpu_count() or 1, max(len(paths), 1))
+    if workers == 1:
+        _init_worker()
+        outputs = [_preprocess_worker(path, output_folder, mode, source, output_format)
+                   for path, source in zip(paths, todo)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            outputs = list(executor.map(_preprocess_worker, paths, [output_folder] * len(paths),
+                                        [mode] * len(paths), todo, [output_format] * len(paths)))
+    elapsed = time.perf_counter() - start
+
+    # Files that failed keep their previous manifest entry and are retried on the next run
+    results = {source: (digests[source], doc_ids, shard) for source, (_, doc_ids, shard) in zip(todo, outputs)
+               if doc_ids is not None}
+    run = manifest.update(sources, results, mode, output_format)
+    manifest.save()
+
+    total_bytes = sum(size for size, _, _ in outputs)
+    throughput = total_bytes / elapsed / 1e6 if elapsed else 0.0
+    print(f"Preprocessed {len(paths)} files ({total_bytes / 1e6:.2f} MB) in {elapsed:.2f}s "
+          f"with {workers} workers ({throughput:.2f} MB/s); {len(sources) - len(paths)} unchanged files skipped, "
+          f"{len(run['added'])} documents added, {len(run['removed'])} removed")
+    return {
+        "files": len(paths),
+        "skipped": len(sources) - len(paths),
+        "bytes": total_bytes,
+        "seconds": elapsed,
+        "mb_per_second": throughput,
+        "added": run["added"],
+        "removed": run["removed"],
+    }
@@ -0,0 +1,203 @@
+"""
+recrawl.py
+
+This module decides which pages are due for a recrawl. For every page it records the hash of
+the content seen at the last check and adapts the page's recrawl interval to how often that
+content changes: the interval is halved when a check finds a change and doubled when it does
+not, so a frequently edited FAQ ends up being checked daily while a stable glossary is only
+revisited every few weeks. Pages that are not due are served from the HTTP cache.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+
+from .page_store import page_key
+
+# Define the file where the recrawl schedule is kept between runs
+schedule_path = '/opt/airflow/data/cache/recrawl.sqlite'
+
+DAY = 24 * 60 * 60
+
+# Bounds of the recrawl interval of a page, in seconds
+MIN_INTERVAL = DAY
+MAX_INTERVAL = 32 * DAY
+# A page is due this long before its interval has fully elapsed, so a daily run that starts a
+# little earlier than the day before still picks up the pages checked on the previous day
+SCHEDULE_SLACK = 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    last_checked REAL NOT NULL,
+    last_changed REAL NOT NULL,
+    interval REAL NOT NULL,
+    checks INTEGER NOT NULL,
+    changes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS section_pages (
+    section TEXT NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (section, url)
+);
+"""
+
+
+def content_hash(body):
+    """Return the hash used to detect changes of a page body."""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return hashlib.sha256(body or b'').hexdigest()
+
+
+class RecrawlScheduler:
+    """
+    SQLite-backed change history and recrawl schedule of the scraped pages.
+
+    Args:
+        path (str): Path of the schedule file.
+        min_interval (float): Shortest recrawl interval, in seconds.
+        max_interval (float): Longest recrawl interval, in seconds.
+    """
+
+    def __init__(self, path=None, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+        self.path = path or schedule_path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def is_due(self, url, now=None):
+        """True if a page has never been checked or its recrawl interval has elapsed."""
+        now = time.time() if now is None else now
+        row = self.conn.execute("SELECT last_checked, interval FROM pages WHERE url = ?",
+                                (page_key(url),)).fetchone()
+        return row is None or row[0] + row[1] - SCHEDULE_SLACK <= now
+
+    def next_check(self, url):
+        """Return the time a page is next due, or None if it has never been checked."""
+        row = self.conn.execute("SELECT last_checked + interval FROM pages WHERE url = ?",
+                                (page_key(url),)).fetchone()
+        return row[0] if row else None
+
+    def due_sections(self, section_urls, now=None):
+        """
+        Select the sections that have at least one page due for a recrawl.
+
+        A section whose pages have never been recorded is always due.
+
+        Args:
+            section_urls (dict): A dictionary containing section names and their root URLs.
+            now (float): Current time as a UNIX timestamp.
+
+        Returns:
+            dict: The due sections and their root URLs.
+        """
+        now = time.time() if now is None else now
+        due = {}
+        for section, urls in section_urls.items():
+            rows = self.conn.execute(
+                "SELECT p.last_checked, p.interval FROM section_pages s LEFT JOIN pages p ON p.url = s.url "
+                "WHERE s.section = ?", (section,)).fetchall()
+            if not rows or any(last_checked is None or last_checked + interval - SCHEDULE_SLACK <= now
+                               for last_checked, interval in rows):
+                due[section] = urls
+        return due
+
+    def preload(self, page_store, now=None):
+        """
+        Put the cached copy of every page that is not due into the page store.
+
+        The preloaded pages are marked unchanged, so the crawl and extraction stages use them
+        without sending any request.
+
+        Args:
+            page_store (PageStore): A page store backed by an `HttpCache`.
+            now (float): Current time as a UNIX timestamp.
+
+        Returns:
+            set: The URLs of the preloaded pages.
+        """
+        now = time.time() if now is None else now
+        preloaded = set()
+        if page_store.http_cache is None:
+            return preloaded
+        rows = self.conn.execute("SELECT url FROM pages WHERE last_checked + interval - ? > ?",
+                                 (SCHEDULE_SLACK, now))
+        for (url,) in rows.fetchall():
+            entry = page_store.http_cache.lookup(url)
+            if entry is not None:
+                page_store.put(url, entry.body, entry.content_type, changed=False)
+                preloaded.add(url)
+        return preloaded
+
+    def record(self, url, body, now=None):
+        """
+        Record a check of a page and adapt its recrawl interval.
+
+        Args:
+            url (str): URL of the page.
+            body (bytes): The content found.
+            now (float): Time of the check as a UNIX timestamp.
+
+        Returns:
+            bool: True if the content changed since the previous check (or the page is new).
+        """
+        now = time.time() if now is None else now
+        url = page_key(url)
+        digest = content_hash(body)
+        row = self.conn.execute("SELECT content_hash, interval, last_changed, checks, changes FROM pages "
+                                "WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            self.conn.execute("INSERT INTO pages VALUES (?, ?, ?, ?, ?, 1, 0)",
+                              (url, digest, now, now, self.min_interval))
+            return True
+        previous_hash, interval, last_changed, checks, changes = row
+        changed = digest != previous_hash
+        if changed:
+            interval, last_changed, changes = max(self.min_interval, interval / 2), now, changes + 1
+        else:
+            interval = min(self.max_interval, interval * 2)
+        self.conn.execute("UPDATE pages SET content_hash = ?, last_checked = ?, last_changed = ?, interval = ?, "
+                          "checks = ?, changes = ? WHERE url = ?",
+                          (digest, now, last_changed, interval, checks + 1, changes, url))
+        return changed
+
+    def record_crawl(self, section_urls, fetched_links, page_store, preloaded=(), now=None):
+        """
+        Record the pages checked by a crawl and the sections they belong to.
+
+        Args:
+            section_urls (dict): The crawled sections and their root URLs.
+            fetched_links (dict): A dictionary of sections and their corresponding fetched links.
+            page_store (PageStore): The page store filled by the crawl.
+            preloaded (set): URLs served from the cache without being checked.
+            now (float): Time of the crawl as a UNIX timestamp.
+
+        Returns:
+            dict: Number of pages checked and of pages that changed.
+        """
+        now = time.time() if now is None else now
+        checked = set()
+        changed = 0
+        for section, links in fetched_links.items():
+            for link in list(section_urls.get(section, [])) + list(links):
+                page = page_store.get(link)
+                if page is None or not page.ok:
+                    continue  # Failed pages stay due and are retried on the next run
+                self.conn.execute("INSERT OR IGNORE INTO section_pages VALUES (?, ?)", (section, page.url))
+                if page.url in checked or page.url in preloaded:
+                    continue
+                checked.add(page.url)
+                changed += self.record(page.url, page.body, now)
+        self.conn.commit()
+        print(f"Recrawl schedule: {len(checked)} pages checked, {changed} changed, "
+              f"{len(preloaded)} served from cache")
+        return {"checked": len(checked), "changed": changed}
+
+    def close(self):
+        self.conn.close()
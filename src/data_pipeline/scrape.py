@@ -1,53 +1,88 @@
 import requests
-from bs4 import BeautifulSoup
+from .page_store import PageStore, page_key
+from .extract import get_extractor, DEFAULT_EXTRACTOR
+from .politeness import REQUEST_TIMEOUT
 
-def scrape_and_save(urls, output_file="scraped_content.txt"):
+def get_page(url, page_store):
+    """
+    Return a page from the page store, downloading and storing it if it is missing.
+
+    Args:
+        url (str): URL of the page.
+        page_store (PageStore): The per-run page store.
+
+    Returns:
+        Page: The stored page.
+    """
+    page = page_store.get(url)
+    if page is None:
+        try:
+            response = requests.get(url, headers=page_store.conditional_headers(url), timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()  # Check for successful response
+            page = page_store.put_response(url, response.status_code, response.content, response.headers)
+        except requests.exceptions.RequestException as e:
+            page = page_store.put_error(url, e)
+    return page
+
+def scrape_and_save(urls, output_file="scraped_content.txt", page_store=None, extractor=DEFAULT_EXTRACTOR):
     """
     Scrape content from a list of URLs and save the content into a text file.
-    
+
+    Pages already present in the page store are extracted without being downloaded again,
+    and each page is written to the output file only once, whatever its URL fragment.
+
     Args:
         urls (list): List of URLs to scrape content from.
         output_file (str): File path where the scraped content will be saved.
-        
+        page_store (PageStore): Shared per-run page store filled by the crawl stage.
+        extractor (str): Name of the HTML text extractor (see `extract.EXTRACTORS`).
+
     Returns:
         dict: Dictionary with URLs as keys and scraped content as values.
     """
     print("Running scrape & save")
+    extract_text = get_extractor(extractor)
+    if page_store is None:
+        page_store = PageStore()
     scraped_data = {}  # Dictionary to store scraped content
-    
+    written = set()  # Pages already written to the output file
+
     try:
         with open(output_file, 'w', encoding='utf-8') as f:
             for url in urls:
                 print(f"Scraping content from: {url}")
-                try:
-                    response = requests.get(url)
-                    response.raise_for_status()  # Check for successful response
-                    
-                    soup = BeautifulSoup(response.content, 'html.parser')
-                    page_text = soup.get_text(separator="\n", strip=True)  # Extract text from the page
-                    
-                    if page_text:
-                        # Store the content in the dictionary
-                        scraped_data[url] = page_text
-                        
-                        # Write the content to file for logging purposes
+                page = get_page(url, page_store)
+                first_visit = page_key(url) not in written
+                written.add(page_key(url))
+
+                if not page.ok:
+                    print(f"Failed to retrieve {url}: {page.error}")
+                    scraped_data[url] = f"Failed to retrieve content: {page.error}"
+                    if first_visit:
+                        f.write(f"Failed to retrieve content from: {url}\n\n")
+                        f.write("="*80 + "\n\n")
+                    continue
+
+                page_text = extract_text(page.body)  # Extract text from the page
+
+                if page_text:
+                    # Store the content in the dictionary
+                    scraped_data[url] = page_text
+
+                    # Write the content to file for logging purposes
+                    if first_visit:
                         f.write(f"URL: {url}\n\n")
                         f.write(page_text + "\n\n")
                         f.write("="*80 + "\n\n")  # Separator between pages
-                    else:
-                        scraped_data[url] = "No content found"
+                else:
+                    scraped_data[url] = "No content found"
+                    if first_visit:
                         f.write(f"No content found at: {url}\n\n")
                         f.write("="*80 + "\n\n")
-                
-                except requests.exceptions.RequestException as e:
-                    print(f"Failed to retrieve {url}: {e}")
-                    scraped_data[url] = f"Failed to retrieve content: {e}"
-                    f.write(f"Failed to retrieve content from: {url}\n\n")
-                    f.write("="*80 + "\n\n")
 
         print(f"Scraped content saved to {output_file}")
-    
+
     except Exception as e:
         print(f"An error occurred while saving to {output_file}: {e}")
-    
+
     return scraped_data  # Return the scraped data dictionary
@@ -1,14 +1,20 @@
 """
 scraper.py
 
-This module manages the scraping logic for each section of the website. It handles the logic 
-for scraping sections based on the current week and ensuring that a new section is added each week.
+This module manages the scraping logic for each section of the website. Which sections and
+pages are scraped in a run is decided by the change-frequency-aware recrawl schedule in
+`recrawl.py`.
 """
 
 # Import necessary functions from other modules
 from .get_all_url import fetch_and_print_links
 from .arrange import arrange_scraped_data
-from .utils import get_current_week
+from .recrawl import RecrawlScheduler
+from .page_store import PageStore
+from .http_cache import HttpCache
+from .checkpoint import CrawlCheckpoint, checkpoint_path, prune_checkpoints
+from datetime import datetime
+import time
 
 # Define the URLs for each section to scrape
 section_urls = {
@@ -25,32 +31,52 @@ section_urls = {
     'section-11': ["https://rc-docs.northeastern.edu/en/latest/faqs-new.html"]
 }
 
-def scrape_sections_up_to_current_week():
+def scrape_due_sections(resume=False, now=None):
     """
-    Scrape sections up to and including the current week.
+    Scrape the sections that have pages due for a recrawl.
 
-    This function dynamically determines which sections to scrape based on the current week. 
-    It fetches links for all sections up to the current week and arranges the scraped content 
-    into directories.
+    The recrawl schedule keeps a change history for every page and checks pages that change
+    often more frequently than stable ones. Only the sections with at least one due page are
+    crawled, and within those sections the pages that are not due are served from the HTTP
+    cache instead of being requested again.
+
+    The crawl is checkpointed to a file named after the current date. With `resume`, a run
+    that was interrupted earlier the same day continues from its checkpoint instead of
+    fetching every page again. Checkpoints left by earlier days are deleted.
+
+    Args:
+        resume (bool): Resume from today's checkpoint if there is one.
+        now (float): Time of the run as a UNIX timestamp, defaults to the current time.
 
     Returns:
         dict: A dictionary of the sections that were scraped in the current run.
     """
     print("Starting the scraping process...")  # Indicate the start of the scraping process
-    current_week = get_current_week()  # Calculate the current week based on the start date
-    
-    # Ensure the current week does not exceed the number of available sections (11)
-    max_sections = len(section_urls)  # Maximum number of sections is 11
-    if current_week > max_sections:
-        current_week = max_sections  # Limit the week to 11 if it exceeds the available sections
-    
-    # Determine which sections to scrape (based on the current week)
-    sections_to_scrape = {f'section-{i}': section_urls[f'section-{i}'] for i in range(1, current_week + 1)}
+    now = time.time() if now is None else now
+    scheduler = RecrawlScheduler()
+    run_checkpoint = checkpoint_path(datetime.fromtimestamp(now).strftime("%Y%m%d"))
+    prune_checkpoints(keep=run_checkpoint)  # They can only resume their own run
+
+    # Determine which sections to scrape (based on the recrawl schedule of their pages)
+    sections_to_scrape = scheduler.due_sections(section_urls, now)
     print(f"Sections to scrape: {sections_to_scrape}")  # Debug statement to show which sections will be scraped
-    
-    # Fetch links and arrange the scraped data for the sections
-    fetched_links = fetch_and_print_links(sections_to_scrape)
+    if not sections_to_scrape:
+        print("No section is due for a recrawl")
+        scheduler.close()
+        return sections_to_scrape
+
+    # Fetch links and arrange the scraped data for the sections, downloading every due page once
+    # and revalidating it with a conditional request; pages that are not due come from the cache
+    page_store = PageStore(http_cache=HttpCache())
+    preloaded = scheduler.preload(page_store, now)
+    checkpoint = CrawlCheckpoint(run_checkpoint, resume=resume)
+    fetched_links = fetch_and_print_links(sections_to_scrape, page_store=page_store, discovery="manifest",
+                                          checkpoint=checkpoint)
     print(f"Fetched links: {fetched_links}")  # Debug statement to show fetched links
-    arrange_scraped_data(fetched_links)
-    
-    return sections_to_scrape   # Return the sections that were scraped
\ No newline at end of file
+    arrange_scraped_data(fetched_links, page_store)
+    scheduler.record_crawl(sections_to_scrape, fetched_links, page_store, preloaded, now)
+    scheduler.close()
+    checkpoint.clear()  # The run completed; nothing left to resume
+    print(f"Downloaded {len(page_store) - len(preloaded)} pages ({page_store.total_bytes} bytes in store)")
+
+    return sections_to_scrape   # Return the sections that were scraped
@@ -0,0 +1,191 @@
+"""
+shards.py
+
+This module implements the sharded JSONL format for processed documents. Instead of one
+pretty-printed JSON file per document, all the documents produced from a raw file are written
+to a single shard with one compact JSON object per line: `<name>.jsonl`, or `<name>.jsonl.zst`
+when compressed with zstd. Next to every shard, `<shard>.index.json` records where each
+document is stored, so a single document can be read without scanning the whole shard.
+
+Compressed shards are a sequence of independent zstd frames of BLOCK_DOCUMENTS documents
+each. An index entry is `[offset, length, line]`: the byte range of the frame (or of the line,
+for uncompressed shards) and the line of the document within it.
+"""
+
+import io
+import json
+import os
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; shards are then written uncompressed
+    zstandard = None
+
+# Processed-data formats: one JSON file per document, or sharded JSONL (optionally compressed)
+OUTPUT_FORMATS = ("json", "jsonl", "jsonl.zst")
+DEFAULT_SHARD_FORMAT = "jsonl.zst" if zstandard is not None else "jsonl"
+
+INDEX_SUFFIX = ".index.json"
+
+# Number of documents per zstd frame, and the compression level
+BLOCK_DOCUMENTS = 256
+ZSTD_LEVEL = 3
+
+
+def shard_format(name):
+    """Return the shard format of a file name ("jsonl" or "jsonl.zst"), or None if it is not a shard."""
+    if name.endswith(".jsonl.zst"):
+        return "jsonl.zst"
+    if name.endswith(".jsonl"):
+        return "jsonl"
+    return None
+
+
+def shard_name(source, output_format):
+    """Return the shard file name for a raw file, e.g. "section-1_scraped_content.jsonl.zst"."""
+    return f"{os.path.splitext(os.path.basename(source))[0]}.{output_format}"
+
+
+def _require_zstandard(output_format):
+    if output_format == "jsonl.zst" and zstandard is None:
+        raise ValueError("Compressed shards require the zstandard package")
+
+
+class JsonFileWriter:
+    """Writes each document to its own `<id>.json` file, the original processed-data format."""
+
+    def __init__(self, output_folder):
+        self.output_folder = output_folder
+
+    def write(self, document):
+        """Write a document and return the path of its file."""
+        output_file_path = os.path.join(self.output_folder, f"{document['id']}.json")
+        os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+        with open(output_file_path, 'w', encoding='utf-8') as file:
+            json.dump(document, file, ensure_ascii=False, indent=4)
+        return output_file_path
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+class ShardWriter:
+    """
+    Writes documents to one JSONL shard and its offset index.
+
+    The shard and its index are written to temporary files and only replace the previous
+    shard on `close`, so readers never see a partly written shard.
+
+    Args:
+        path (str): Path of the shard, ending in ".jsonl" or ".jsonl.zst".
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.format = shard_format(path)
+        if self.format is None:
+            raise ValueError(f"Not a shard file name: {path}")
+        _require_zstandard(self.format)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path + ".tmp", 'wb')
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL) if self.format == "jsonl.zst" else None
+        self._block = []
+        self._ids = set()
+        self.offsets = {}
+
+    def write(self, document):
+        """Append a document to the shard. Returns None: documents have no file of their own."""
+        if document["id"] in self._ids:
+            return None  # Identical chunks share one content-addressed ID; store it once
+        self._ids.add(document["id"])
+        line = (json.dumps(document, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+        if self._compressor is None:
+            self.offsets[document["id"]] = [self._file.tell(), len(line), 0]
+            self._file.write(line)
+        else:
+            self._block.append((document["id"], line))
+            if len(self._block) >= BLOCK_DOCUMENTS:
+                self._flush_block()
+        return None
+
+    def _flush_block(self):
+        if not self._block:
+            return
+        frame = self._compressor.compress(b"".join(line for _, line in self._block))
+        offset = self._file.tell()
+        self._file.write(frame)
+        for i, (doc_id, _) in enumerate(self._block):
+            self.offsets[doc_id] = [offset, len(frame), i]
+        self._block = []
+
+    def close(self):
+        """Finish the shard and write its index."""
+        if self._compressor is not None:
+            self._flush_block()
+        self._file.close()
+        index = {"format": self.format, "documents": self.offsets}
+        with open(self.path + INDEX_SUFFIX + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump(index, file)
+        os.replace(self.path + ".tmp", self.path)
+        os.replace(self.path + INDEX_SUFFIX + ".tmp", self.path + INDEX_SUFFIX)
+
+    def abort(self):
+        """Discard a shard that could not be completed."""
+        self._file.close()
+        os.remove(self.path + ".tmp")
+
+
+def open_writer(output_folder, source, output_format):
+    """Return the document writer for a raw file in a processed-data format."""
+    if output_format == "json":
+        return JsonFileWriter(output_folder)
+    return ShardWriter(os.path.join(output_folder, shard_name(source, output_format)))
+
+
+def iter_shard(fileobj, output_format):
+    """
+    Read the documents of a shard sequentially.
+
+    Args:
+        fileobj: A binary file object positioned at the start of the shard.
+        output_format (str): "jsonl" or "jsonl.zst".
+
+    Yields:
+        dict: The documents, in the order they were written.
+    """
+    if output_format == "jsonl.zst":
+        _require_zstandard(output_format)
+        fileobj = zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True)
+    for line in io.TextIOWrapper(fileobj, encoding='utf-8'):
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_shard(path):
+    """Read all documents of a shard file."""
+    with open(path, 'rb') as file:
+        yield from iter_shard(file, shard_format(path))
+
+
+def read_document(path, doc_id):
+    """
+    Read one document of a shard through its index.
+
+    Returns:
+        dict or None: The document, or None if the shard does not hold it.
+    """
+    with open(path + INDEX_SUFFIX, 'r', encoding='utf-8') as file:
+        index = json.load(file)
+    entry = index["documents"].get(doc_id)
+    if entry is None:
+        return None
+    offset, length, line = entry
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        data = file.read(length)
+    if index["format"] == "jsonl.zst":
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return json.loads(data.decode('utf-8').splitlines()[line])
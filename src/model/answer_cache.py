@@ -0,0 +1,181 @@
+"""
+answer_cache.py
+
+This module keeps the validated answers of previous questions, so a question that was already
+answered (possibly worded a little differently) is answered without calling the LLM again.
+
+The cleaned question is embedded with the embedder of the chunk embeddings (`embeddings.py`).
+A question is answered from the cache when its normalized text was answered before, or when
+it has the same content words (its words without QUESTION_STOPWORDS) as a cached question and
+the cosine similarity of their vectors reaches ANSWER_CACHE_THRESHOLD. The embedding is lexical,
+so similarity alone cannot tell apart questions that differ in one key term ("quota on scratch"
+and "quota on home" score 0.87): reworded questions with the same words match, while questions
+about another file system, partition or operating system never do.
+
+Entries live in a `MemoryCache` or `SQLiteCache` (`cache.py`): they are tagged with the index
+version the answer was built from and dropped when a new index is published (only when a
+pipeline run changed the indexed content, see `publish_index_changes`), expire after
+ANSWER_CACHE_TTL seconds, and the least recently used ones are evicted beyond
+ANSWER_CACHE_SIZE entries. Answers longer than ANSWER_CACHE_MAX_CHARS are not cached.
+"""
+
+import base64
+import os
+import threading
+
+import numpy as np
+
+from .bm25 import tokenize
+from .cache import INDEX_VERSION_PATH, IndexVersion, normalize_query, open_cache
+from .embeddings import HashingEmbedder
+
+# "memory" (default), "sqlite" or "off", the SQLite file, and the limits of the cache
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "memory")
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "data/cache/answers.sqlite")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.85"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))
+ANSWER_CACHE_MAX_CHARS = int(os.getenv("ANSWER_CACHE_MAX_CHARS", "8000"))
+
+# Words that can differ between two wordings of the same question
+QUESTION_STOPWORDS = frozenset("""
+a about am an and any are as at be by can could do does for from get have how i if in is it me
+my of on or please should so that the there this to use using what when where which who why
+will with would you your
+""".split())
+
+
+def content_terms(question):
+    """Return the words of a question that must match for a cached answer to be reused."""
+    return frozenset(term for term in tokenize(question) if term not in QUESTION_STOPWORDS)
+
+
+def _encode_vector(vector):
+    return base64.b64encode(np.asarray(vector, dtype=np.float16).tobytes()).decode('ascii')
+
+
+def _decode_vector(data):
+    return np.frombuffer(base64.b64decode(data), dtype=np.float16)
+
+
+class SemanticAnswerCache:
+    """
+    Answers of previous questions, looked up by question similarity.
+
+    Args:
+        cache (MemoryCache): The entry store (`MemoryCache` or `SQLiteCache`).
+        embedder (HashingEmbedder): Embeds the questions; defaults to `HashingEmbedder()`.
+        threshold (float): Minimum cosine similarity of a cached question.
+        max_chars (int): Longest answer that is cached.
+        versions (IndexVersion): The index version; defaults to the INDEX_VERSION_PATH file.
+    """
+
+    def __init__(self, cache, embedder=None, threshold=ANSWER_CACHE_THRESHOLD, max_chars=ANSWER_CACHE_MAX_CHARS,
+                 versions=None):
+        self.cache = cache
+        self.threshold = threshold
+        self.max_chars = max_chars
+        self.versions = versions or IndexVersion(INDEX_VERSION_PATH)
+        self._embedder = embedder
+        self._version = None
+        self.lock = threading.Lock()
+        self.counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stored": 0, "skipped": 0}
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = HashingEmbedder()
+        return self._embedder
+
+    def _current_version(self):
+        version = self.versions.current()
+        if version != self._version:
+            self.cache.invalidate(version)  # Answers built from an older index
+            self._version = version
+        return version
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def lookup(self, question):
+        """
+        Return the cached answer of a question, or None.
+
+        Args:
+            question (str): The cleaned question.
+
+        Returns:
+            dict: "answer", the cached "question" and its "similarity" to this one, or None.
+        """
+        version = self._current_version()
+        key = normalize_query(question)
+        entry = self.cache.get(key, version)
+        if entry is not None:
+            self._count("exact_hits")
+            return {"answer": entry["answer"], "question": entry["question"], "similarity": 1.0}
+
+        # Only questions with the same content words are compared, so a question that differs
+        # in one key term ("scratch" or "home") is a miss however similar it is
+        terms = content_terms(question)
+        candidates = [(other, entry) for other, entry in self.cache.items(version)
+                      if entry.get("model") == self.embedder.name and content_terms(entry["question"]) == terms]
+        vector = self.embedder.embed([question])[0] if candidates else None
+        if candidates and vector.any():
+            matrix = np.stack([_decode_vector(entry["vector"]) for _, entry in candidates]).astype(np.float32)
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                entry = self.cache.get(candidates[best][0], version)  # Marks it recently used
+                if entry is not None:
+                    self._count("semantic_hits")
+                    return {"answer": entry["answer"], "question": entry["question"],
+                            "similarity": float(similarities[best])}
+        self._count("misses")
+        return None
+
+    def store(self, question, answer):
+        """
+        Cache the validated answer of a question.
+
+        Args:
+            question (str): The cleaned question.
+            answer (str): The answer, after validation.
+
+        Returns:
+            bool: Whether the answer was cached.
+        """
+        if not answer or len(answer) > self.max_chars:
+            self._count("skipped")
+            return False
+        version = self._current_version()
+        vector = self.embedder.embed([question])[0]
+        self.cache.put(normalize_query(question), {"question": question, "answer": answer,
+                                                   "model": self.embedder.name,
+                                                   "vector": _encode_vector(vector)}, version)
+        self._count("stored")
+        return True
+
+    def stats(self):
+        """Return the exact and semantic hits, misses, answers stored and skipped, and the hit rate."""
+        with self.lock:
+            stats = dict(self.counters)
+        cache_stats = self.cache.stats()
+        stats.update(entries=cache_stats["entries"], evicted=cache_stats["evicted"])
+        hits = stats["exact_hits"] + stats["semantic_hits"]
+        stats["hit_rate"] = hits / (hits + stats["misses"]) if hits + stats["misses"] else 0.0
+        return stats
+
+
+_answer_cache = None
+
+
+def get_answer_cache():
+    """Return the shared answer cache, or None if ANSWER_CACHE is "off"."""
+    global _answer_cache
+    if ANSWER_CACHE == "off":
+        return None
+    if _answer_cache is None:
+        _answer_cache = SemanticAnswerCache(open_cache(ANSWER_CACHE, ANSWER_CACHE_PATH, ANSWER_CACHE_SIZE,
+                                                       ANSWER_CACHE_TTL))
+    return _answer_cache
@@ -0,0 +1,203 @@
+"""
+bm25.py
+
+This module implements a compact in-process BM25 index over the processed chunks, so questions
+can be answered without a round trip to Azure Cognitive Search.
+
+The index is a set of flat numpy arrays: for every term, a slice of `postings` (document
+numbers) and of `weights` (the BM25 contribution of the term to each of those documents,
+computed once at build time). A query only adds up the weight slices of its terms and picks the
+best documents with `argpartition`. The documents themselves are stored as compact JSON in one
+byte array. Every array is saved as a `.npy` file and loaded with `mmap_mode='r'`, so loading
+is instant and the pages are shared between processes serving the same index.
+"""
+
+import json
+import os
+import re
+from array import array
+from collections import Counter
+
+import numpy as np
+
+# BM25 parameters: term frequency saturation and document length normalization
+K1 = 1.2
+B = 0.75
+
+# Fields of a document kept in the index and returned with the search results
+STORED_FIELDS = ("id", "content", "source_url", "section", "heading")
+
+TOKEN_RE = re.compile(r'\w+')
+
+ARRAYS = ("offsets", "postings", "weights", "store_offsets", "store")
+META_NAME = "meta.json"
+
+
+def tokenize(text):
+    """Split a text into lowercase word tokens."""
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    A BM25 index built with `build` or read with `load`.
+
+    Args:
+        terms (list): The vocabulary; term i owns `postings[offsets[i]:offsets[i + 1]]`.
+        arrays (dict): The numpy arrays named in ARRAYS.
+        meta (dict): Number of documents, the BM25 parameters and the document IDs in order.
+    """
+
+    def __init__(self, terms, arrays, meta):
+        self.terms = {term: i for i, term in enumerate(terms)}
+        self._terms = terms
+        self.meta = meta
+        self.offsets = arrays["offsets"]
+        self.postings = arrays["postings"]
+        self.weights = arrays["weights"]
+        self.store_offsets = arrays["store_offsets"]
+        self.store = arrays["store"]
+        self._numbers = None
+
+    def __len__(self):
+        return self.meta["documents"]
+
+    @classmethod
+    def build(cls, documents, k1=K1, b=B):
+        """
+        Build the index of a collection of documents.
+
+        Args:
+            documents (iterable): Documents with "id" and "content"; repeated IDs are indexed once.
+            k1 (float): BM25 term frequency saturation.
+            b (float): BM25 document length normalization.
+
+        Returns:
+            BM25Index: The index, held in memory until it is saved.
+        """
+        terms = {}
+        term_ids, numbers, tfs = array('i'), array('i'), array('f')
+        lengths = []
+        stored = []
+        seen_ids = {}
+        for document in documents:
+            if document["id"] in seen_ids:
+                continue
+            number = seen_ids[document["id"]] = len(lengths)
+            tokens = tokenize(document.get("content", ""))
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_ids.append(terms.setdefault(term, len(terms)))
+                numbers.append(number)
+                tfs.append(tf)
+            stored.append(json.dumps({field: document[field] for field in STORED_FIELDS if field in document},
+                                     ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+        # Group the (term, document, tf) entries by term; a stable sort keeps documents in order
+        count = len(lengths)
+        lengths = np.asarray(lengths, dtype=np.float32)
+        avgdl = float(lengths.mean()) if count and lengths.mean() > 0 else 1.0
+        term_ids = np.frombuffer(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind='stable')
+        postings = np.frombuffer(numbers, dtype=np.int32)[order]
+        tfs = np.frombuffer(tfs, dtype=np.float32)[order]
+        df = np.bincount(term_ids, minlength=len(terms)).astype(np.float32)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(df, dtype=np.int64)
+        idf = np.log(1 + (count - df + 0.5) / (df + 0.5))
+        norm = k1 * (1 - b + b * lengths[postings] / avgdl)
+        weights = (np.repeat(idf, df.astype(np.int64)) * tfs * (k1 + 1) / (tfs + norm)).astype(np.float32)
+
+        store_offsets = np.zeros(count + 1, dtype=np.int64)
+        store_offsets[1:] = np.cumsum([len(data) for data in stored])
+        arrays = {
+            "offsets": offsets,
+            "postings": postings,
+            "weights": weights,
+            "store_offsets": store_offsets,
+            "store": np.frombuffer(b"".join(stored), dtype=np.uint8),
+        }
+        return cls(list(terms), arrays, {"documents": count, "k1": k1, "b": b, "avgdl": avgdl, "ids": list(seen_ids)})
+
+    def save(self, folder):
+        """
+        Write the index to a folder.
+
+        Every file is written to a temporary file and then moved into place, so an interrupted
+        save never leaves a truncated file; the metadata is written last.
+        """
+        os.makedirs(folder, exist_ok=True)
+        arrays = {"offsets": self.offsets, "postings": self.postings, "weights": self.weights,
+                  "store_offsets": self.store_offsets, "store": self.store}
+        for name in ARRAYS:
+            path = os.path.join(folder, f"{name}.npy")
+            with open(path + ".tmp", 'wb') as file:
+                np.save(file, np.asarray(arrays[name]))
+            os.replace(path + ".tmp", path)
+        path = os.path.join(folder, META_NAME)
+        with open(path + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump({**self.meta, "terms": self._terms}, file, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, folder, mmap=True):
+        """
+        Read an index written by `save`.
+
+        Args:
+            folder (str): The index folder.
+            mmap (bool): Map the arrays instead of reading them into memory.
+
+        Returns:
+            BM25Index: The index.
+        """
+        with open(os.path.join(folder, META_NAME), 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        terms = meta.pop("terms")
+        arrays = {name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode='r' if mmap else None)
+                  for name in ARRAYS}
+        return cls(terms, arrays, meta)
+
+    def document(self, number):
+        """Return the stored fields of the document with this number."""
+        start, end = self.store_offsets[number], self.store_offsets[number + 1]
+        return json.loads(bytes(self.store[start:end]).decode('utf-8'))
+
+    def get(self, doc_id):
+        """Return the stored fields of the document with this ID, or None if it is not indexed."""
+        if self._numbers is None:
+            self._numbers = {doc_id: number for number, doc_id in enumerate(self.meta.get("ids", []))}
+        number = self._numbers.get(doc_id)
+        return None if number is None else self.document(number)
+
+    def scores(self, query):
+        """Return the BM25 score of every document for a query."""
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term in set(tokenize(query)):
+            i = self.terms.get(term)
+            if i is None:
+                continue
+            start, end = self.offsets[i], self.offsets[i + 1]
+            # Document numbers are unique within a posting list, so plain fancy indexing adds correctly
+            scores[self.postings[start:end]] += self.weights[start:end]
+        return scores
+
+    def search(self, query, top=8):
+        """
+        Return the best documents for a query.
+
+        Args:
+            query (str): The question.
+            top (int): Maximum number of documents.
+
+        Returns:
+            list: The stored fields of the documents with their "score", best first. Documents
+                that share no term with the query are not returned.
+        """
+        if not len(self) or top <= 0:
+            return []
+        scores = self.scores(query)
+        top = min(top, len(scores))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [{**self.document(number), "score": float(scores[number])} for number in best if scores[number] > 0]
@@ -0,0 +1,314 @@
+"""
+cache.py
+
+This module provides the result caches of the serving path and the index version they are
+invalidated by.
+
+- `MemoryCache` is an in-process LRU cache: an `OrderedDict` in least-recently-used order,
+  bounded by `max_entries`.
+- `SQLiteCache` keeps the same entries in a local SQLite file, so the worker processes of the
+  app share them; the least recently used rows are deleted beyond `max_entries`.
+
+Both store JSON values with an expiry time (`ttl` seconds) and the index version they were
+computed from. An entry of another version is a miss, and `invalidate(version)` drops all of
+them at once. At the end of a run, the data pipeline calls `publish_index_changes` with what
+each of its index stages changed; a new version is published only if one of them changed the
+indexed content, so a run that re-indexes the same chunks keeps the cached results. `IndexVersion`
+reads the version file back, only re-reading it when it changes on disk.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+INDEX_VERSION_PATH = os.getenv("INDEX_VERSION_PATH", "data/index_version.json")
+
+DEFAULT_TTL = 3600.0
+DEFAULT_MAX_ENTRIES = 1024
+CACHE_BACKENDS = ("memory", "sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires REAL NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+"""
+
+
+def normalize_query(query):
+    """Return the cache key form of a question: case-folded, single-spaced, without end punctuation."""
+    return " ".join(query.casefold().split()).strip(" ?!.")
+
+
+def publish_index_version(path=INDEX_VERSION_PATH, **details):
+    """
+    Record that a new index was published, which invalidates the cached results.
+
+    Args:
+        path (str): The version file.
+        **details: Extra fields written with the version, e.g. the stage that published it.
+
+    Returns:
+        str: The new version.
+    """
+    version = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", 'w', encoding='utf-8') as file:
+        json.dump({"version": version, "time": time.time(), **details}, file)
+    os.replace(path + ".tmp", path)
+    print(f"Published index version {version}")
+    return version
+
+
+def publish_index_changes(changes, path=INDEX_VERSION_PATH):
+    """
+    Publish a new index version if any stage of a pipeline run changed the indexed content.
+
+    Args:
+        changes (dict): Stage name -> whether it changed the content (None if it did not run).
+        path (str): The version file.
+
+    Returns:
+        str: The new version, or the current one if nothing changed.
+    """
+    changed = sorted(stage for stage, change in changes.items() if change)
+    if not changed:
+        version = IndexVersion(path).current()
+        print(f"Index content unchanged; keeping index version {version or '(none)'}")
+        return version
+    return publish_index_version(path, stages=changed)
+
+
+class IndexVersion:
+    """
+    The current index version, read from the file written by `publish_index_version`.
+
+    Args:
+        path (str): The version file; while it does not exist the version is "".
+    """
+
+    def __init__(self, path=INDEX_VERSION_PATH):
+        self.path = path
+        self._stamp = None
+        self._version = ""
+
+    def current(self):
+        """Return the current version; the file is only read again when it changed."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self._stamp, self._version = None, ""
+            return self._version
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if stamp != self._stamp:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as file:
+                    self._version = str(json.load(file).get("version", ""))
+            except (OSError, ValueError):
+                return self._version  # Being replaced; keep the previous version
+            self._stamp = stamp
+        return self._version
+
+
+class MemoryCache:
+    """
+    In-process LRU cache with a time to live.
+
+    Args:
+        max_entries (int): Maximum number of entries.
+        ttl (float): Seconds an entry stays valid.
+        clock (callable): Returns the current time in seconds.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (version, JSON value, expiry), least recently used first
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "invalidated": 0}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, version=""):
+        """
+        Return the cached value of a key, or None on a miss.
+
+        Args:
+            key (str): The key.
+            version (str): The current index version; entries of other versions are misses.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version or entry[2] <= self.clock():
+                if entry is not None:
+                    del self.entries[key]
+                    # Computed from another index version, or past its time to live
+                    self.counters["invalidated" if entry[0] != version else "expired"] += 1
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+        return json.loads(entry[1])
+
+    def put(self, key, value, version=""):
+        """Cache a JSON-serializable value under a key for an index version."""
+        data = json.dumps(value, ensure_ascii=False)
+        with self.lock:
+            self.entries[key] = (version, data, self.clock() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters["evicted"] += 1
+
+    def items(self, version=""):
+        """Return the (key, value) pairs of the live entries of a version, without touching them."""
+        now = self.clock()
+        with self.lock:
+            entries = [(key, data) for key, (entry_version, data, expires) in self.entries.items()
+                       if entry_version == version and expires > now]
+        return [(key, json.loads(data)) for key, data in entries]
+
+    def invalidate(self, version):
+        """Drop the entries of every version other than `version`."""
+        with self.lock:
+            stale = [key for key, entry in self.entries.items() if entry[0] != version]
+            for key in stale:
+                del self.entries[key]
+            self.counters["invalidated"] += len(stale)
+        return len(stale)
+
+    def stats(self):
+        """
+        Return the hit, miss, expiry, eviction and invalidation counts and the hit rate.
+
+        "expired" counts the entries dropped at the end of their time to live, "invalidated"
+        those dropped because another index version was published.
+        """
+        with self.lock:
+            stats = dict(self.counters, entries=len(self.entries))
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class SQLiteCache(MemoryCache):
+    """
+    LRU cache with a time to live in a local SQLite file, shared by the processes that open it.
+
+    The counters of `stats` are those of this process.
+
+    Args:
+        path (str): The SQLite file.
+        max_entries (int): Maximum number of entries.
+        ttl (float): Seconds an entry stays valid.
+        clock (callable): Returns the current time in seconds.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, clock=time.time):
+        super().__init__(max_entries, ttl, clock)
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self.conn.executescript(SCHEMA)
+
+    @property
+    def conn(self):
+        # One connection per thread; WAL lets readers and a writer of other processes proceed
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def get(self, key, version=""):
+        now = self.clock()
+        row = self.conn.execute("SELECT version, value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or row[0] != version or row[2] <= now:
+            if row is not None:
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count("invalidated" if row[0] != version else "expired")
+            self._count("misses")
+            return None
+        self.conn.execute("UPDATE entries SET used = ? WHERE key = ?", (now, key))
+        self._count("hits")
+        return json.loads(row[1])
+
+    def put(self, key, value, version=""):
+        now = self.clock()
+        data = json.dumps(value, ensure_ascii=False)
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                         (key, version, data, now + self.ttl, now))
+            excess = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("DELETE FROM entries WHERE key IN "
+                             "(SELECT key FROM entries ORDER BY used LIMIT ?)", (excess,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if excess > 0:
+            self._count("evicted", excess)
+
+    def items(self, version=""):
+        rows = self.conn.execute("SELECT key, value FROM entries WHERE version = ? AND expires > ?",
+                                 (version, self.clock()))
+        return [(key, json.loads(data)) for key, data in rows]
+
+    def invalidate(self, version):
+        removed = self.conn.execute("DELETE FROM entries WHERE version != ?", (version,)).rowcount
+        self._count("invalidated", removed)
+        return removed
+
+    def stats(self):
+        stats = super().stats()
+        stats["entries"] = len(self)
+        return stats
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def open_cache(backend="memory", path=None, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+    """
+    Create a cache.
+
+    Args:
+        backend (str): "memory" or "sqlite".
+        path (str): The SQLite file of the "sqlite" backend.
+        max_entries (int): Maximum number of entries.
+        ttl (float): Seconds an entry stays valid.
+
+    Raises:
+        ValueError: If the backend is unknown, or "sqlite" is asked without a path.
+    """
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(f"Unknown cache backend {backend!r}, expected one of {CACHE_BACKENDS}")
+    if backend == "sqlite":
+        if not path:
+            raise ValueError("The sqlite cache backend needs a path")
+        return SQLiteCache(path, max_entries, ttl)
+    return MemoryCache(max_entries, ttl)
@@ -0,0 +1,227 @@
+"""
+context_packer.py
+
+This module fits the retrieved passages into a fixed token budget before they are pasted into
+the prompt, instead of sending every retrieved chunk whole.
+
+1. Passages are counted with a local tokenizer: tiktoken's TIKTOKEN_ENCODING (the encoding of
+   the chat model) when tiktoken is installed and the encoding file is in TIKTOKEN_CACHE_DIR or
+   can be downloaded to it, otherwise the word-and-punctuation approximation of the chunker. The
+   Docker image fetches the file at build time; `prefetch_encoding` does it for a local setup.
+2. They are selected greedily by maximal marginal relevance (MMR): each step takes the passage
+   with the best trade-off between its relevance (retrieval rank and share of the question's
+   words it contains) and its similarity to the passages already taken, so a second copy of
+   the same instructions does not use the budget. Near-copies are dropped outright.
+3. A passage longer than MAX_PASSAGE_TOKENS, or than what is left of the budget, is cut at the
+   last sentence end that fits.
+
+`pack_context` returns the packed context and a report with the tokens saved.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; tokens are then approximated
+    tiktoken = None
+
+from .bm25 import tokenize
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+MAX_PASSAGE_TOKENS = int(os.getenv("MAX_PASSAGE_TOKENS", "800"))
+
+# Remainders of the budget smaller than this are not filled with a cut passage
+MIN_PASSAGE_TOKENS = 32
+
+# MMR trade-off between relevance (1.0) and diversity (0.0), and the similarity from which a
+# passage is a near-copy of one already selected
+MMR_LAMBDA = 0.7
+REDUNDANCY_THRESHOLD = 0.9
+
+# Encoding of the chat model (gpt-4-turbo), and where tiktoken keeps its encoding files, so
+# they are downloaded once and then read locally
+TIKTOKEN_ENCODING = os.getenv("TIKTOKEN_ENCODING", "cl100k_base")
+TIKTOKEN_CACHE_DIR = os.getenv("TIKTOKEN_CACHE_DIR", "data/cache/tiktoken")
+PASSAGE_SEPARATOR = "\n\n"
+
+# Approximate tokenizer (same as the chunker's): words and single punctuation characters
+TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+SENTENCE_END_RE = re.compile(r'[.!?](?=\s)')
+
+
+def load_encoding(name=TIKTOKEN_ENCODING, cache_dir=TIKTOKEN_CACHE_DIR):
+    """
+    Load a tiktoken encoding, reading its file from `cache_dir` or downloading it there.
+
+    Raises:
+        ImportError: If tiktoken is not installed.
+        Exception: If the file is not cached and cannot be downloaded.
+    """
+    if tiktoken is None:
+        raise ImportError("tiktoken is not installed")
+    os.makedirs(cache_dir, exist_ok=True)
+    # tiktoken only takes the folder from the environment; it is set for this call and then
+    # restored, so other tiktoken users of the process keep their own
+    previous = os.environ.get("TIKTOKEN_CACHE_DIR")
+    os.environ["TIKTOKEN_CACHE_DIR"] = cache_dir
+    try:
+        return tiktoken.get_encoding(name)
+    finally:
+        if previous is None:
+            del os.environ["TIKTOKEN_CACHE_DIR"]
+        else:
+            os.environ["TIKTOKEN_CACHE_DIR"] = previous
+
+
+def prefetch_encoding(name=TIKTOKEN_ENCODING, cache_dir=TIKTOKEN_CACHE_DIR):
+    """Download the encoding file to `cache_dir` while online, so the app can count tokens offline."""
+    load_encoding(name, cache_dir)
+    print(f"tiktoken encoding {name} cached in {cache_dir}")
+
+
+class Tokenizer:
+    """
+    Counts and truncates tokens, with tiktoken when it is installed and its encoding loads.
+
+    Args:
+        encoding (str): Name of the tiktoken encoding.
+        cache_dir (str): Folder of the tiktoken encoding files.
+    """
+
+    def __init__(self, encoding=TIKTOKEN_ENCODING, cache_dir=TIKTOKEN_CACHE_DIR):
+        self.encoding = None
+        try:
+            self.encoding = load_encoding(encoding, cache_dir)
+        except ImportError:
+            print("WARNING: tiktoken is not installed; context tokens are approximated by counting "
+                  "words and punctuation, which can differ from the model's count")
+        except Exception as e:  # Not cached and cannot be downloaded, e.g. offline
+            print(f"WARNING: tiktoken encoding {encoding} is not in {cache_dir} and could not be "
+                  f"downloaded ({e}); context tokens are approximated by counting words and "
+                  f"punctuation. Run prefetch_encoding() while online to cache it.")
+        self.name = "tiktoken" if self.encoding is not None else "approximate"
+
+    def count(self, text):
+        """Return the number of tokens of a text."""
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return len(TOKEN_RE.findall(text))
+
+    def truncate(self, text, max_tokens):
+        """Return the longest prefix of a text with at most `max_tokens` tokens."""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else self.encoding.decode(tokens[:max_tokens])
+        matches = list(TOKEN_RE.finditer(text))
+        return text if len(matches) <= max_tokens else text[:matches[max_tokens - 1].end()]
+
+
+_tokenizer = None
+
+
+def get_tokenizer():
+    """Return the shared tokenizer."""
+    global _tokenizer
+    if _tokenizer is None:
+        _tokenizer = Tokenizer()
+    return _tokenizer
+
+
+def split_passages(context):
+    """Split a context string (passages joined by blank lines) into passages."""
+    return [passage.strip() for passage in context.split(PASSAGE_SEPARATOR) if passage.strip()]
+
+
+def _cosine(a, b):
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[term] for term, count in a.items() if term in b)
+    return dot / math.sqrt(sum(v * v for v in a.values()) * sum(v * v for v in b.values()))
+
+
+def trim_passage(text, max_tokens, tokenizer):
+    """
+    Cut a passage to at most `max_tokens` tokens, at the last sentence end that fits if any.
+
+    Returns:
+        str: The passage, whole if it fits.
+    """
+    cut = tokenizer.truncate(text, max_tokens)
+    if cut == text:
+        return text
+    ends = [match.end() for match in SENTENCE_END_RE.finditer(cut + " ")]
+    return cut[:ends[-1]] if ends and ends[-1] >= len(cut) // 2 else cut
+
+
+def pack_context(passages, question, budget=CONTEXT_TOKEN_BUDGET, max_passage_tokens=MAX_PASSAGE_TOKENS,
+                 mmr_lambda=MMR_LAMBDA, tokenizer=None):
+    """
+    Select, order and trim passages to fit a token budget.
+
+    Args:
+        passages (list or str): Passages best first, as strings or documents with "content", or
+            a context string with the passages separated by blank lines.
+        question (str): The question, whose words count towards relevance.
+        budget (int): Maximum number of tokens of the packed context.
+        max_passage_tokens (int): Maximum number of tokens of one passage.
+        mmr_lambda (float): Weight of relevance against diversity.
+        tokenizer (Tokenizer): Defaults to the shared tokenizer.
+
+    Returns:
+        tuple: (packed context string, report dict with the number of passages given, selected,
+            dropped as redundant and trimmed, the tokens before and after packing, and the
+            tokens saved).
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    if isinstance(passages, str):
+        passages = split_passages(passages)
+    texts = [passage.get("content", "") if isinstance(passage, dict) else passage for passage in passages]
+    texts = [text.strip() for text in texts if text and text.strip()]
+    counts = [tokenizer.count(text) for text in texts]
+    separator_tokens = tokenizer.count(PASSAGE_SEPARATOR)
+    tokens_in = sum(counts) + separator_tokens * max(len(texts) - 1, 0)
+
+    question_terms = set(tokenize(question))
+    vectors = [Counter(tokenize(text)) for text in texts]
+    relevance = []
+    for rank, vector in enumerate(vectors):
+        coverage = len(question_terms & vector.keys()) / len(question_terms) if question_terms else 0.0
+        relevance.append(0.5 * (1 - rank / len(texts)) + 0.5 * coverage)
+
+    report = {"passages": len(texts), "selected": 0, "redundant": 0, "trimmed": 0}
+    selected = []
+    similarity = [0.0] * len(texts)  # Highest similarity to a selected passage
+    candidates = list(range(len(texts)))
+    remaining = budget
+    while candidates and remaining >= MIN_PASSAGE_TOKENS:
+        best = max(candidates, key=lambda i: mmr_lambda * relevance[i] - (1 - mmr_lambda) * similarity[i])
+        candidates.remove(best)
+        limit = min(max_passage_tokens, remaining - (separator_tokens if selected else 0))
+        if counts[best] > limit and limit < MIN_PASSAGE_TOKENS:
+            continue  # A smaller passage may still fit whole
+        text = trim_passage(texts[best], limit, tokenizer)
+        report["trimmed"] += text != texts[best]
+        remaining -= (separator_tokens if selected else 0) + tokenizer.count(text)
+        selected.append((best, text))
+
+        for i in candidates:
+            similarity[i] = max(similarity[i], _cosine(vectors[i], vectors[best]))
+        redundant = [i for i in candidates if similarity[i] >= REDUNDANCY_THRESHOLD]
+        report["redundant"] += len(redundant)
+        candidates = [i for i in candidates if i not in redundant]
+
+    # Keep the retrieval order in the prompt
+    context = PASSAGE_SEPARATOR.join(text for _, text in sorted(selected))
+    tokens_out = tokenizer.count(context) if context else 0
+    report.update({"selected": len(selected), "tokens_in": tokens_in, "tokens_out": tokens_out,
+                   "tokens_saved": max(tokens_in - tokens_out, 0)})
+    return context, report
+
+
+if __name__ == "__main__":
+    prefetch_encoding()
@@ -0,0 +1,252 @@
+"""
+embeddings.py
+
+This module computes dense vectors for the processed chunks on the CPU and keeps them in
+`data/embeddings`, for vector and hybrid retrieval.
+
+`HashingEmbedder` needs no model download and no training: the words and word pairs of a text
+are hashed into HASH_BUCKETS signed buckets (the hashing trick), weighted by 1 + log(count),
+and projected to EMBEDDING_DIM dimensions by a fixed random Gaussian matrix drawn from a seed.
+The projection keeps the cosine similarity of the hashed vectors approximately, and a text
+always gets the same vector, so vectors computed on different days can be compared. The matrix
+(32 MB by default) is drawn on first use and shared by all embedders with the same settings, so
+the retrievers and the answer cache of the app hold a single copy.
+
+`EmbeddingStore` keeps the vectors of a collection as one memory-mapped `.npy` matrix
+(float16 by default) with the chunk IDs of its rows in `ids.json`. `update` only embeds the
+chunks it does not have yet, copies the rows of the others, and drops the chunks that are gone.
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from .bm25 import tokenize
+
+EMBEDDING_DIM = 256
+HASH_BUCKETS = 1 << 15
+EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "float16")
+EMBEDDINGS_PATH = os.getenv("EMBEDDINGS_PATH", "data/embeddings")
+
+# Chunks embedded per batch, and rows copied per block when the store is rewritten
+BATCH_SIZE = 512
+COPY_BLOCK = 4096
+
+VECTORS_NAME = "vectors.npy"
+IDS_NAME = "ids.json"
+META_NAME = "meta.json"
+
+# (dim, buckets, seed) -> projection matrix, shared by the embedders
+_projections = {}
+_projections_lock = threading.Lock()
+
+
+def _projection(dim, buckets, seed):
+    with _projections_lock:
+        if (dim, buckets, seed) not in _projections:
+            rng = np.random.default_rng(seed)
+            matrix = (rng.standard_normal((buckets, dim)) / math.sqrt(dim)).astype(np.float32)
+            matrix.flags.writeable = False
+            _projections[(dim, buckets, seed)] = matrix
+        return _projections[(dim, buckets, seed)]
+
+
+class HashingEmbedder:
+    """
+    Embeds texts with signed feature hashing followed by a seeded random projection.
+
+    Args:
+        dim (int): Dimension of the vectors.
+        buckets (int): Number of hash buckets of the words and word pairs.
+        seed (int): Seed of the projection; vectors are only comparable for the same seed.
+    """
+
+    def __init__(self, dim=EMBEDDING_DIM, buckets=HASH_BUCKETS, seed=0):
+        self.dim = dim
+        self.buckets = buckets
+        self.seed = seed
+
+    @property
+    def projection(self):
+        """The (buckets, dim) projection matrix, shared by the embedders with the same settings."""
+        return _projection(self.dim, self.buckets, self.seed)
+
+    @property
+    def name(self):
+        """Identifies the embedding function; stores built with another one are re-embedded."""
+        return f"hashing-rp-{self.dim}-{self.buckets}-{self.seed}"
+
+    def features(self, text):
+        """
+        Return the hashed features of a text.
+
+        Returns:
+            tuple: (bucket numbers, signed weights), as numpy arrays.
+        """
+        tokens = tokenize(text)
+        counts = {}
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            h = zlib.crc32(feature.encode('utf-8'))
+            key = (h % self.buckets, -1.0 if h & 0x80000000 else 1.0)
+            counts[key] = counts.get(key, 0) + 1
+        buckets = np.fromiter((bucket for bucket, _ in counts), dtype=np.int64, count=len(counts))
+        weights = np.fromiter((sign * (1 + math.log(count)) for (_, sign), count in counts.items()),
+                              dtype=np.float32, count=len(counts))
+        return buckets, weights
+
+    def embed(self, texts):
+        """
+        Embed texts.
+
+        Args:
+            texts (list): The texts.
+
+        Returns:
+            numpy.ndarray: One L2-normalized float32 row per text; zero for texts without words.
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            buckets, weights = self.features(text)
+            if len(buckets):
+                vectors[i] = weights @ self.projection[buckets]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+
+class EmbeddingStore:
+    """
+    The vectors of a collection of chunks, memory-mapped from a folder.
+
+    Args:
+        path (str): Folder of the store.
+    """
+
+    def __init__(self, path=EMBEDDINGS_PATH):
+        self.path = path
+        self._load()
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.path, META_NAME), 'r', encoding='utf-8') as file:
+                self.meta = json.load(file)
+            with open(os.path.join(self.path, IDS_NAME), 'r', encoding='utf-8') as file:
+                self.ids = json.load(file)
+            self.vectors = np.load(os.path.join(self.path, VECTORS_NAME), mmap_mode='r')
+        except (OSError, ValueError):
+            self.ids, self.meta, self.vectors = [], {}, None  # No store yet
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _write_metadata(self, ids, model, dim, dtype):
+        for name, data in ((IDS_NAME, ids), (META_NAME, {"model": model, "dim": dim, "dtype": dtype,
+                                                         "count": len(ids)})):
+            with open(os.path.join(self.path, name) + ".tmp", 'w', encoding='utf-8') as file:
+                json.dump(data, file)
+            os.replace(os.path.join(self.path, name) + ".tmp", os.path.join(self.path, name))
+
+    @classmethod
+    def create(cls, path, ids, vectors, model, dtype=EMBEDDING_DTYPE):
+        """
+        Write a store from vectors computed elsewhere, e.g. by another embedding model.
+
+        Args:
+            path (str): Folder of the store.
+            ids (list): Chunk ID of every row.
+            vectors (numpy.ndarray): The (normalized) vectors, one row per ID.
+            model (str): Name of the model that computed them.
+            dtype (str): "float16" or "float32".
+
+        Returns:
+            EmbeddingStore: The store.
+        """
+        store = cls(path)
+        os.makedirs(path, exist_ok=True)
+        vectors_path = os.path.join(path, VECTORS_NAME)
+        with open(vectors_path + ".tmp", 'wb') as file:
+            np.save(file, np.asarray(vectors, dtype=dtype))
+        os.replace(vectors_path + ".tmp", vectors_path)
+        store._write_metadata(list(ids), model, int(np.shape(vectors)[1]), dtype)
+        store._load()
+        return store
+
+    def digest(self):
+        """Return a fingerprint of the rows of the store, to detect indexes built on older rows."""
+        return hashlib.sha256(json.dumps([self.meta.get("model"), self.ids]).encode('utf-8')).hexdigest()[:16]
+
+    def rows(self):
+        """Return chunk ID -> row of its vector."""
+        return {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+    def update(self, documents, embedder=None, dtype=EMBEDDING_DTYPE, batch_size=BATCH_SIZE):
+        """
+        Bring the store in line with a collection of chunks.
+
+        Chunks already in the store (same content-addressed ID, same embedder) keep their
+        vectors; new chunks are embedded in batches; chunks not in `documents` are dropped. The
+        new matrix is written next to the old one and replaces it when complete.
+
+        Args:
+            documents (iterable): Documents with "id" and "content"; repeated IDs are read once.
+            embedder (HashingEmbedder): The embedding function; defaults to `HashingEmbedder()`.
+            dtype (str): "float16" or "float32".
+            batch_size (int): Chunks embedded per batch.
+
+        Returns:
+            dict: Number of documents, chunks embedded, reused and removed, the elapsed seconds
+                and the embedding throughput in chunks per second.
+        """
+        embedder = embedder or HashingEmbedder()
+        start = time.perf_counter()
+        reusable = self.meta.get("model") == embedder.name and self.meta.get("dtype") == dtype
+        old_rows = self.rows() if reusable else {}
+
+        ids, pending, seen = [], [], set()
+        for document in documents:
+            if document["id"] in seen:
+                continue
+            seen.add(document["id"])
+            if document["id"] not in old_rows:
+                pending.append((len(ids), document.get("content", "")))
+            ids.append(document["id"])
+
+        os.makedirs(self.path, exist_ok=True)
+        path = os.path.join(self.path, VECTORS_NAME)
+        vectors = np.lib.format.open_memmap(path + ".tmp", mode='w+', dtype=dtype, shape=(len(ids), embedder.dim))
+
+        # Copy the vectors that are still needed, block by block
+        kept = [(row, old_rows[doc_id]) for row, doc_id in enumerate(ids) if doc_id in old_rows]
+        for i in range(0, len(kept), COPY_BLOCK):
+            new, old = map(list, zip(*kept[i:i + COPY_BLOCK]))
+            vectors[new] = self.vectors[old]
+
+        embed_start = time.perf_counter()
+        for i in range(0, len(pending), batch_size):
+            rows, texts = map(list, zip(*pending[i:i + batch_size]))
+            vectors[rows] = embedder.embed(texts).astype(dtype)
+        embed_seconds = time.perf_counter() - embed_start
+        vectors.flush()
+        del vectors
+        os.replace(path + ".tmp", path)
+
+        self._write_metadata(ids, embedder.name, embedder.dim, dtype)
+
+        removed = len(set(self.ids) - seen)
+        self._load()
+        report = {
+            "documents": len(ids),
+            "embedded": len(pending),
+            "reused": len(kept),
+            "removed": removed,
+            "seconds": time.perf_counter() - start,
+            "chunks_per_second": len(pending) / embed_seconds if embed_seconds else 0.0,
+        }
+        print(f"Embeddings: {report['embedded']} chunks embedded ({report['chunks_per_second']:.0f} chunks/s), "
+              f"{report['reused']} reused, {report['removed']} removed")
+        return report
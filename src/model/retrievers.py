@@ -0,0 +1,338 @@
+"""
+retrievers.py
+
+This module defines the retriever interface used to find the context of a question, and its
+backends. A retriever has one method, `search(query, top=k)`, which returns the best documents
+as dicts with at least "id", "content" and "score", best first.
+
+- `AzureSearchRetriever` queries Azure Cognitive Search; its client is created on first use,
+  so importing the module needs no credentials or network.
+- `BM25Retriever` answers in-process from a local BM25 index (`bm25.py`), built from the
+  processed chunks by the data pipeline.
+- `DenseRetriever` embeds the question and searches the chunk embeddings (`vector_index.py`);
+  the chunks themselves are read from the document store of the BM25 index.
+- `HybridRetriever` runs a lexical and a dense retriever concurrently and merges their rankings
+  with reciprocal-rank fusion (RRF): a document scores the sum of 1 / (k + rank) over the
+  rankings it appears in, so neither retriever's raw scores need to be comparable.
+
+`get_retriever` returns the backend selected by the RETRIEVER_BACKEND environment variable, and
+`get_cached_retriever` the same backend behind the retrieval cache (`CachedRetriever`): results
+are cached per normalized question (RETRIEVAL_CACHE, in-process or in a SQLite file shared by the
+app's workers) and invalidated when the pipeline publishes a new index version (`cache.py`).
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from azure.search.documents import SearchClient
+from azure.core.credentials import AzureKeyCredential
+
+from .bm25 import BM25Index
+from .cache import INDEX_VERSION_PATH, IndexVersion, normalize_query, open_cache
+from .embeddings import EMBEDDINGS_PATH, HashingEmbedder
+from .vector_index import VectorIndex
+
+AZURE_INDEX_NAME = "askrcindex"
+DEFAULT_TOP = 8
+
+# "azure" (default), "bm25", "dense" or "hybrid", and the folder of the local BM25 index
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "azure")
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "data/bm25")
+
+# Hybrid retrieval: lexical backend, candidates taken from each retriever, and RRF constant
+HYBRID_LEXICAL_BACKEND = os.getenv("HYBRID_LEXICAL_BACKEND", "bm25")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Retrieval cache: "memory" (default), "sqlite" or "off", its SQLite file, time to live and size
+RETRIEVAL_CACHE = os.getenv("RETRIEVAL_CACHE", "memory")
+RETRIEVAL_CACHE_PATH = os.getenv("RETRIEVAL_CACHE_PATH", "data/cache/retrieval.sqlite")
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "3600"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+
+
+class Retriever:
+    """Interface of the retrieval backends."""
+
+    def search(self, query, top=DEFAULT_TOP):
+        """
+        Return the best documents for a query.
+
+        Args:
+            query (str): The question.
+            top (int): Maximum number of documents.
+
+        Returns:
+            list: Dicts with "id", "content" and "score", best first.
+        """
+        raise NotImplementedError
+
+
+class AzureSearchRetriever(Retriever):
+    """
+    Retrieves documents from an Azure Cognitive Search index.
+
+    Args:
+        endpoint (str): Search service endpoint; defaults to AZURE_SEARCH_ENDPOINT.
+        key (str): Search service key; defaults to AZURE_SEARCH_KEY.
+        index_name (str): Name of the index.
+    """
+
+    def __init__(self, endpoint=None, key=None, index_name=AZURE_INDEX_NAME):
+        self.endpoint = endpoint
+        self.key = key
+        self.index_name = index_name
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            endpoint = self.endpoint or os.getenv("AZURE_SEARCH_ENDPOINT")
+            key = self.key or os.getenv("AZURE_SEARCH_KEY")
+            if not all([endpoint, key]):
+                raise ValueError("Required Azure environment variables are not set")
+            self._client = SearchClient(endpoint=endpoint, index_name=self.index_name,
+                                        credential=AzureKeyCredential(key))
+        return self._client
+
+    def search(self, query, top=DEFAULT_TOP):
+        results = self.client.search(search_text=query, top=top)
+        return [{**doc, "score": doc.get("@search.score")} for doc in results if 'content' in doc]
+
+
+class BM25Retriever(Retriever):
+    """
+    Retrieves documents from a local BM25 index, memory-mapped on first use.
+
+    Args:
+        path (str): Folder of the index written by `BM25Index.save`.
+    """
+
+    def __init__(self, path=BM25_INDEX_PATH):
+        self.path = path
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = BM25Index.load(self.path)
+        return self._index
+
+    def search(self, query, top=DEFAULT_TOP):
+        return self.index.search(query, top=top)
+
+
+class DenseRetriever(Retriever):
+    """
+    Retrieves chunks by the cosine similarity of their embeddings to the question's.
+
+    The vector index and the document store are memory-mapped on first use.
+
+    Args:
+        path (str): Folder of the embedding store.
+        documents_path (str): Folder of the BM25 index, whose stored fields are returned.
+        embedder (HashingEmbedder): Embeds the questions; must be the embedder of the store.
+        mode (str): Search mode of the vector index ("auto", "exact" or "ivf").
+    """
+
+    def __init__(self, path=EMBEDDINGS_PATH, documents_path=BM25_INDEX_PATH, embedder=None, mode="auto"):
+        self.path = path
+        self.documents_path = documents_path
+        self.mode = mode
+        self._embedder = embedder
+        self._index = None
+        self._documents = None
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = HashingEmbedder()
+        return self._embedder
+
+    @property
+    def index(self):
+        if self._index is None:
+            index = VectorIndex(self.path, mode=self.mode)
+            if len(index) and index.store.meta.get("model") != self.embedder.name:
+                raise ValueError(f"The embeddings in {self.path} were computed by "
+                                 f"{index.store.meta.get('model')}, not {self.embedder.name}")
+            self._index = index
+        return self._index
+
+    @property
+    def documents(self):
+        if self._documents is None:
+            self._documents = BM25Index.load(self.documents_path)
+        return self._documents
+
+    def search(self, query, top=DEFAULT_TOP):
+        vector = self.embedder.embed([query])[0]
+        if not vector.any():
+            return []  # No words to compare
+        results = []
+        for doc_id, score in self.index.search(vector, top=top):
+            document = self.documents.get(doc_id)
+            if document is not None:  # Embedded after the BM25 index was built
+                results.append({**document, "score": score})
+        return results
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K, top=DEFAULT_TOP):
+    """
+    Merge rankings with reciprocal-rank fusion.
+
+    Args:
+        rankings (list): Lists of documents with an "id", best first.
+        k (int): Fusion constant; a larger k gives the lower ranks more weight.
+        top (int): Maximum number of documents.
+
+    Returns:
+        list: The documents (fields of their first occurrence) with their fused "score", best
+            first; ties keep the order of first occurrence.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            if document["id"] not in fused:
+                fused[document["id"]] = [0.0, document]
+            fused[document["id"]][0] += 1 / (k + rank)
+    best = sorted(fused.values(), key=lambda entry: -entry[0])[:top]
+    return [{**document, "score": score} for score, document in best]
+
+
+class HybridRetriever(Retriever):
+    """
+    Runs several retrievers concurrently and fuses their rankings with RRF.
+
+    The retrievers run in threads; the BM25 and vector searches spend their time in numpy and
+    the Azure search waits on the network, so a query costs about the latency of the slowest
+    retriever. A retriever that fails is skipped with a warning.
+
+    Args:
+        retrievers (list): The retrievers; defaults to the HYBRID_LEXICAL_BACKEND and "dense"
+            backends of `get_retriever`.
+        candidates (int): Documents asked from each retriever.
+        k (int): RRF fusion constant.
+    """
+
+    def __init__(self, retrievers=None, candidates=HYBRID_CANDIDATES, k=RRF_K):
+        self.retrievers = retrievers or [get_retriever(HYBRID_LEXICAL_BACKEND), get_retriever("dense")]
+        self.candidates = candidates
+        self.k = k
+        self._executor = ThreadPoolExecutor(max_workers=len(self.retrievers), thread_name_prefix="retriever")
+
+    def search(self, query, top=DEFAULT_TOP):
+        candidates = max(self.candidates, top)
+        futures = [self._executor.submit(retriever.search, query, top=candidates) for retriever in self.retrievers]
+        rankings, errors = [], []
+        for retriever, future in zip(self.retrievers, futures):
+            try:
+                rankings.append(future.result())
+            except Exception as e:
+                print(f"{type(retriever).__name__} failed, fusing the other rankings: {e}")
+                errors.append(e)
+        if not rankings:
+            raise errors[0]
+        return reciprocal_rank_fusion(rankings, k=self.k, top=top)
+
+
+class CachedRetriever(Retriever):
+    """
+    Caches the results of a retriever per normalized question and index version.
+
+    When the index version changes, the entries of older versions are dropped from the cache.
+
+    Args:
+        backend (str): Name of the retriever in BACKENDS; the shared instance of `get_retriever`
+            answers the misses.
+        cache (MemoryCache): The cache (`MemoryCache` or `SQLiteCache`).
+        versions (IndexVersion): The index version; defaults to the INDEX_VERSION_PATH file.
+    """
+
+    def __init__(self, backend, cache, versions=None):
+        self.backend = backend
+        self.cache = cache
+        self.versions = versions or IndexVersion(INDEX_VERSION_PATH)
+        self._version = None
+
+    def search(self, query, top=DEFAULT_TOP):
+        version = self.versions.current()
+        if version != self._version:
+            self.cache.invalidate(version)
+            self._version = version
+        key = json.dumps([self.backend, top, normalize_query(query)], ensure_ascii=False)
+        results = self.cache.get(key, version)
+        if results is None:
+            results = get_retriever(self.backend).search(query, top=top)
+            self.cache.put(key, results, version)
+        return results
+
+
+BACKENDS = {
+    "azure": AzureSearchRetriever,
+    "bm25": BM25Retriever,
+    "dense": DenseRetriever,
+    "hybrid": HybridRetriever,
+}
+
+_retrievers = {}
+
+
+def get_retriever(backend=None):
+    """
+    Return the shared retriever of a backend.
+
+    Args:
+        backend (str): A name in BACKENDS; defaults to RETRIEVER_BACKEND.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    backend = backend or RETRIEVER_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown retriever backend {backend!r}, expected one of {sorted(BACKENDS)}")
+    if backend not in _retrievers:
+        _retrievers[backend] = BACKENDS[backend]()
+    return _retrievers[backend]
+
+
+_cache = None
+_cached_retrievers = {}
+
+
+def get_retrieval_cache():
+    """Return the shared retrieval cache, or None if RETRIEVAL_CACHE is "off"."""
+    global _cache
+    if RETRIEVAL_CACHE == "off":
+        return None
+    if _cache is None:
+        _cache = open_cache(RETRIEVAL_CACHE, RETRIEVAL_CACHE_PATH, RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL)
+    return _cache
+
+
+def get_cached_retriever(backend=None):
+    """
+    Return the shared retriever of a backend behind the retrieval cache.
+
+    Args:
+        backend (str): A name in BACKENDS; defaults to RETRIEVER_BACKEND.
+
+    Returns:
+        Retriever: A `CachedRetriever`, or the retriever itself if RETRIEVAL_CACHE is "off".
+    """
+    backend = backend or RETRIEVER_BACKEND
+    cache = get_retrieval_cache()
+    if cache is None:
+        return get_retriever(backend)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown retriever backend {backend!r}, expected one of {sorted(BACKENDS)}")
+    if backend not in _cached_retrievers:
+        _cached_retrievers[backend] = CachedRetriever(backend, cache)
+    return _cached_retrievers[backend]
+
+
+def retrieval_cache_stats():
+    """Return the counters of the retrieval cache (empty if it is off)."""
+    cache = get_retrieval_cache()
+    return cache.stats() if cache is not None else {}
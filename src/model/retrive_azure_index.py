@@ -1,24 +1,17 @@
-from azure.search.documents import SearchClient
-from azure.core.credentials import AzureKeyCredential
-import os
 from dotenv import load_dotenv
 load_dotenv()
+from .retrievers import get_cached_retriever
 
-# Load environment variables for Azure
-AZURE_SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT")
-AZURE_SEARCH_KEY = os.getenv("AZURE_SEARCH_KEY")
-AZURE_INDEX_NAME = "askrcindex"
+def search_azure_index(query, top=8):
+    """Retrieves top relevant documents and prepares them for OpenAI prompt.
 
-# Configure Search Client for Azure
-search_client = SearchClient(
-    endpoint=AZURE_SEARCH_ENDPOINT,
-    index_name=AZURE_INDEX_NAME,
-    credential=AzureKeyCredential(AZURE_SEARCH_KEY)
-)
-
-def search_azure_index(query):
-    """Retrieves top relevant documents from Azure Search and prepares them for OpenAI prompt."""
-    results = search_client.search(search_text=query, top=8)
+    The documents come from the retriever selected by RETRIEVER_BACKEND: Azure Search by
+    default, the local BM25 index with RETRIEVER_BACKEND=bm25, the chunk embeddings with
+    RETRIEVER_BACKEND=dense, or both fused with RETRIEVER_BACKEND=hybrid.
+    Repeated questions are answered from the retrieval cache until a new index version is
+    published.
+    """
+    results = get_cached_retriever().search(query, top=top)
     # Extract relevant information from search results
     context = "\n\n".join([doc['content'] for doc in results if 'content' in doc]) if results else "No relevant information found."
     # Return the extracted context
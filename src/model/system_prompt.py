@@ -1,5 +1,27 @@
-def create_system_prompt(context, question):
-    """Creates a concise system prompt for OpenAI based on retrieved context and user question."""
+from .context_packer import CONTEXT_TOKEN_BUDGET, pack_context
+
+
+def create_system_prompt(context, question, token_budget=CONTEXT_TOKEN_BUDGET, metrics=None):
+    """Creates a concise system prompt for OpenAI based on retrieved context and user question.
+
+    The retrieved passages (a context string with passages separated by blank lines, or a list
+    of documents) are packed into `token_budget` tokens by `pack_context`: redundant passages are
+    dropped and long ones trimmed. With `token_budget=None` the context is pasted as it is.
+
+    Args:
+        context (str or list): The retrieved context.
+        question (str): The user question.
+        token_budget (int): Maximum number of tokens of the context.
+        metrics (MetricsCollector): Receives the context tokens before and after packing.
+    """
+    if token_budget is not None:
+        context, report = pack_context(context, question, budget=token_budget)
+        print(f"Context: {report['selected']} of {report['passages']} passages, {report['tokens_out']} tokens "
+              f"({report['tokens_saved']} saved, {report['redundant']} redundant, {report['trimmed']} trimmed)")
+        if metrics is not None:
+            metrics.add_metric('context_tokens_in', report['tokens_in'])
+            metrics.add_metric('context_tokens_out', report['tokens_out'])
+            metrics.add_metric('context_tokens_saved', report['tokens_saved'])
     return f"""
     You are a helpful assistant. Answer the question based on the given context.
     Respond accurately and avoid guessing if the context doesn't provide the information.
@@ -0,0 +1,218 @@
+"""
+vector_index.py
+
+This module answers top-k nearest-neighbour queries over the chunk embeddings of an
+`EmbeddingStore` (`embeddings.py`), by cosine similarity (the vectors are normalized).
+
+- Exact search multiplies the query with the whole matrix, block by block, so only one block
+  is converted to float32 at a time. It is the default for small corpora.
+- IVF search partitions the vectors with k-means into `nlist` lists. `build_ivf` writes the
+  centroids and a copy of the vectors ordered by list, so a query only reads the `nprobe`
+  lists whose centroids are closest to it, as contiguous slices.
+
+All the arrays are `.npy` files opened with `mmap_mode='r'`: several serving processes that
+load the same index share the pages of the operating system cache instead of each holding a
+copy of the matrix.
+"""
+
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from .embeddings import EMBEDDINGS_PATH, EmbeddingStore
+
+# Corpus size from which the "auto" mode uses IVF (when an up-to-date IVF index exists)
+IVF_MIN_DOCUMENTS = int(os.getenv("IVF_MIN_DOCUMENTS", "50000"))
+DEFAULT_NPROBE = 8
+
+# k-means training: Lloyd iterations, and training vectors sampled per list
+KMEANS_ITERATIONS = 15
+KMEANS_SAMPLE = 64
+
+# Rows converted to float32 at a time
+SEARCH_BLOCK = 8192
+
+SEARCH_MODES = ("auto", "exact", "ivf")
+IVF_META_NAME = "ivf.json"
+IVF_ARRAYS = ("ivf_centroids", "ivf_offsets", "ivf_order", "ivf_vectors")
+
+
+def _top(scores, rows, top):
+    # The `top` best (row, score) pairs, best first
+    if top <= 0 or not len(scores):
+        return []
+    top = min(top, len(scores))
+    best = np.argpartition(-scores, top - 1)[:top]
+    best = best[np.argsort(-scores[best], kind='stable')]
+    return [(int(rows[i]), float(scores[i])) for i in best]
+
+
+def _matmul_blocks(vectors, query, block=SEARCH_BLOCK):
+    scores = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), block):
+        scores[start:start + block] = np.asarray(vectors[start:start + block], dtype=np.float32) @ query
+    return scores
+
+
+def default_nlist(count):
+    """Number of IVF lists for a corpus: about 4 * sqrt(count)."""
+    return max(1, min(count, int(4 * math.sqrt(count))))
+
+
+def kmeans(vectors, nlist, iterations=KMEANS_ITERATIONS, seed=0):
+    """
+    Spherical k-means on a sample of the vectors.
+
+    Args:
+        vectors (numpy.ndarray): Normalized vectors (possibly memory-mapped).
+        nlist (int): Number of centroids.
+        iterations (int): Lloyd iterations.
+        seed (int): Seed of the sample and of the initial centroids.
+
+    Returns:
+        numpy.ndarray: The normalized float32 centroids, one row per list.
+    """
+    rng = np.random.default_rng(seed)
+    count = len(vectors)
+    sample = np.sort(rng.choice(count, size=min(count, nlist * KMEANS_SAMPLE), replace=False))
+    data = np.asarray(vectors[sample], dtype=np.float32)
+    centroids = data[rng.choice(len(data), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        empty = np.bincount(labels, minlength=nlist) == 0
+        sums[empty] = data[rng.choice(len(data), size=int(empty.sum()))]  # Reseed empty lists
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.where(norms > 0, norms, 1)
+    return centroids
+
+
+def build_ivf(path=EMBEDDINGS_PATH, nlist=None, seed=0):
+    """
+    Build the IVF index of an embedding store, next to its vectors.
+
+    Args:
+        path (str): Folder of the embedding store.
+        nlist (int): Number of lists; defaults to `default_nlist`.
+        seed (int): Seed of the k-means.
+
+    Returns:
+        dict: The number of vectors and lists and the elapsed seconds.
+    """
+    start = time.perf_counter()
+    store = EmbeddingStore(path)
+    count = len(store)
+    if not count:
+        return {"documents": 0, "nlist": 0, "seconds": 0.0}
+    nlist = min(nlist or default_nlist(count), count)
+    centroids = kmeans(store.vectors, nlist, seed=seed)
+
+    labels = np.empty(count, dtype=np.int32)
+    for block in range(0, count, SEARCH_BLOCK):
+        chunk = np.asarray(store.vectors[block:block + SEARCH_BLOCK], dtype=np.float32)
+        labels[block:block + SEARCH_BLOCK] = np.argmax(chunk @ centroids.T, axis=1)
+    order = np.argsort(labels, kind='stable').astype(np.int32)
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(labels, minlength=nlist))
+
+    arrays = {"ivf_centroids": centroids, "ivf_offsets": offsets, "ivf_order": order}
+    for name, array in arrays.items():
+        with open(os.path.join(path, f"{name}.npy.tmp"), 'wb') as file:
+            np.save(file, array)
+    ordered = np.lib.format.open_memmap(os.path.join(path, "ivf_vectors.npy.tmp"), mode='w+',
+                                        dtype=store.vectors.dtype, shape=store.vectors.shape)
+    for block in range(0, count, SEARCH_BLOCK):
+        ordered[block:block + SEARCH_BLOCK] = store.vectors[order[block:block + SEARCH_BLOCK]]
+    ordered.flush()
+    del ordered
+    for name in IVF_ARRAYS:
+        os.replace(os.path.join(path, f"{name}.npy.tmp"), os.path.join(path, f"{name}.npy"))
+    with open(os.path.join(path, IVF_META_NAME) + ".tmp", 'w', encoding='utf-8') as file:
+        json.dump({"nlist": nlist, "store": store.digest()}, file)
+    os.replace(os.path.join(path, IVF_META_NAME) + ".tmp", os.path.join(path, IVF_META_NAME))
+
+    report = {"documents": count, "nlist": nlist, "seconds": time.perf_counter() - start}
+    print(f"IVF index: {count} vectors in {nlist} lists in {report['seconds']:.1f}s")
+    return report
+
+
+class VectorIndex:
+    """
+    Top-k search over the vectors of an embedding store.
+
+    Args:
+        path (str): Folder of the embedding store.
+        mode (str): "exact", "ivf", or "auto" (IVF from IVF_MIN_DOCUMENTS vectors when an
+            up-to-date IVF index exists).
+        nprobe (int): Lists read per IVF query.
+
+    Raises:
+        ValueError: If the mode is unknown, or "ivf" is asked without an up-to-date IVF index.
+    """
+
+    def __init__(self, path=EMBEDDINGS_PATH, mode="auto", nprobe=DEFAULT_NPROBE):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {mode!r}, expected one of {SEARCH_MODES}")
+        self.store = EmbeddingStore(path)
+        self.ids = self.store.ids
+        self.nprobe = nprobe
+        self.ivf = self._load_ivf(path)
+        if mode == "ivf" and self.ivf is None:
+            raise ValueError(f"No up-to-date IVF index in {path}; run build_ivf first")
+        if mode == "auto":
+            mode = "ivf" if self.ivf is not None and len(self.ids) >= IVF_MIN_DOCUMENTS else "exact"
+        self.mode = mode
+
+    def _load_ivf(self, path):
+        try:
+            with open(os.path.join(path, IVF_META_NAME), 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if meta.get("store") != self.store.digest():
+            return None  # Built on older vectors
+        return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in IVF_ARRAYS}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, top=8, mode=None, nprobe=None):
+        """
+        Return the chunks closest to a query vector.
+
+        Args:
+            query (numpy.ndarray): The normalized query vector.
+            top (int): Maximum number of chunks.
+            mode (str): "exact" or "ivf" for this query; defaults to the mode of the index.
+            nprobe (int): Lists read by an IVF query; defaults to the `nprobe` of the index.
+
+        Returns:
+            list: (chunk ID, cosine similarity) pairs, best first.
+        """
+        if not len(self.ids):
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        if (mode or self.mode) == "ivf":
+            hits = self._search_ivf(query, top, nprobe or self.nprobe)
+        else:
+            hits = _top(_matmul_blocks(self.store.vectors, query), np.arange(len(self.ids)), top)
+        return [(self.ids[row], score) for row, score in hits]
+
+    def _search_ivf(self, query, top, nprobe):
+        centroids, offsets = self.ivf["ivf_centroids"], self.ivf["ivf_offsets"]
+        nprobe = min(nprobe, len(centroids))
+        lists = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+        scores, rows = [], []
+        for i in lists:
+            start, end = offsets[i], offsets[i + 1]
+            if start == end:
+                continue
+            scores.append(_matmul_blocks(self.ivf["ivf_vectors"][start:end], query))
+            rows.append(self.ivf["ivf_order"][start:end])
+        if not scores:
+            return []
+        return _top(np.concatenate(scores), np.concatenate(rows), top)